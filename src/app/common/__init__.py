@@ -1 +1,6 @@
-from .signal_bus import signalBus
+def __getattr__(name: str):
+    """load signalBus on first use, so modules of common can be imported without Qt"""
+    if name == 'signalBus':
+        from .signal_bus import signalBus
+        return signalBus
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
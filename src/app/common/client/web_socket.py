@@ -1,6 +1,9 @@
 import asyncio
 import datetime
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from queue import SimpleQueue, Empty
 from threading import Thread
 from typing import Any
 
@@ -11,12 +14,19 @@ from cv2 import Mat
 from numpy import ndarray, dtype
 from websockets import WebSocketClientProtocol
 
-from src.app.common.types import WebsocketRSData
+from src.app.common.types import WebsocketRSData, Face2Search, Face2SearchBatchSchema, JPEG_QUALITY
 from .client import client
 from ...config import qt_logger
 from ...utils.decorator import error_handler
 from ...utils.time_tracker import time_tracker
 
+# subprotocols a client offers, a server accepting none of them gets json
+BINARY_SUBPROTOCOL = "boostface.binary.v1"
+JSON_SUBPROTOCOL = "boostface.json"
+# the same carrying many Face2Search per message, answered by a json list of results
+BINARY_BATCH_SUBPROTOCOL = "boostface.binary-batch.v1"
+JSON_BATCH_SUBPROTOCOL = "boostface.json-batch"
+
 
 class WebSocketDataProcessor:
     """WebSocket data processor"""
@@ -74,14 +84,70 @@ class WebSocketBase(Thread, WebSocketDataProcessor):
 
 
 class WebSocketClient(WebSocketBase):
-    """WebsocketClient thread"""
+    """
+    WebsocketClient thread
+    :param ws_type: endpoint of the websocket
+    :param binary: offer BINARY_SUBPROTOCOL, Face2Search is sent as Face2Search.to_bytes if the server accepts it
+    :param batch_size: Face2Search sent in one message at most, more than 1 offers the batch subprotocols
+    :param batch_linger: seconds a Face2Search waits for others to fill its batch at most
+    :param encode_workers: threads encoding Face2Search off the loop, 0 to encode on the loop
+    :param jpeg_quality: quality of Face2Search jpegs
+    :param max_side: Face2Search images are scaled down to this longer side before encoding, None to keep them
+    :ivar protocol: subprotocol the server accepted, None before connecting or if it accepted none
+    :ivar messages: messages sent
+    :ivar faces_sent: Face2Search sent
+    :ivar batches: batches sent
+    :ivar linger_total: seconds faces waited for their batch to fill, summed over batches
+    :ivar linger_max: longest wait of a batch
+    :ivar dequeued: data taken from sender_queue
+    :ivar send_wait_total: seconds data waited in sender_queue before being sent, summed
+    :ivar send_wait_max: longest wait of data in sender_queue
+    :ivar send_depth_max: most data waiting in sender_queue at once
+    :ivar received: data taken by receive and receive_all
+    :ivar receive_wait_total: seconds received data waited in receiver_queue before being taken, summed
+    :ivar receive_wait_max: longest wait of received data in receiver_queue
+    """
 
-    def __init__(self, ws_type: str | None = None):
+    def __init__(self, ws_type: str | None = None, binary: bool = False,
+                 batch_size: int = 1, batch_linger: float = 0.005,
+                 encode_workers: int = 2, jpeg_quality: int = JPEG_QUALITY, max_side: int | None = None):
         super().__init__()
         self._is_running = False
         self.ws_type: str | None = ws_type
-        self.sender_queue = asyncio.Queue()
-        self.receiver_queue = asyncio.Queue()
+        self.batch_size = batch_size
+        self.batch_linger = batch_linger
+        self.jpeg_quality = jpeg_quality
+        self.max_side = max_side
+        # cv2.imencode releases the GIL, encoding in threads keeps the loop free to receive meanwhile
+        self._encoder = ThreadPoolExecutor(encode_workers, f"{ws_type}-encode") if encode_workers else None
+        # messages being encoded at most, the sender waits for the oldest beyond it
+        self.max_encoding = 2 * encode_workers
+        # preferred first
+        subprotocols = [BINARY_BATCH_SUBPROTOCOL, BINARY_SUBPROTOCOL, JSON_BATCH_SUBPROTOCOL, JSON_SUBPROTOCOL]
+        if not binary:
+            subprotocols = [p for p in subprotocols if p not in (BINARY_BATCH_SUBPROTOCOL, BINARY_SUBPROTOCOL)]
+        if batch_size <= 1:
+            subprotocols = [p for p in subprotocols if p not in (BINARY_BATCH_SUBPROTOCOL, JSON_BATCH_SUBPROTOCOL)]
+        self.subprotocols = subprotocols if len(subprotocols) > 1 else None
+        self.protocol: str | None = None
+        self.messages = 0
+        self.faces_sent = 0
+        self.batches = 0
+        self.linger_total = 0.
+        self.linger_max = 0.
+        self.dequeued = 0
+        self.send_wait_total = 0.
+        self.send_wait_max = 0.
+        self.send_depth_max = 0
+        self.received = 0
+        self.receive_wait_total = 0.
+        self.receive_wait_max = 0.
+        # other threads hand data to the loop by call_soon_threadsafe, which wakes it at once,
+        # sender_queue and its (queued_at, data) items are only touched on the loop
+        self._loop = asyncio.new_event_loop()
+        self.sender_queue: asyncio.Queue[tuple[float, Any]] = asyncio.Queue()
+        # (received_at, data), put on the loop and taken by any thread
+        self.receiver_queue: SimpleQueue[tuple[float, Any]] = SimpleQueue()
         self.base_url = f"{client.base_ws_url}/identify/{self.ws_type}/ws/"
         self.auth_header = client._auth_header()
 
@@ -94,39 +160,109 @@ class WebSocketClient(WebSocketBase):
 
     @error_handler
     def stop_ws(self):
-        """stop websocket"""
-        if not self.is_alive():  # 检查线程是否已经开始
-            qt_logger.debug(f"WebSocket thread:{self.ws_type}has not been started or already stopped.")
-            return
-        self._is_running = False
-        self.sender_queue.put_nowait("STOP")
-        self.join()
-        qt_logger.info(f"{self.base_url} : websocket stopped")
+        """stop websocket, encode threads are shut down whether it ever ran or not"""
+        try:
+            if not self.is_alive():  # 检查线程是否已经开始
+                qt_logger.debug(f"WebSocket thread:{self.ws_type}has not been started or already stopped.")
+                # never run or done, sends are dropped from now on
+                self._loop.close()
+                return
+            self._is_running = False
+            try:
+                self._loop.call_soon_threadsafe(self._enqueue, "STOP")
+            except RuntimeError:
+                # run ended and closed the loop since the check
+                pass
+            self.join()
+            qt_logger.info(f"{self.base_url} : websocket stopped")
+        finally:
+            if self._encoder is not None:
+                self._encoder.shutdown()
 
     @error_handler
     def send(self, data: dict | WebsocketRSData | str | bytes):
-        """send data to websocket"""
+        """send data to websocket, from any thread, dropped once the websocket stopped"""
+        if self._loop.is_closed():
+            qt_logger.warning(f"{self.base_url} : websocket stopped, drop data to send")
+            return
         try:
-            self.sender_queue.put_nowait(data)
-        except asyncio.QueueFull:
-            qt_logger.warning(f"{self.base_url} : sender queue is full")
+            self._loop.call_soon_threadsafe(self._enqueue, data)
+        except RuntimeError:
+            # loop closed since the check
+            qt_logger.warning(f"{self.base_url} : websocket stopped, drop data to send")
 
     @error_handler
     def receive(
             self) -> dict | str | Mat | ndarray[Any, dtype] | ndarray | None:
-        """receive data from websocket"""
-        try:
-            return self.receiver_queue.get_nowait()
-        except asyncio.QueueEmpty:
-            qt_logger.warning(f"{self.base_url} : receiver queue is empty")
-            return None
+        """receive data from websocket, None if nothing was received, from any thread"""
+        received = self.receive_all(1)
+        return received[0] if received else None
+
+    def receive_all(self, max_items: int | None = None) -> list:
+        """
+        data received from websocket so far, without waiting, from any thread
+        :param max_items: data taken at most, all if None
+        """
+        received = []
+        now = time.perf_counter()
+        while max_items is None or len(received) < max_items:
+            try:
+                received_at, data = self.receiver_queue.get_nowait()
+            except Empty:
+                break
+            self.receive_wait_total += now - received_at
+            self.receive_wait_max = max(self.receive_wait_max, now - received_at)
+            received.append(data)
+        self.received += len(received)
+        return received
+
+    def _enqueue(self, data):
+        """put data to send on sender_queue, on the loop"""
+        self.sender_queue.put_nowait((time.perf_counter(), data))
+        self.send_depth_max = max(self.send_depth_max, self.sender_queue.qsize())
+
+    def _dequeued(self, item: tuple[float, Any]):
+        """data of an item taken from sender_queue, counting its wait, every taken item must come here"""
+        self.sender_queue.task_done()
+        queued_at, data = item
+        wait = time.perf_counter() - queued_at
+        self.dequeued += 1
+        self.send_wait_total += wait
+        self.send_wait_max = max(self.send_wait_max, wait)
+        return data
+
+    @property
+    def batching(self) -> bool:
+        """whether Face2Search are sent in batches, as the server accepted"""
+        return self.protocol in (BINARY_BATCH_SUBPROTOCOL, JSON_BATCH_SUBPROTOCOL)
+
+    def stats(self) -> dict[str, float]:
+        return {
+            'messages': self.messages,
+            'faces_sent': self.faces_sent,
+            'faces_per_message': self.faces_sent / self.messages if self.messages else 0.,
+            'batches': self.batches,
+            'linger_mean_ms': self.linger_total / self.batches * 1000 if self.batches else 0.,
+            'linger_max_ms': self.linger_max * 1000,
+            'send_depth': self.sender_queue.qsize(),
+            'send_depth_max': self.send_depth_max,
+            'send_wait_mean_ms': self.send_wait_total / self.dequeued * 1000 if self.dequeued else 0.,
+            'send_wait_max_ms': self.send_wait_max * 1000,
+            'received': self.received,
+            'receive_depth': self.receiver_queue.qsize(),
+            'receive_wait_mean_ms': self.receive_wait_total / self.received * 1000 if self.received else 0.,
+            'receive_wait_max_ms': self.receive_wait_max * 1000,
+        }
 
     @error_handler
     def run(self):
         """ run websocket"""
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        loop.run_until_complete(self._connect_websocket())
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._connect_websocket())
+        finally:
+            # later sends are dropped instead of piling up on a loop nobody runs
+            self._loop.close()
 
     @error_handler
     async def _connect_websocket(self):
@@ -135,11 +271,13 @@ class WebSocketClient(WebSocketBase):
         client_id: str = client.user['id'] + time_now.strftime('%Y%m%d%H%M%S')
         uri = self.base_url + client_id
         qt_logger.debug(f"{self.base_url} : websocket connecting")
-        async with websockets.connect(uri, extra_headers=self.auth_header) as websocket:
+        async with websockets.connect(
+                uri, extra_headers=self.auth_header, subprotocols=self.subprotocols) as websocket:
+            self.protocol = websocket.subprotocol
             consumer_task = asyncio.create_task(
                 self._receive_messages(websocket))
             producer_task = asyncio.create_task(self._send_messages(websocket))
-            qt_logger.debug(f"{self.base_url} : websocket connected")
+            qt_logger.debug(f"{self.base_url} : websocket connected, protocol {self.protocol or 'json'}")
             done, pending = await asyncio.wait(
                 [consumer_task, producer_task],
                 return_when=asyncio.FIRST_EXCEPTION,
@@ -157,7 +295,10 @@ class WebSocketClient(WebSocketBase):
                 with time_tracker.track(f"{self.base_url} : receive messages"):
                     message = await asyncio.wait_for(websocket.recv(), timeout=1.0)
                     decoded = self._decode(message)
-                    await self.receiver_queue.put(decoded)
+                    # a batch is answered by a list of results, each carrying the uid of its face
+                    received_at = time.perf_counter()
+                    for item in decoded if isinstance(decoded, list) else [decoded]:
+                        self.receiver_queue.put((received_at, item))
             except asyncio.TimeoutError:
                 qt_logger.debug(f"{self.base_url} : receive timeout")
                 continue
@@ -170,21 +311,86 @@ class WebSocketClient(WebSocketBase):
     @error_handler
     async def _send_messages(self, websocket: WebSocketClientProtocol):
         qt_logger.debug(f"{self.base_url} : start send messages")
+        # (data, its encoding) in the order data was queued, encodings run in _encoder meanwhile
+        encoding: asyncio.Queue[tuple[Any, asyncio.Future] | None] = asyncio.Queue(max(1, self.max_encoding))
+        submitter = asyncio.create_task(self._submit_messages(encoding))
+        await self._write_messages(websocket, encoding)
+        # the writer is done at STOP or when the connection closed, the submitter may still wait for data
+        submitter.cancel()
+
+    async def _submit_messages(self, encoding: asyncio.Queue):
+        """take data from sender_queue, batch it and start encoding it"""
+        held = None
         while self._is_running:
+            try:
+                if held is not None:
+                    data, held = held, None
+                else:
+                    data = self._dequeued(await self.sender_queue.get())
+                if isinstance(data, str) and data == "STOP":
+                    break
+                if isinstance(data, Face2Search) and self.batching:
+                    data, held = await self._gather_batch(data)
+                if self._encoder is not None and isinstance(data, (Face2Search, list)):
+                    future = asyncio.get_running_loop().run_in_executor(self._encoder, self._encode, data)
+                else:
+                    future = asyncio.get_running_loop().create_future()
+                    future.set_result(self._encode(data))
+                await encoding.put((data, future))
+            except Exception as e:
+                qt_logger.error(f"WebSocket error occurred: {e.__class__.__name__} - {e}")
+        await encoding.put(None)
+
+    async def _write_messages(self, websocket: WebSocketClientProtocol, encoding: asyncio.Queue):
+        """send encoded data in the order it was queued"""
+        while (item := await encoding.get()) is not None:
+            data, future = item
             try:
                 with time_tracker.track(f"{self.base_url}send messages"):
-                    data = await self.sender_queue.get()
-                    if data == "STOP":
-                        break
-                    encoded = self._encode(data)
+                    encoded = await future
+                    if encoded is None:
+                        continue
                     await websocket.send(encoded)
-                    self.sender_queue.task_done()
+                    self.messages += 1
+                    self.faces_sent += len(data) if isinstance(data, list) else isinstance(data, Face2Search)
             except websockets.exceptions.ConnectionClosedError:
                 qt_logger.info(f'{self.base_url} : Connection closed')
                 break
             except Exception as e:
                 qt_logger.error(f"WebSocket error occurred: {e.__class__.__name__} - {e}")
 
+    async def _gather_batch(self, first: Face2Search) -> tuple[list[Face2Search], object | None]:
+        """
+        first face and the faces queued within batch_linger after it, batch_size at most
+        :return: the batch and data queued after it which is not a face, None if none
+        """
+        start = time.perf_counter()
+        deadline = start + self.batch_linger
+        batch, held = [first], None
+        while len(batch) < self.batch_size:
+            try:
+                data = self._dequeued(self.sender_queue.get_nowait())
+            except asyncio.QueueEmpty:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    data = self._dequeued(await asyncio.wait_for(self.sender_queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            if not isinstance(data, Face2Search):
+                held = data
+                break
+            batch.append(data)
+        linger = time.perf_counter() - start
+        self.batches += 1
+        self.linger_total += linger
+        self.linger_max = max(self.linger_max, linger)
+        return batch, held
+
+    def _downscaled(self, face: Face2Search) -> Face2Search:
+        return face if self.max_side is None else face.downscaled(self.max_side)
+
     @error_handler
     def _decode(self, data: str |
                 bytes) -> dict | str | Mat | ndarray[Any, dtype] | ndarray:
@@ -198,6 +404,9 @@ class WebSocketClient(WebSocketBase):
                 # dict
                 decoded = json.loads(data)
 
+                if isinstance(decoded, list) and all(isinstance(item, dict) for item in decoded):
+                    qt_logger.debug(f"recv {len(decoded)} dict data")
+                    return decoded
                 if not isinstance(decoded, dict):
                     qt_logger.debug(f"recv str data:{data},should be dict")
                     raise TypeError(f"can not decode data:{data}")
@@ -211,11 +420,20 @@ class WebSocketClient(WebSocketBase):
             raise TypeError(f"can not decode data:{data}")
 
     @error_handler
-    def _encode(self, data: dict | WebsocketRSData |
+    def _encode(self, data: dict | WebsocketRSData | list[Face2Search] |
                 str | bytes) -> str | bytes:
-        if isinstance(data, WebsocketRSData):
-            if data is None:
-                qt_logger.error(f"can not encode data:{data}")
+        if isinstance(data, list):
+            faces = [self._downscaled(face) for face in data]
+            if self.protocol == BINARY_BATCH_SUBPROTOCOL:
+                return Face2Search.batch_to_bytes(faces, self.jpeg_quality)
+            return Face2SearchBatchSchema(
+                faces=[face.to_schema(self.jpeg_quality) for face in faces]).model_dump_json()
+        elif isinstance(data, Face2Search):
+            face = self._downscaled(data)
+            if self.protocol == BINARY_SUBPROTOCOL:
+                return face.to_bytes(self.jpeg_quality)
+            return face.to_schema(self.jpeg_quality).model_dump_json()
+        elif isinstance(data, WebsocketRSData):
             return data.to_schema().model_dump_json()
         elif isinstance(data, dict):
             return json.dumps(data)
@@ -1,4 +1,5 @@
 import base64
+import struct
 import uuid
 from dataclasses import dataclass
 
@@ -16,6 +17,16 @@ Embedding = NDArray[np.float64]  # shape: (512, )
 Image = NDArray[np.uint8]  # shape: (height, width, 3)
 Color = tuple[int, int, int]
 
+# binary Face2Search message: magic, version, uid length | uid utf-8 | det_score, kps, jpeg length | jpeg
+FACE2SEARCH_MAGIC = b'F2S'
+FACE2SEARCH_VERSION = 1
+_FACE2SEARCH_PREFIX = struct.Struct('<3sBH')
+# binary batch: magic, version, count | count Face2Search messages
+FACE2SEARCH_BATCH_MAGIC = b'F2B'
+_FACE2SEARCH_BODY = struct.Struct('<f10fI')
+# quality of face jpegs, the default of cv2.imencode
+JPEG_QUALITY = 95
+
 
 @dataclass
 class IdentifyResult:
@@ -61,6 +72,11 @@ class Face2SearchSchema(BaseModel):
     uid: str = Field(..., description="Face ID")
 
 
+class Face2SearchBatchSchema(BaseModel):
+    """many Face2Search in one message"""
+    faces: list[Face2SearchSchema] = Field(..., description="Faces to search")
+
+
 @ dataclass
 class WebsocketRSData:
     """ Websocket sender and receive data"""
@@ -80,22 +96,103 @@ class Face2Search(WebsocketRSData):
     det_score: float
     uid: str
 
-    @error_handler
-    def to_base64(self) -> str:
-        """将图像转换为 base64 编码的字符串"""
-        retval, buffer = cv2.imencode('.jpg', self.face_img)
+    def downscaled(self, max_side: int) -> "Face2Search":
+        """the face with face_img and kps scaled down so that its longer side is max_side at most"""
+        height, width = self.face_img.shape[:2]
+        scale = max_side / max(height, width)
+        if scale >= 1:
+            return self
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        # area averaging only pays for itself when halving or more, linear is several times faster
+        interpolation = cv2.INTER_AREA if scale <= 0.5 else cv2.INTER_LINEAR
+        face_img = cv2.resize(self.face_img, size, interpolation=interpolation)
+        kps = None if self.kps is None else self.kps * np.array([size[0] / width, size[1] / height])
+        return Face2Search(face_img, kps, self.det_score, self.uid)
+
+    def to_jpeg(self, quality: int = JPEG_QUALITY) -> bytes:
+        """jpeg bytes of face_img"""
+        retval, buffer = cv2.imencode('.jpg', self.face_img, (cv2.IMWRITE_JPEG_QUALITY, quality))
         if not retval:
             raise ValueError("Failed to encode image")
-        image_base64 = base64.b64encode(buffer).decode('utf-8')
-        return image_base64
+        return buffer.tobytes()
+
+    @error_handler
+    def to_base64(self, quality: int = JPEG_QUALITY) -> str:
+        """将图像转换为 base64 编码的字符串"""
+        return base64.b64encode(self.to_jpeg(quality)).decode('utf-8')
+
+    def to_bytes(self, quality: int = JPEG_QUALITY) -> bytes:
+        """
+        binary message of the face, a header of uid, det_score and kps as float32, then the raw jpeg,
+        kps are nan if unknown
+        """
+        uid = self.uid.encode('utf-8')
+        jpeg = self.to_jpeg(quality)
+        kps = np.full(10, np.nan) if self.kps is None else np.ravel(self.kps)
+        return b''.join((
+            _FACE2SEARCH_PREFIX.pack(FACE2SEARCH_MAGIC, FACE2SEARCH_VERSION, len(uid)),
+            uid,
+            _FACE2SEARCH_BODY.pack(self.det_score, *kps, len(jpeg)),
+            jpeg))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Face2Search":
+        """
+        face of a message of to_bytes
+        :param data: binary message
+        """
+        face, end = cls._unpack_from(data, 0)
+        if end != len(data):
+            raise ValueError(f"Face2Search message of {len(data)} bytes, expected {end}")
+        return face
+
+    @staticmethod
+    def batch_to_bytes(faces: list["Face2Search"], quality: int = JPEG_QUALITY) -> bytes:
+        """binary message of many faces, messages of to_bytes one after another"""
+        return b''.join([_FACE2SEARCH_PREFIX.pack(FACE2SEARCH_BATCH_MAGIC, FACE2SEARCH_VERSION, len(faces)),
+                         *(face.to_bytes(quality) for face in faces)])
+
+    @classmethod
+    def batch_from_bytes(cls, data: bytes) -> list["Face2Search"]:
+        """
+        faces of a message of batch_to_bytes
+        :param data: binary batch message
+        """
+        magic, version, count = _FACE2SEARCH_PREFIX.unpack_from(data)
+        if magic != FACE2SEARCH_BATCH_MAGIC or version != FACE2SEARCH_VERSION:
+            raise ValueError(f"not a Face2Search batch v{FACE2SEARCH_VERSION}: {data[:4]!r}")
+        faces, offset = [], _FACE2SEARCH_PREFIX.size
+        for _ in range(count):
+            face, offset = cls._unpack_from(data, offset)
+            faces.append(face)
+        if offset != len(data):
+            raise ValueError(f"Face2Search batch of {len(data)} bytes, expected {offset}")
+        return faces
+
+    @classmethod
+    def _unpack_from(cls, data: bytes, offset: int) -> tuple["Face2Search", int]:
+        """face of the message at offset of data and where the message ends"""
+        magic, version, uid_len = _FACE2SEARCH_PREFIX.unpack_from(data, offset)
+        if magic != FACE2SEARCH_MAGIC or version != FACE2SEARCH_VERSION:
+            raise ValueError(f"not a Face2Search message v{FACE2SEARCH_VERSION}: {data[offset:offset + 4]!r}")
+        offset += _FACE2SEARCH_PREFIX.size
+        uid = data[offset:offset + uid_len].decode('utf-8')
+        offset += uid_len
+        det_score, *kps, jpeg_len = _FACE2SEARCH_BODY.unpack_from(data, offset)
+        offset += _FACE2SEARCH_BODY.size
+        if len(data) < offset + jpeg_len:
+            raise ValueError(f"Face2Search message truncated, {len(data) - offset} of {jpeg_len} jpeg bytes")
+        face_img = cv2.imdecode(np.frombuffer(data, np.uint8, jpeg_len, offset), cv2.IMREAD_COLOR)
+        kps = np.array(kps, dtype=np.float64).reshape(5, 2)
+        return cls(face_img, None if np.isnan(kps).all() else kps, det_score, uid), offset + jpeg_len
 
     @error_handler
-    def to_schema(self) -> Face2SearchSchema:
+    def to_schema(self, quality: int = JPEG_QUALITY) -> Face2SearchSchema:
         """将 Face2Search 对象转换为 schema 对象"""
         # qt_logger.debug(f"face2search to schema:{self.bbox}")
         # qt_logger.debug(f"face2search to schema:{self.kps}")
         return Face2SearchSchema(
-            face_img=self.to_base64(),
+            face_img=self.to_base64(quality),
             kps=self.kps.tolist(),
             det_score=self.det_score,
             uid=self.uid
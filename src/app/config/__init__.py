@@ -1,2 +1,9 @@
-from .config import cfg
 from .logging_config import qt_logger
+
+
+def __getattr__(name: str):
+    """load Qt based app settings on first use, so headless runs never import Qt"""
+    if name == 'cfg':
+        from .config import cfg
+        return cfg
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
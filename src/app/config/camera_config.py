@@ -0,0 +1,48 @@
+"""
+-*- coding: utf-8 -*-
+@Organization : SupaVision
+@Author       : 18317
+@Date Created : 18/10/2026
+@Description  : camera configs, free of Qt so headless runs can import them
+"""
+from enum import Enum
+from typing import NamedTuple
+
+
+class CameraUrl(Enum):
+    """
+    url configs for camera
+    """
+    laptop: int = 0
+    usb: int = 1
+    ip: str = "http://"
+    video: str = r"C:\Users\18317\python\BoostFace_pyqt6\tests\video\friends.mp4"
+
+
+class CameraConfig(NamedTuple):
+    """
+    config for Camera
+    url is one of CameraUrl, or a device index, stream url or video file for other sources
+    """
+    fps: int = 30
+    resolution: tuple[int, ...] = (1920, 1080)
+    url: CameraUrl | int | str = CameraUrl.video
+
+    @property
+    def source(self) -> int | str:
+        """what cv2.VideoCapture opens"""
+        return self.url.value if isinstance(self.url, CameraUrl) else self.url
+
+    @property
+    def is_video(self) -> bool:
+        """video file, fps and resolution come from the file"""
+        if isinstance(self.url, CameraUrl):
+            return self.url == CameraUrl.video
+        return isinstance(self.url, str) and '://' not in self.url
+
+    @property
+    def is_stream(self) -> bool:
+        """network camera"""
+        if isinstance(self.url, CameraUrl):
+            return self.url == CameraUrl.ip
+        return isinstance(self.url, str) and '://' in self.url
@@ -1,6 +1,5 @@
 # coding:utf-8
 from enum import Enum
-from typing import NamedTuple
 
 import sys
 from PyQt6.QtCore import QLocale
@@ -17,6 +16,8 @@ from qfluentwidgets import (
     ConfigSerializer,
     __version__)
 
+from .camera_config import CameraUrl, CameraConfig
+
 
 class Language(Enum):
     """ Language enumeration """
@@ -45,25 +46,6 @@ def isWin11():
     return sys.platform == 'win32' and sys.getwindowsversion().build >= 22000
 
 
-class CameraUrl(Enum):
-    """
-    url configs for camera
-    """
-    laptop: int = 0
-    usb: int = 1
-    ip: str = "http://"
-    video: str = r"C:\Users\18317\python\BoostFace_pyqt6\tests\video\friends.mp4"
-
-
-class CameraConfig(NamedTuple):
-    """
-    config for Camera
-    """
-    fps: int = 30
-    resolution: tuple[int, ...] = (1920, 1080)
-    url: CameraUrl = CameraUrl.video
-
-
 class Config(QConfig):
     """ Config of application """
     # camera
@@ -1,7 +1,7 @@
 import logging
 import re
+import sys
 
-from src.app.common import signalBus
 from collections import defaultdict
 log_format = logging.Formatter(
     "%(asctime)s - %(levelname)s - %(message)s\n")
@@ -48,8 +48,10 @@ class DeduplicationHandler(logging.Handler):
 
 class QLoggingHandler(DeduplicationHandler):
     def deduplicated_emit(self, log_entry):
-        # 使用 Qt 信号发出日志消息
-        signalBus.log_message.emit(log_entry)
+        # 使用 Qt 信号发出日志消息, only once the app loaded signal bus, headless runs never import Qt
+        signal_bus = sys.modules.get('src.app.common.signal_bus')
+        if signal_bus is not None:
+            signal_bus.signalBus.log_message.emit(log_entry)
 
 
 class StreamDeduplicationHandler(DeduplicationHandler):
@@ -5,4 +5,17 @@
 @Date Created : 14/12/2023
 @Description  :
 """
-from .main import BoostFace
+
+
+def __getattr__(name: str):
+    """
+    load BoostFace and SourceManager on first use, so spawned detector workers importing components
+    do not import the websocket client, which logs in to the backend on import
+    """
+    if name == 'BoostFace':
+        from .main import BoostFace
+        return BoostFace
+    if name == 'SourceManager':
+        from .source_manager import SourceManager
+        return SourceManager
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,138 @@
+"""
+-*- coding: utf-8 -*-
+@Organization : SupaVision
+@Author       : 18317
+@Date Created : 18/10/2026
+@Description  : headless runner, python -m src.app.utils.boostface --help
+"""
+import argparse
+import json
+from pathlib import Path
+from timeit import default_timer as current_time
+
+import cv2
+
+from src.app.config import qt_logger
+from src.app.config.camera_config import CameraConfig
+from src.app.utils.boostface.common import ImageFaces, ChannelClosed
+from src.app.utils.boostface.latency import latency_tracker
+from src.app.utils.boostface.main import BoostFace
+
+
+class HeadlessSink:
+    """
+    last stage of a headless run, writes annotated frames to a video and faces of each frame
+    as json lines, either may be None
+    :param video_path: mp4 of annotated frames
+    :param events_path: json lines, one per frame with faces
+    :param fps: fps of written video
+    """
+
+    def __init__(self, video_path: Path | None, events_path: Path | None, fps: float):
+        self.video_path = video_path
+        self.fps = fps
+        self._writer: cv2.VideoWriter | None = None
+        self._events = events_path.open('w', encoding='utf-8') if events_path else None
+
+    def write(self, img: ImageFaces):
+        if self.video_path is not None:
+            if self._writer is None:
+                h, w = img.nd_arr.shape[:2]
+                self._writer = cv2.VideoWriter(
+                    str(self.video_path), cv2.VideoWriter.fourcc(*'mp4v'), self.fps, (w, h))
+            self._writer.write(img.nd_arr)
+        if self._events is not None:
+            self._events.write(json.dumps(self.event(img)) + '\n')
+
+    @staticmethod
+    def event(img: ImageFaces) -> dict:
+        return {
+            'seq': img.seq,
+            'faces': [{
+                'id': face.uid,
+                'bbox': [round(float(v), 1) for v in face.bbox[:4]],
+                'det_score': round(float(face.det_score), 3),
+                'name': face.match_info.name,
+                'score': round(float(face.match_info.score), 3),
+            } for face in img.faces],
+        }
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.release()
+        if self._events is not None:
+            self._events.close()
+
+
+def report(boost_face: BoostFace, frames: int, elapsed: float) -> str:
+    """one summary of throughput and latency"""
+    lines = [f"frames {frames}, {frames / elapsed:.1f} fps over {elapsed:.0f}s, "
+             f"stale {latency_tracker.stale}, skipped {latency_tracker.skipped}"]
+    for name, stats in boost_face.stats().items():
+        lines.append(f"  stage {name:<12} {stats['fps']:6.1f} fps  processed {stats['processed']}"
+                     f"  dropped {stats['dropped']}  errors {stats['errors']}")
+    for name, stats in latency_tracker.summary().items():
+        lines.append(f"  latency {name:<10} p50 {stats['p50']:7.1f}  p95 {stats['p95']:7.1f}"
+                     f"  p99 {stats['p99']:7.1f} ms  (in stage {stats['duration']:.1f} ms)")
+    return "\n".join(lines)
+
+
+def parse_source(source: str) -> int | str:
+    """device index or url / path"""
+    return int(source) if source.isdigit() else source
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(
+        prog='python -m src.app.utils.boostface',
+        description='run capture, detect, track and identify without Qt')
+    parser.add_argument('--source', default='0', help='camera index, stream url or video file')
+    parser.add_argument('--fps', type=int, default=30)
+    parser.add_argument('--resolution', type=int, nargs=2, default=(1920, 1080), metavar=('WIDTH', 'HEIGHT'))
+    parser.add_argument('--output', type=Path, help='directory for annotated.mp4 and events.jsonl')
+    parser.add_argument('--no-video', action='store_true', help='write events only')
+    parser.add_argument('--detector-workers', type=int, default=0, help='detector worker processes')
+    parser.add_argument('--report-every', type=float, default=10.0, help='seconds between summaries')
+    parser.add_argument('--max-frames', type=int, default=0, help='stop after that many frames, 0 to run on')
+    args = parser.parse_args(argv)
+
+    sink = None
+    if args.output is not None:
+        args.output.mkdir(parents=True, exist_ok=True)
+        sink = HeadlessSink(
+            None if args.no_video else args.output / 'annotated.mp4',
+            args.output / 'events.jsonl',
+            args.fps)
+
+    config = CameraConfig(fps=args.fps, resolution=tuple(args.resolution), url=parse_source(args.source))
+    boost_face = BoostFace(detector_workers=args.detector_workers, config=config)
+    qt_logger.info(f"headless run of {config}")
+    started_at = last_report = current_time()
+    frames = 0
+    try:
+        while not args.max_frames or frames < args.max_frames:
+            try:
+                img = boost_face.get_result()
+            except ChannelClosed:
+                break
+            with img.stage('sink'):
+                if sink is not None:
+                    sink.write(img)
+                img.release()
+            latency_tracker.record(img)
+            frames += 1
+            now = current_time()
+            if now - last_report >= args.report_every:
+                print(report(boost_face, frames, now - started_at), flush=True)
+                last_report = now
+    except KeyboardInterrupt:
+        pass
+    finally:
+        boost_face.stop_app()
+        if sink is not None:
+            sink.close()
+        print(report(boost_face, frames, max(current_time() - started_at, 1e-6)), flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,14 @@
 import queue
-import uuid
 from collections import deque
+from contextlib import contextmanager
 from dataclasses import dataclass
-from threading import Thread, Event
-from typing import Any
+from enum import Enum
+from threading import Thread, Event, Condition, Lock
+from timeit import default_timer as current_time
+from typing import Any, Callable, Iterable, NamedTuple
 
 import numpy as np
-from PyQt6.QtCore import QThread, pyqtSlot
 
-from src.app.common import signalBus
 from src.app.config import qt_logger
 from src.app.utils.time_tracker import time_tracker
 from src.app.common.types import Image, Bbox, Kps, Embedding, MatchedResult, Face2Search
@@ -22,7 +22,14 @@ class SignUpInfo:
 
 
 class Face:
-    """face"""
+    """
+    face, compact as a detector makes many of them per frame and most are thrown away once tracked.
+    match info, sign up info and embedding are allocated on first use
+    :ivar id: track id given by Tracker, recycled after the target is gone, -1 until tracked
+    :ivar generation: times the track id was handed out before, tells apart targets sharing a recycled id
+    """
+    __slots__ = ('bbox', 'kps', 'det_score', 'scene_scale', 'id', 'generation',
+                 '_embedding', '_match_info', '_sign_up_info')
 
     def __init__(
             self,
@@ -30,7 +37,8 @@ class Face:
             kps: Kps,
             det_score: float,
             scene_scale: tuple[int, int, int, int],
-            face_id: str | None = None
+            face_id: int = -1,
+            generation: int = 0
     ):
         """
         init a face
@@ -38,15 +46,64 @@ class Face:
         :param kps: shape [5,2]
         :param det_score:
         :param scene_scale: (x1,y1,x2,y2) of scene image
+        :param face_id: track id, -1 for a detection not tracked yet
+        :param generation: generation of track id
         """
         self.bbox: Bbox = bbox
         self.kps: Kps = kps
         self.det_score: float = det_score
         self.scene_scale: tuple[int, int, int, int] = scene_scale
-        self.embedding: Embedding = np.zeros(512)
-        self.id = face_id if face_id else str(uuid.uuid4())
-        self.match_info = MatchedResult(uid=self.id)
-        self.sign_up_info = SignUpInfo(id=face_id,name='')
+        self.id: int = face_id
+        self.generation: int = generation
+        self._embedding: Embedding | None = None
+        self._match_info: MatchedResult | None = None
+        self._sign_up_info: SignUpInfo | None = None
+
+    @property
+    def uid(self) -> str:
+        """unique id of the target for search results, track id and its generation"""
+        return f"{self.id}.{self.generation}"
+
+    def track_as(self, face_id: int, generation: int):
+        """take a track id of Tracker"""
+        self.id = face_id
+        self.generation = generation
+        if self._match_info is not None:
+            self._match_info.uid = self.uid
+
+    @property
+    def embedding(self) -> Embedding:
+        if self._embedding is None:
+            self._embedding = np.zeros(512)
+        return self._embedding
+
+    @embedding.setter
+    def embedding(self, embedding: Embedding):
+        self._embedding = embedding
+
+    @property
+    def match_info(self) -> MatchedResult:
+        if self._match_info is None:
+            self._match_info = MatchedResult(uid=self.uid)
+        return self._match_info
+
+    @match_info.setter
+    def match_info(self, match_info: MatchedResult):
+        self._match_info = match_info
+
+    @property
+    def sign_up_info(self) -> SignUpInfo:
+        if self._sign_up_info is None:
+            self._sign_up_info = SignUpInfo(id='', name='')
+        return self._sign_up_info
+
+    @sign_up_info.setter
+    def sign_up_info(self, sign_up_info: SignUpInfo):
+        self._sign_up_info = sign_up_info
+
+    def copy(self) -> "Face":
+        """new face with same detection, not tracked"""
+        return Face(self.bbox.copy(), self.kps, self.det_score, self.scene_scale)
 
     def face_image(self, scene: Image) -> Face2Search:
         """
@@ -75,7 +132,89 @@ class Face:
             face_img,
             kps,
             self.det_score,
-            self.match_info.uid)
+            self.uid)
+
+
+class PooledFrame:
+    """
+    preallocated frame buffer handed out by FramePool, reference counted,
+    goes back to the pool as soon as the last holder released it
+    :param pool: FramePool owns the buffer
+    :param buffer: image buffer
+    """
+
+    def __init__(self, pool: "FramePool", buffer: Image):
+        self.buffer: Image = buffer
+        self._pool = pool
+        self._refs = 1
+
+    def retain(self) -> "PooledFrame":
+        """add a holder"""
+        with self._pool.lock:
+            self._refs += 1
+        return self
+
+    def release(self):
+        """drop a holder, give buffer back to pool if it was the last one"""
+        with self._pool.lock:
+            self._refs -= 1
+            if self._refs == 0:
+                self._pool.give_back(self)
+            elif self._refs < 0:
+                qt_logger.warning(f"{self._pool.name}: frame released more than retained")
+
+
+class FramePool:
+    """
+    pool of preallocated frame buffers for cv2.VideoCapture.read(image=buf) to fill in place,
+    hits and misses are counted in time_tracker
+    :param shape: (height, width, 3) of frames
+    :param size: buffers kept in the pool
+    :param name: name for time_tracker counters
+    """
+
+    def __init__(self, shape: tuple[int, ...], size: int = 8, name: str = "frame_pool"):
+        self.shape = shape
+        self.size = size
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.lock = Lock()
+        self._free: list[Image] = [
+            np.empty(shape, dtype=np.uint8) for _ in range(size)]
+
+    def acquire(self) -> PooledFrame:
+        """take a free buffer, allocate a new one if pool is exhausted"""
+        with self.lock:
+            if self._free:
+                buffer = self._free.pop()
+                self.hits += 1
+                time_tracker.count(f"{self.name}.hit")
+            else:
+                buffer = np.empty(self.shape, dtype=np.uint8)
+                self.misses += 1
+                time_tracker.count(f"{self.name}.miss")
+            return PooledFrame(self, buffer)
+
+    def give_back(self, frame: PooledFrame):
+        """keep released buffer for reuse, called with self.lock held"""
+        if frame.buffer.shape == self.shape and len(self._free) < self.size:
+            self._free.append(frame.buffer)
+
+    def resize(self, shape: tuple[int, ...]):
+        """frames changed shape, drop buffers of old shape"""
+        with self.lock:
+            if shape != self.shape:
+                qt_logger.debug(f"{self.name}: resize from {self.shape} to {shape}")
+                self.shape = shape
+                self._free.clear()
+
+
+class StageTime(NamedTuple):
+    """enter and exit time of a frame in a pipeline stage, by timeit.default_timer"""
+    name: str
+    enter: float
+    exit: float
 
 
 class ImageFaces:
@@ -83,11 +222,51 @@ class ImageFaces:
     image to detect
     :param image: image
     :param faces: [face, face, ...]
+    :param frame: pooled buffer of image, ownership moves with ImageFaces until release()
+    :ivar seq: sequence number stamped by camera, -1 for images not from a camera
+    :ivar captured_at: timeit.default_timer() when camera finished reading the frame
+    :ivar stages: StageTime of stages the frame passed, in order
     """
 
-    def __init__(self, image: Image, faces: list[Face]):
+    def __init__(self, image: Image, faces: list[Face], frame: PooledFrame | None = None):
         self.nd_arr: Image = image
         self.faces: list[Face] = faces
+        self.frame: PooledFrame | None = frame
+        self.seq: int = -1
+        self.captured_at: float = 0.0
+        self.stages: list[StageTime] = []
+
+    def stamp(self, seq: int, captured_at: float) -> "ImageFaces":
+        """mark as frame seq of a camera, captured at captured_at"""
+        self.seq = seq
+        self.captured_at = captured_at
+        return self
+
+    @contextmanager
+    def stage(self, name: str):
+        """record enter and exit time of the block as stage name"""
+        enter = current_time()
+        try:
+            yield self
+        finally:
+            self.stages.append(StageTime(name, enter, current_time()))
+
+    def with_faces(self, faces: list[Face]) -> "ImageFaces":
+        """same frame with other faces, keeps buffer ownership, stamp and stages"""
+        derived = ImageFaces(self.nd_arr, faces, frame=self.frame)
+        derived.seq, derived.captured_at, derived.stages = self.seq, self.captured_at, self.stages
+        return derived
+
+    @classmethod
+    def from_frame(cls, frame: PooledFrame) -> "ImageFaces":
+        """wrap a pooled or shared memory frame without copying, ownership moves to ImageFaces"""
+        return cls(image=frame.buffer, faces=[], frame=frame)
+
+    def release(self):
+        """give pooled buffer back, nd_arr must not be used after that"""
+        if self.frame is not None:
+            frame, self.frame = self.frame, None
+            frame.release()
 
     @property
     def scale(self) -> tuple[int, int, int, int]:
@@ -97,13 +276,174 @@ class ImageFaces:
         return 0, 0, self.nd_arr.shape[1], self.nd_arr.shape[0]
 
 
+class ChannelPolicy(Enum):
+    """
+    what FrameChannel does when the producer is faster than the consumer
+    :cvar LATEST: consumer always takes the newest item, older ones are dropped
+    :cvar DROP_OLDEST: fifo, the oldest item is evicted when the channel is full
+    :cvar BLOCK: fifo, the producer waits until the consumer makes room
+    """
+    LATEST = "latest"
+    DROP_OLDEST = "drop_oldest"
+    BLOCK = "block"
+
+
+class ChannelClosed(Exception):
+    """
+    FrameChannel is closed, no more items will come
+    """
+
+
+class FrameChannel:
+    """
+    bounded blocking channel between pipeline stages, keeps latency bounded however slow the consumer is
+    append() to produce, get() to wait for an item, popleft() to take one without waiting
+    :param maxlen: max items kept in the channel
+    :param policy: ChannelPolicy
+    :param name: name for logs and time_tracker
+    :param on_drop: called for every item dropped without being consumed
+    :ivar dropped: items dropped without being consumed
+    :ivar max_depth: high watermark of depth
+    """
+
+    def __init__(
+            self,
+            maxlen: int = 2,
+            policy: ChannelPolicy = ChannelPolicy.LATEST,
+            name: str = "channel",
+            on_drop: Callable[[Any], None] | None = None):
+        if maxlen < 1:
+            raise ValueError(f"maxlen of {name} should be >= 1, got {maxlen}")
+        self.maxlen = maxlen
+        self.policy = policy
+        self.name = name
+        self.dropped = 0
+        self.max_depth = 0
+        self._on_drop = on_drop
+        self._listeners: list[Callable[[], None]] = []
+        self._items: deque = deque()
+        self._closed = False
+        self._lock = Lock()
+        self._not_empty = Condition(self._lock)
+        self._not_full = Condition(self._lock)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @property
+    def depth(self) -> int:
+        """items waiting in the channel"""
+        return len(self._items)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def append(self, item: Any):
+        """
+        put item into channel according to policy and wake up a waiting consumer
+        :exception ChannelClosed: channel closed, or closed while waiting for room
+        """
+        with self._lock:
+            if self.policy == ChannelPolicy.BLOCK:
+                while len(self._items) >= self.maxlen and not self._closed:
+                    self._not_full.wait()
+            if self._closed:
+                raise ChannelClosed(self.name)
+            if len(self._items) >= self.maxlen:
+                self._drop(self._items.popleft())
+            self._items.append(item)
+            self.max_depth = max(self.max_depth, len(self._items))
+            self._not_empty.notify()
+        for listener in self._listeners:
+            listener()
+
+    def add_listener(self, listener: Callable[[], None]):
+        """listener called after every append, for consumers waiting on many channels"""
+        self._listeners.append(listener)
+
+    def get(self, timeout: float | None = None) -> Any:
+        """
+        wait until an item arrives, for ChannelPolicy.LATEST take the newest one and drop the rest
+        :param timeout: seconds to wait, None for forever
+        :exception queue.Empty: nothing arrived in timeout
+        :exception ChannelClosed: channel closed and drained
+        """
+        with self._lock:
+            if not self._not_empty.wait_for(
+                    lambda: self._items or self._closed, timeout):
+                raise queue.Empty(self.name)
+            return self._take()
+
+    def popleft(self) -> Any:
+        """
+        take next item without waiting, for ChannelPolicy.LATEST the newest one and drop the rest
+        :exception IndexError: channel is empty
+        """
+        with self._lock:
+            if not self._items:
+                raise IndexError(f"{self.name} is empty")
+            return self._take()
+
+    def clear(self):
+        """drop all items"""
+        with self._lock:
+            self._drop_all()
+            self._not_full.notify_all()
+
+    def close(self):
+        """close channel, wake up all waiting producers and consumers right away"""
+        with self._lock:
+            self._closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+
+    def _take(self) -> Any:
+        """take item with lock held"""
+        if not self._items:
+            raise ChannelClosed(self.name)
+        if self.policy == ChannelPolicy.LATEST:
+            item = self._items.pop()
+            self._drop_all()
+        else:
+            item = self._items.popleft()
+        self._not_full.notify()
+        return item
+
+    def _drop(self, item: Any):
+        """drop item with lock held"""
+        self.dropped += 1
+        if self._on_drop is not None:
+            self._on_drop(item)
+
+    def _drop_all(self):
+        """drop all items with lock held"""
+        while self._items:
+            self._drop(self._items.popleft())
+
+    def __repr__(self):
+        return (f"FrameChannel({self.name}, policy={self.policy.value}, depth={self.depth}/{self.maxlen}, "
+                f"max_depth={self.max_depth}, dropped={self.dropped}, closed={self._closed})")
+
+
+def release_dropped(item: Any):
+    """on_drop of channels carrying ImageFaces, give pooled buffers of dropped frames back"""
+    if isinstance(item, ImageFaces):
+        item.release()
+
+
 class ThreadBase(Thread):
     """CameraBase thread"""
 
-    def __init__(self):
+    def __init__(
+            self,
+            maxlen: int = 2,
+            policy: ChannelPolicy = ChannelPolicy.LATEST):
         super().__init__()
-        self._jobs_queue = deque(maxlen=1000)
-        self._result_queue = deque(maxlen=1000)
+        self._jobs_queue = FrameChannel(
+            maxlen, policy, name=f"{self.__class__.__name__}.jobs", on_drop=release_dropped)
+        self._result_queue = FrameChannel(
+            maxlen, policy, name=f"{self.__class__.__name__}.result", on_drop=release_dropped)
         self._is_running = Event()
         self._is_sleeping = Event()
         self._is_running.set()
@@ -118,11 +458,11 @@ class ThreadBase(Thread):
         pass
 
     @property
-    def result_queue(self):
+    def result_queue(self) -> FrameChannel:
         """result_queue"""
         return self._result_queue
 
-    def connect_jobs_queue(self, result_queue: deque):
+    def connect_jobs_queue(self, result_queue: FrameChannel):
         """connect jobs_queue"""
         self._jobs_queue = result_queue
 
@@ -135,121 +475,44 @@ class ThreadBase(Thread):
         self._is_sleeping.clear()
 
     def stop(self):
-        """release camera and kill thread """
+        """release camera and kill thread, threads waiting on channels are woken up right away"""
         self._is_sleeping.set()
         self._is_running.clear()
+        self._jobs_queue.close()
+        self._result_queue.close()
 
 
-class ClosableQueue(queue.Queue):
+class WorkingThread(Thread):
     """
-    A Queue that can be closed. This queue allows items to be added and removed, but
-    can be closed when no more items are expected. When closed, the iterator stops yielding
-    new items after draining existing items in the queue.
-
-    :param task_name: Name of the task associated with the queue.
-    :param maxsize: Maximum size of the queue. Defaults to 100.
-    :param wait_time: Time to wait for an item before closing the queue. Defaults to 5 seconds.
+    long running consumer thread, takes jobs until they run out and hands each to work,
+    jobs and work are handed in by the owner, like a Stage of Pipeline
+    :param works_name: name of thread
+    :param jobs: iterable of jobs, ends when there are no more jobs
+    :param work: called with each job, errors are logged and the next job is taken
+    :param on_done: called once jobs ran out
     """
 
-    def __init__(self, task_name: str, maxsize: int = 100, wait_time: int = 5):
-        super().__init__(maxsize=maxsize)
-        self._task_name = task_name
-        self._closed = False
-        self._wait_time = wait_time
-
-    def close(self):
-        """
-        Mark the queue as closed.
-        """
-        self._closed = True
-
-    def __iter__(self):
-        """
-        Provide an iterator over items in the queue. The iterator will end when the queue
-        is closed and empty.
-        """
-        while not self._closed or not self.empty():
-            with time_tracker.track(f"ClosableQueue.__iter__ task {self._task_name}"):
-                try:
-                    item = self.get(timeout=self._wait_time)
-                    yield item
-                except queue.Empty:
-                    qt_logger.warn(
-                        f"{self._task_name} queue: Waiting for {self._wait_time} sec, no item received. Closing.")
-                    self.close()
-                    break
-                except Exception as e:
-                    qt_logger.error(
-                        f"{self._task_name} queue: Error while getting item from queue: {e}")
-                    break
-
-
-class WorkingThread(QThread):
-    """long time prod_cons task in a thread and auto get queues
-    running by  signalBus.is_identify_running
-    """
-    threads = 0
-    prod_cons_queues = [
-        ClosableQueue(task_name='read_2_detect'),
-        ClosableQueue(task_name='detected_2_identify'),
-        ClosableQueue(task_name='identified_2_draw'),
-    ]
-
-    def __init__(self, works_name: str, is_consumer=True):
-        super().__init__()
+    def __init__(
+            self,
+            works_name: str,
+            jobs: Iterable[Any],
+            work: Callable[[Any], None],
+            on_done: Callable[[], None] | None = None):
+        super().__init__(name=works_name, daemon=True)
         self.works_name = works_name
-        self._is_consumer = is_consumer
-        # get queues
-        if self._is_consumer:
-            # only for consumer consume jobs
-            self.jobs_queue = self.get_queues()
-
-        self.result_queue = self.get_queues()
-
-        self._is_running = True
-
-        # control all working thread
-        signalBus.is_identify_running.connect(self._update_working)
-
-    def produce(self) -> Any:
-        """produce"""
-        raise NotImplementedError
-
-    def consume(self, item: Any):
-        """consume"""
-        if self._is_consumer:
-            raise NotImplementedError
-
-    def stop_thread(self):
-        self._is_running = False
-        self.wait()
+        self._jobs = jobs
+        self._work = work
+        self._on_done = on_done
 
     def run(self):
         """running long time task in a thread"""
         qt_logger.info(f"{self.works_name} start")
-        while self._is_running:
+        for job in self._jobs:
             with time_tracker.track(f"WorkingThread.run task {self.works_name}"):
                 try:
-                    if self._is_consumer:
-                        # continue to consume until queue is empty for a while
-                        for item in self.jobs_queue:
-                            self.consume(item)
-                    else:
-                        # continue to produce until queue is full
-                        self.result_queue.put(self.produce())
+                    self._work(job)
                 except Exception as e:
-                    qt_logger.error(f"WorkingThread.run error:{e}")
-                    break
+                    qt_logger.error(f"WorkingThread.run {self.works_name} error:{e}")
+        if self._on_done is not None:
+            self._on_done()
         qt_logger.info(f"{self.works_name} stop")
-
-    @classmethod
-    def get_queues(cls) -> ClosableQueue:
-        """distribution queues for working thread"""
-        _queue = cls.prod_cons_queues[cls.threads]
-        cls.threads += 1
-        return _queue
-
-    @pyqtSlot(bool)
-    def _update_working(self, is_running: bool):
-        """slot to accept signal to update working state"""
-        self._is_running = is_running
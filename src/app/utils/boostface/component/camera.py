@@ -6,17 +6,19 @@
 @Description  :
 """
 from collections import deque
+from dataclasses import dataclass
 from threading import Thread, Event
+from timeit import default_timer as current_time
 
 import cv2
 from time import sleep
 
-from src.app.config import cfg
 from src.app.config import qt_logger
-from src.app.config.config import CameraUrl, CameraConfig
+from src.app.config.camera_config import CameraConfig
 from src.app.utils.decorator import error_handler, calm_down
 from src.app.utils.time_tracker import time_tracker
-from src.app.utils.boostface.common import ImageFaces, ThreadBase
+from src.app.utils.boostface.common import ImageFaces, ThreadBase, ChannelClosed, FramePool, StageTime
+from src.app.utils.boostface.shared_memory import SharedFramePool
 
 
 class CameraOpenError(Exception):
@@ -32,15 +34,18 @@ class CameraOpenError(Exception):
 class CameraBase:
     """config for camera"""
 
-    def __init__(self, config: CameraConfig = CameraConfig(
-            fps=cfg.cameraFps.value, url=cfg.cameraDevice.value)):
+    def __init__(self, config: CameraConfig | None = None):
         """
         cmd 运行setx OPENCV_VIDEOIO_PRIORITY_MSMF 0后重启，可以加快摄像头打开的速度
-        :param config: CameraOptions()
+        :param config: CameraOptions(), None for the one in app settings
         """
+        if config is None:
+            # app settings live in Qt config, only loaded when no config is given
+            from src.app.config import cfg
+            config = CameraConfig(fps=cfg.cameraFps.value, url=cfg.cameraDevice.value)
         self.config = config
-        self.videoCapture = cv2.VideoCapture(self.config.url.value)
-        if config.url != CameraUrl.video:
+        self.videoCapture = cv2.VideoCapture(self.config.source)
+        if not config.is_video:
             self._prepare()
         qt_logger.debug(f"camera init success, {self}")
 
@@ -94,17 +99,69 @@ class CameraBase:
         return repr_string
 
 
+@dataclass
+class GrabberStats:
+    """
+    frames counted in grabber mode
+    :ivar grabbed: frames pulled from the stream by grab()
+    :ivar decoded: frames decoded by retrieve() as consumer asked for one
+    """
+    grabbed: int = 0
+    decoded: int = 0
+
+    @property
+    def dropped(self) -> int:
+        """frames grabbed but never decoded"""
+        return self.grabbed - self.decoded
+
+
 class Camera(ThreadBase):
-    """Camera component"""
+    """
+    Camera component
+    :param config: CameraConfig, None for the one in app settings
+    :param pool_size: preallocated frame buffers, frames read in place into them
+    :param grabber: grab() continuously and retrieve() only newest frame on demand,
+     None for auto, enabled for ip camera so opencv buffer never lags behind real time
+    :param shared_memory: read frames into a SharedFramePool, so stages in other processes
+     read the same buffer instead of a copy
+    """
 
-    def __init__(self):
+    def __init__(
+            self,
+            config: CameraConfig | None = None,
+            pool_size: int = 8,
+            grabber: bool | None = None,
+            shared_memory: bool = False):
         super().__init__()
-        self._camera_base = CameraBase()
+        self._camera_base = CameraBase(config)
         self._camera = self._camera_base.videoCapture
+        self._pool = SharedFramePool(self._frame_shape, pool_size, name="camera.shared_pool") \
+            if shared_memory else FramePool(self._frame_shape, pool_size, name="camera.frame_pool")
+        self._grabber = self._camera_base.config.is_stream if grabber is None else grabber
+        self.grabber_stats = GrabberStats()
+        self._seq = 0
         super().start()
 
+    @property
+    def _frame_shape(self) -> tuple[int, int, int]:
+        """(height, width, 3) of frames read, fall back to config before camera reports it"""
+        width = int(self._camera.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(self._camera.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        if width <= 0 or height <= 0:
+            width, height = self._camera_base.config.resolution[:2]
+        return height, width, 3
+
     @error_handler
     def run(self):
+        if self._grabber:
+            self._run_grabber()
+        else:
+            self._run_reader()
+        # no more frames, consumers drain what is left and stop
+        self._result_queue.close()
+
+    def _run_reader(self):
+        """read() frames at most every 30ms while awake"""
         while self._is_running.is_set():
             with time_tracker.track("camera.run"):
                 try:
@@ -112,29 +169,87 @@ class Camera(ThreadBase):
                         self._is_sleeping.wait()
                         img = self._read()
                         self._result_queue.append(img)
-                except CameraOpenError:
+                except (CameraOpenError, ChannelClosed):
                     break
 
+    def _run_grabber(self):
+        """
+        grab() every frame as it arrives so opencv buffer never fills up,
+        decode by retrieve() only when consumer has taken the previous frame,
+        keep grabbing while sleeping so the stream is fresh on wake up
+        """
+        self._camera.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        while self._is_running.is_set():
+            with time_tracker.track("camera.grab"):
+                if not self._camera.grab():
+                    qt_logger.error(f"camera grab failed, {self.grabber_stats}")
+                    break
+                self.grabber_stats.grabbed += 1
+                if not self._is_sleeping.is_set() or self._result_queue.depth > 0:
+                    continue
+                try:
+                    img = self._retrieve()
+                    self._result_queue.append(img)
+                except (CameraOpenError, ChannelClosed):
+                    break
+        time_tracker.count("camera.grabbed", self.grabber_stats.grabbed)
+        time_tracker.count("camera.decoded", self.grabber_stats.decoded)
+        time_tracker.count("camera.grab_dropped", self.grabber_stats.dropped)
+        qt_logger.debug(f"camera grabber stopped, {self.grabber_stats}")
+
     def stop(self):
         super().stop()
         self._camera.release()
         self.join()
+        if isinstance(self._pool, SharedFramePool):
+            self._pool.close()
         qt_logger.debug("camera stopped")
 
     @time_tracker.track_func
     def _read(self) -> ImageFaces:
         """
-        read a Image from url by opencv.VideoCapture.read()
+        read a Image from url by opencv.VideoCapture.read() into a pooled buffer,
+        stamped with sequence number and capture time
         :exception CameraOpenError
         :return: ImageFaces
         """
+        return self._fill_pooled(self._camera.read)
 
-        ret, frame = self._camera.read()
-        if ret is None or frame is None:
-            error_msg = f"in {self}.read()  self.videoCapture.read() get None"
-            qt_logger.error(f"camera._read with CameraOpenError{error_msg}")
+    @time_tracker.track_func
+    def _retrieve(self) -> ImageFaces:
+        """
+        decode the last grabbed frame by opencv.VideoCapture.retrieve() into a pooled buffer
+        :exception CameraOpenError
+        :return: ImageFaces
+        """
+        img = self._fill_pooled(self._camera.retrieve)
+        self.grabber_stats.decoded += 1
+        return img
+
+    def _fill_pooled(self, read_func) -> ImageFaces:
+        """
+        :param read_func: VideoCapture.read or VideoCapture.retrieve
+        :exception CameraOpenError
+        """
+        enter = current_time()
+        pooled = self._pool.acquire()
+        ret, frame = read_func(image=pooled.buffer)
+        if not ret or frame is None:
+            pooled.release()
+            error_msg = f"in {self}.{read_func.__name__}()  self.videoCapture.{read_func.__name__}() get None"
+            qt_logger.error(f"camera.{read_func.__name__} with CameraOpenError{error_msg}")
             raise CameraOpenError(error_msg)
-        return ImageFaces(image=frame, faces=[])
+        if frame is not pooled.buffer:
+            # opencv reallocated as frame shape changed, pool follows the new shape
+            pooled.release()
+            self._pool.resize(frame.shape)
+            img = ImageFaces(image=frame, faces=[])
+        else:
+            img = ImageFaces.from_frame(pooled)
+        captured_at = current_time()
+        img.stages.append(StageTime("camera", enter, captured_at))
+        self._seq += 1
+        return img.stamp(self._seq, captured_at)
 
 
 
@@ -5,28 +5,39 @@
 @Date Created : 14/12/2023
 @Description  :
 """
+import queue
 from pathlib import Path
-from time import sleep
+from typing import Callable
 
+from src.app.common.types import Bbox
 from src.app.config import qt_logger
-from src.app.utils.boostface.common import ImageFaces, Face, ThreadBase
-from ..model_zoo.model_router import get_model
+from src.app.utils.boostface.common import ImageFaces, Face, ThreadBase, ChannelClosed
+from .motion_gate import MotionGate
+from .roi_detector import RoiDetector
+from ..model_zoo.model_router import get_model, SessionConfig
 from ...decorator import error_handler
 from ...time_tracker import time_tracker
 
+# det_thresh of detectors feeding a Tracker, which keeps targets alive on detections down to it
+TRACKING_DET_THRESH = 0.1
+
 
 class DetectorBase:
     """
     scrfd det_2.5g.onnx with onnxruntime
     """
 
-    def __init__(self):
+    def __init__(self, session_config: SessionConfig = SessionConfig(), det_thresh: float = 0.5):
+        """
+        :param session_config: SessionConfig of onnxruntime
+        :param det_thresh: min score of detections, TRACKING_DET_THRESH for detections a Tracker consumes
+        """
         root = Path(__file__).parents[1] / \
             'model_zoo' / 'models' / 'det_2.5g.onnx'
         self.detector_model = get_model(root, providers=(
-            'CUDAExecutionProvider', 'CPUExecutionProvider'))
+            'CUDAExecutionProvider', 'CPUExecutionProvider'), session_config=session_config)
         prepare_params = {'ctx_id': 0,
-                          'det_thresh': 0.5,
+                          'det_thresh': det_thresh,
                           'input_size': (320, 320)}
         self.detector_model.prepare(**prepare_params)
 
@@ -40,6 +51,28 @@ class DetectorBase:
         detect_params = {'max_num': 0, 'metric': 'default'}
         bboxes, kpss = self.detector_model.detect(
             img2detect.nd_arr, **detect_params)
+        return self.fill_faces(img2detect, bboxes, kpss)
+
+    @time_tracker.track_func
+    def run_onnx_batch(self, imgs2detect: list[ImageFaces]) -> list[ImageFaces]:
+        """
+        run onnx model on many images by one inference call
+        :param imgs2detect:
+        :return: Image2Detect with faces for each
+        """
+        detect_params = {'max_num': 0, 'metric': 'default'}
+        detected = self.detector_model.detect_batch(
+            [img2detect.nd_arr for img2detect in imgs2detect], **detect_params)
+        return [self.fill_faces(img2detect, bboxes, kpss)
+                for img2detect, (bboxes, kpss) in zip(imgs2detect, detected)]
+
+    @staticmethod
+    def fill_faces(img2detect: ImageFaces, bboxes, kpss) -> ImageFaces:
+        """
+        add detections to img2detect.faces
+        :param bboxes: shape [n,5], x1,y1,x2,y2,score
+        :param kpss: shape [n,5,2] or None
+        """
         for i in range(bboxes.shape[0]):
             kps = kpss[i] if kpss is not None else None
             bbox = bboxes[i, 0:4]
@@ -58,19 +91,35 @@ class DetectorBase:
 
 
 class Detector(ThreadBase):
-    def __init__(self):
+    """
+    :param wait_time: max seconds to wait for a job before checking running state again
+    :param motion_gated: skip detection on static scenes by MotionGate
+    :param roi_provider: predicted bboxes of tracked targets, detect only around them between
+     full-frame passes by RoiDetector, None to detect full frames only
+    :param det_thresh: min score of detections
+    """
+
+    def __init__(
+            self,
+            wait_time: float = 1.0,
+            motion_gated: bool = True,
+            roi_provider: Callable[[], list[Bbox]] | None = None,
+            det_thresh: float = 0.5):
         super().__init__()
-        self.detector = DetectorBase()
+        self.detector = DetectorBase(det_thresh=det_thresh)
+        self.motion_gate: MotionGate | None = MotionGate() if motion_gated else None
+        self.roi_detector: RoiDetector | None = RoiDetector(
+            self.detector, roi_provider) if roi_provider else None
+        self._wait_time = wait_time
         super().start()
 
     @time_tracker.track_func
     def produce(self) -> ImageFaces:
-        while True:
-            try:
-                return self._result_queue.popleft()
-            except IndexError:
-                # qt_logger.debug("detector._result_queue is empty")
-                sleep(0.02)
+        """
+        wait for next detected image
+        :exception ChannelClosed: detector stopped
+        """
+        return self._result_queue.get()
 
     @error_handler
     def run(self):
@@ -78,10 +127,23 @@ class Detector(ThreadBase):
 
             self._is_sleeping.wait()
             try:
-                img2detect = self._jobs_queue.popleft()
-            except IndexError:
-                # qt_logger.debug("detector._jobs_queue is empty")
-                sleep(0.02)
-            else:
-                img2detect = self.detector.run_onnx(img2detect)
+                img2detect = self._jobs_queue.get(timeout=self._wait_time)
+            except queue.Empty:
+                continue
+            except ChannelClosed:
+                break
+            with img2detect.stage("detector"):
+                img2detect = self._detect(img2detect)
+            try:
                 self._result_queue.append(img2detect)
+            except ChannelClosed:
+                break
+        # no more frames, consumers drain what is left and stop
+        self._result_queue.close()
+        qt_logger.debug(f"detector stopped, {self.motion_gate}, {self.roi_detector}")
+
+    def _detect(self, img2detect: ImageFaces) -> ImageFaces:
+        run_onnx = self.roi_detector.run_onnx if self.roi_detector else self.detector.run_onnx
+        if self.motion_gate is None:
+            return run_onnx(img2detect)
+        return self.motion_gate.run(run_onnx, img2detect)
@@ -1,12 +1,13 @@
+from collections import deque
+
 import numpy as np
 
-from src.app.common import signalBus
-from src.app.common.client.web_socket import WebSocketClient
 from src.app.config import qt_logger
 from src.app.utils.time_tracker import time_tracker
-from src.app.common.types import Bbox, Kps, MatchedResult, IdentifyResult
+from src.app.common.types import Bbox, Kps, MatchedResult, IdentifyResult, JPEG_QUALITY
 from src.app.utils.boostface.common import Face, ImageFaces
-from .sort_plus import associate_detections_to_trackers, KalmanBoxTracker
+from .identify_scheduler import IdentifyScheduler, RECOGNITION_SIDE
+from .sort_plus import associate_detections_to_trackers, KalmanBoxBank
 from ...decorator import calm_down
 
 
@@ -16,39 +17,41 @@ class Target:
     :ivar _hit_streak: frames of keeping existing in screen
     :ivar _frames_since_update: frames of keeping missing in screen
     :ivar face: Face
-    :ivar _frames_since_identified: frames since reced
-    :ivar _tracker: KalmanBoxTracker
+    :ivar slot: slot of its track in KalmanBoxBank of Tracker
+    :ivar confirmed: if the target was ever in screen, tentative ones may be false detections
     """
+    __slots__ = ('_hit_streak', '_frames_since_update', 'face', '_kalman', 'slot', 'confirmed')
 
-    def __init__(self, face: Face):
+    def __init__(self, face: Face, kalman: KalmanBoxBank):
 
         self._hit_streak = 0  # frames of keeping existing in screen
         self._frames_since_update = 0  # frames of keeping missing in screen
-        self._frames_since_identified = 0
         self.face: Face = face
-        self._tracker: KalmanBoxTracker = KalmanBoxTracker(face.bbox)
+        self._kalman = kalman
+        self.slot: int = kalman.add(face.bbox)
+        self.confirmed = False
 
     @property
-    def rec_satified(self) -> bool:
-        if self._scale_satisfied and not self._if_matched and self.in_screen:
-            return True
-        elif self._if_matched and self._scale_satisfied and self._time_satisfied and self.in_screen:
-            return True
-        else:
-            return False
+    def identify_candidate(self) -> bool:
+        """if a crop of the target in this frame is worth identifying, IdentifyScheduler decides when"""
+        return self.in_screen and self._scale_satisfied
+
+    @property
+    def identified(self) -> bool:
+        return self._if_matched
 
     def update_pos(self, bbox: Bbox, kps: Kps, score: float):
         self.face.bbox = bbox
         self.face.kps = kps
         self.face.det_score = score
 
-    def update_tracker(self, bbox: Bbox):
+    def matched(self):
         """
-        update tracker with bbox, and update state of continuation
+        update state of continuation, Tracker updates its track in KalmanBoxBank
         """
         self._frames_since_update = 0
         self._hit_streak += 1
-        self._tracker.update(bbox)
+        self.confirmed = self.confirmed or self.in_screen
 
     def unmatched(self):
         """
@@ -64,6 +67,11 @@ class Target:
         """
         return self._frames_since_update > max_age
 
+    @property
+    def updated(self) -> bool:
+        """if the target was matched or created by detections of the last frame"""
+        return self._frames_since_update == 0
+
     @property
     def in_screen(self, min_hits=3) -> bool:
         """
@@ -73,22 +81,6 @@ class Target:
         return self._hit_streak >= min_hits
         # return True
 
-    @property
-    def get_predicted_tar(self) -> Face:
-        """
-        get predicted Face by tracker
-        :return:
-        """
-        # get predicted bounding box from Kalman Filter
-        bbox = self._tracker.predict()[0]
-        predicted_face: Face = Face(
-            bbox,
-            self.face.kps,
-            self.face.det_score,
-            face_id=self.face.id,
-            scene_scale=self.face.scene_scale)
-        return predicted_face
-
     @property
     def name(self) -> str:
         if self._if_matched:
@@ -96,21 +88,6 @@ class Target:
         else:
             return f'target[{self.face.id}]'
 
-    @property
-    def _time_satisfied(self) -> bool:
-        """
-        Checks if the time(frames) elapsed since the target was last identified exceeds a predefined threshold.
-        """
-        frames_threshold = 100  # almost 3 sec if fps=30
-        if not self._if_matched:
-            return False
-        elif self._frames_since_identified < frames_threshold:
-            self._frames_since_identified += 1
-            return False
-        else:
-            self._frames_since_identified = 0
-            return True
-
     @property
     def _scale_satisfied(self) -> bool:
         """
@@ -131,22 +108,56 @@ class Target:
 
 class Tracker:
     """
-    tracker for a single target
+    tracker for a single target.
+    detections of high score are associated with targets first, the targets left are associated
+    with detections of low score, like ByteTrack, so a face whose score dips for a few frames keeps
+    its target instead of being reborn and identified again. only high score detections start targets
     :param max_age: del as frames not matched
     :param iou_threshold: for Hungarian algorithm
+    :param high_thresh: min det_score of detections associated first and starting targets
+    :param low_iou_threshold: for associating detections of low score, stricter as they are less certain
+    :ivar low_matches: targets kept alive by detections of low score
     """
 
     def __init__(
             self,
             max_age=10,
-            iou_threshold=0.3
+            iou_threshold=0.3,
+            high_thresh=0.5,
+            low_iou_threshold=0.5
     ):
         super().__init__()
 
-        self._targets: dict[str, Target] = {}
+        self._targets: dict[int, Target] = {}
         self.max_age = max_age
         self.iou_threshold = iou_threshold
-        self._recycled_ids = []
+        self.high_thresh = high_thresh
+        self.low_iou_threshold = low_iou_threshold
+        self.low_matches = 0
+        # track ids of removed targets, handed out again oldest first so a reused id is rarely fresh
+        self._recycled_ids: deque[int] = deque()
+        # generation of each track id handed out, index is the id
+        self._generations: list[int] = []
+        # tracks of all targets, predicted and updated in batch
+        self._kalman = KalmanBoxBank()
+        # read-only [n,4] bboxes of targets a frame ahead, replaced as a whole after every update,
+        # so other threads never see targets or tracks changing
+        self._predicted_rois: np.ndarray = np.empty((0, 4))
+
+    def predicted_rois(self) -> list[Bbox]:
+        """
+        bboxes of alive targets predicted for the next frame, as of the last update,
+        for RoiDetector on detector thread
+        """
+        return list(self._predicted_rois)
+
+    def track(self, image2track: ImageFaces) -> list[Target]:
+        """
+        update targets with detections of a frame, without identifying them
+        :return: targets matched or created by detections of this frame
+        """
+        self._update(image2track)
+        return [tar for tar in self._targets.values() if tar.updated]
 
     @time_tracker.track_func
     def _update(self, image2update: ImageFaces):
@@ -154,70 +165,124 @@ class Tracker:
         according to the "memory" in Kalman tracker update former targets info by Hungarian algorithm
         :param image2update:
         """
-        detected_tars: list[Face] = image2update.faces
+        detected_tars: list[Face] = [face for face in image2update.faces if face.det_score >= self.high_thresh]
+        low_tars: list[Face] = [face for face in image2update.faces if face.det_score < self.high_thresh]
 
         if self._targets:
-            predicted_tars: list[Face] = self._clean_dying()
+            predicted_tars, predicted_bboxes = self._clean_dying()
             # match predicted and detected
             matched, unmatched_det_tars, unmatched_pred_tars = associate_detections_to_trackers(
-                detected_tars, predicted_tars, self.iou_threshold)
+                detected_tars, predicted_tars, self.iou_threshold, predicted_bboxes)
+            # targets left keep alive on detections of low score
+            if low_tars and unmatched_pred_tars:
+                low_matched, _, unmatched_pred_tars = associate_detections_to_trackers(
+                    low_tars, unmatched_pred_tars, self.low_iou_threshold,
+                    self._kalman.bboxes(np.array([tar.slot for tar in unmatched_pred_tars])))
+                self.low_matches += len(low_matched)
+                matched += low_matched
 
             # update pred_tar with matched detected tar
             for pred_tar, detected_tar in matched:
-                self._targets[pred_tar.id].update_pos(
+                pred_tar.update_pos(
                     detected_tar.bbox, detected_tar.kps, detected_tar.det_score)
-
-                self._targets[pred_tar.id].update_tracker(detected_tar.bbox)
+                pred_tar.matched()
+            # correct tracks of all matched targets at once
+            if matched:
+                self._kalman.update(
+                    np.array([pred_tar.slot for pred_tar, _ in matched]),
+                    np.array([detected_tar.bbox[:4] for _, detected_tar in matched]))
 
             # update  state of continuation of  unmatched_pred_tars
             for unmatched_tar in unmatched_pred_tars:
-                self._targets[unmatched_tar.id].unmatched()
+                unmatched_tar.unmatched()
 
         else:
             unmatched_det_tars: list[Face] = detected_tars
 
         # add new targets
         for detected_tar in unmatched_det_tars:
-            self._targets[detected_tar.id] = Target(face=detected_tar)
+            detected_tar.track_as(*self._new_id())
+            self._targets[detected_tar.id] = Target(face=detected_tar, kalman=self._kalman)
 
         self._clear_dead()
+        self._publish_rois()
 
-    def _clean_dying(self) -> list[Face]:
+    def _publish_rois(self):
+        """snapshot bboxes of alive targets a frame ahead for predicted_rois"""
+        rois = self._kalman.predicted_bboxes(np.array([tar.slot for tar in self._targets.values()], dtype=int))
+        rois = rois[~np.isnan(rois).any(axis=1)]
+        rois.flags.writeable = False
+        self._predicted_rois = rois
+
+    def _clean_dying(self) -> tuple[list[Target], np.ndarray]:
         """
-        clean dying targets from tracker prediction
-        :return tracker predictions
+        predict tracks of all targets by a frame, clean dying targets whose prediction broke
+        :return targets alive and their predicted bboxes
         """
-        predicted_tars: list[Face] = []
-        for tar in self._targets.values():
-            raw_tar: Face = tar.get_predicted_tar
-            # store key in self.self._targets.values()
-            pos = raw_tar.bbox
-            if np.any(np.isnan(pos)):
-                qt_logger.debug(f"tracker remove {tar.face.id} due to nan")
-                del self._targets[tar.face.id]
-            else:
-                # got new predict tars
-                predicted_tars.append(raw_tar)
-        return predicted_tars
+        self._kalman.predict()
+        targets = list(self._targets.values())
+        predicted_bboxes = self._kalman.bboxes(np.array([tar.slot for tar in targets], dtype=int))
+        broken = np.isnan(predicted_bboxes).any(axis=1)
+        if not broken.any():
+            return targets, predicted_bboxes
+        for tar in (tar for tar, nan in zip(targets, broken) if nan):
+            qt_logger.debug(f"tracker remove {tar.face.id} due to nan")
+            self._remove(tar)
+        return [tar for tar, nan in zip(targets, broken) if not nan], predicted_bboxes[~broken]
+
+    def _new_id(self) -> tuple[int, int]:
+        """
+        track id and its generation for a new target, a recycled id if any
+        """
+        if self._recycled_ids:
+            face_id = self._recycled_ids.popleft()
+            self._generations[face_id] += 1
+        else:
+            face_id = len(self._generations)
+            self._generations.append(0)
+        return face_id, self._generations[face_id]
+
+    def _remove(self, tar: Target):
+        del self._targets[tar.face.id]
+        self._kalman.remove(tar.slot)
+        self._recycled_ids.append(tar.face.id)
 
     def _clear_dead(self):
         """
         clear dead targets
         """
-        keys = []
+        dead = []
         for tar in self._targets.values():
             # remove dead targets
             if tar.old_enough(self.max_age):
-                keys.append(tar.face.id)
-        for k in keys:
-            qt_logger.debug(f"tracker remove {k} due to old enough")
-            del self._targets[k]
+                dead.append(tar)
+        for tar in dead:
+            qt_logger.debug(f"tracker remove {tar.face.id} due to old enough")
+            self._remove(tar)
 
 
 class Identifier(Tracker):
-    def __init__(self):
+    """
+    tracker identifying its targets by the identify websocket
+    :param scheduler: IdentifyScheduler deciding which crops to send, default one if None
+    :param batch_size: crops sent in one message at most, if the server takes batches
+    :param batch_linger: seconds a crop waits for others to fill its batch at most
+    :param encode_workers: threads encoding crops off the websocket loop
+    :param jpeg_quality: quality of crop jpegs
+    :param max_side: crops are scaled down to this longer side before encoding, None to keep them
+    """
+
+    def __init__(self, scheduler: IdentifyScheduler | None = None,
+                 batch_size: int = 16, batch_linger: float = 0.005,
+                 encode_workers: int = 2, jpeg_quality: int = JPEG_QUALITY,
+                 max_side: int | None = 2 * RECOGNITION_SIDE):
         super().__init__()
-        self.indentify_client = WebSocketClient("identify")
+        self.scheduler = scheduler if scheduler is not None else IdentifyScheduler()
+        # the websocket client logs in to the backend on import, Tracker alone must not need it
+        from src.app.common.client.web_socket import WebSocketClient
+        self.indentify_client = WebSocketClient(
+            "identify", binary=True, batch_size=batch_size, batch_linger=batch_linger,
+            encode_workers=encode_workers, jpeg_quality=jpeg_quality, max_side=max_side)
         self.indentify_client.start_ws()
 
     @time_tracker.track_func
@@ -234,36 +299,30 @@ class Identifier(Tracker):
         # qt_logger.debug(
         # f"identifier identify {len(image2identify.faces)} faces")
         # qt_logger.debug(f"identifier identify {len(self._targets)} targets")
-        return ImageFaces(
-            image2identify.nd_arr, [
-                tar.face for tar in self._targets.values() if tar.in_screen])
+        return image2identify.with_faces(
+            [tar.face for tar in self._targets.values() if tar.in_screen])
 
     def stop_ws_client(self):
         self.indentify_client.stop_ws()
+        qt_logger.info(f"Identifier stopped, {self.scheduler}, {self.indentify_client.stats()}")
 
     @time_tracker.track_func
     def _update_from_result(self):
         """update from client results"""
-        while True:
-            # FIXME: update slow
-            with time_tracker.track("Identifier.receive"):
-                result_dict = self.indentify_client.receive()
-                if result_dict:
-                    # update match info
-                    result = IdentifyResult.from_dict(result_dict)
-                    qt_logger.debug(f"Identifier receive {result}")
-                    for tar in self._targets.values():
-                        if tar.face.id == result.uid:
-                            tar.face.match_info = MatchedResult.from_IdentifyResult(
-                                result)
-                            break
-                else:
-                    break
+        with time_tracker.track("Identifier.receive"):
+            results = self.indentify_client.receive_all()
+        if not results:
+            return
+        targets = {tar.face.uid: tar for tar in self._targets.values()}
+        for result_dict in results:
+            result = IdentifyResult.from_dict(result_dict)
+            qt_logger.debug(f"Identifier receive {result}")
+            # results of targets gone meanwhile are dropped
+            if result.uid in targets:
+                targets[result.uid].face.match_info = MatchedResult.from_IdentifyResult(result)
 
     @time_tracker.track_func
     def _search(self, image2identify: ImageFaces):
-        """ send data to search"""
-        for tar in self._targets.values():
-            if tar.rec_satified:  # FIXME: seems like send data under wrong condition，send too much
-                data_2_send = tar.face.face_image(image2identify.nd_arr)
-                self.indentify_client.send(data_2_send)
+        """ send best crops of targets due to identify"""
+        for data_2_send in self.scheduler.schedule(list(self._targets.values()), image2identify.nd_arr):
+            self.indentify_client.send(data_2_send)
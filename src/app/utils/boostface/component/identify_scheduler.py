@@ -0,0 +1,204 @@
+"""
+-*- coding: utf-8 -*-
+@Organization : SupaVision
+@Author       : 18317
+@Date Created : 18/10/2026
+@Description  : decide which tracked faces to identify, with which crop and when
+"""
+from timeit import default_timer as current_time
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from src.app.common.types import Face2Search, Image, Kps
+from src.app.utils.boostface.common import Face
+
+if TYPE_CHECKING:
+    from .identifier import Target
+
+# side of face images the recognition model takes, larger crops carry no more detail
+RECOGNITION_SIDE = 112
+# frames of an identified target the former Identifier waited between re-sends
+LEGACY_REVERIFY_FRAMES = 100
+
+
+def frontalness(kps: Kps | None) -> float:
+    """
+    how frontal a face is by its 5 keypoints, 1 when the nose is midway between the eyes,
+    0 when it is level with one of them
+    """
+    if kps is None:
+        return 0.5
+    left_eye, right_eye, nose = kps[0, 0], kps[1, 0], kps[2, 0]
+    span = right_eye - left_eye
+    if span <= 0:
+        return 0.
+    return float(np.clip(1 - abs(2 * (nose - left_eye) / span - 1), 0., 1.))
+
+
+def crop_quality(face: Face) -> float:
+    """score of a crop to identify, size up to RECOGNITION_SIDE, det_score and frontalness"""
+    short_side = min(face.bbox[2] - face.bbox[0], face.bbox[3] - face.bbox[1])
+    size = float(np.clip(short_side / RECOGNITION_SIDE, 0., 1.))
+    return size * float(face.det_score) * (0.5 + 0.5 * frontalness(face.kps))
+
+
+class TrackSchedule:
+    """
+    identify state of a target
+    :ivar candidates: (quality, crop) best crops since the last send, best first
+    :ivar offers: frames offered since the last send
+    :ivar first_seen: when the target was first offered
+    :ivar last_sent: when a crop of the target was last sent, None if never
+    :ivar legacy_frames: frames since the former Identifier would have re-sent an identified target
+    """
+    __slots__ = ('candidates', 'offers', 'first_seen', 'last_sent', 'legacy_frames')
+
+    def __init__(self, now: float):
+        self.candidates: list[tuple[float, Face2Search]] = []
+        self.offers = 0
+        self.first_seen = now
+        self.last_sent: float | None = None
+        self.legacy_frames = 0
+
+
+class IdentifyScheduler:
+    """
+    owns identify traffic of an Identifier. every frame the targets worth identifying offer crops,
+    a target keeps its best few crops by crop_quality and only the best one is sent when it is due:
+    a new target after a few frames to pick from, an unidentified one again after retry_after,
+    an identified one after reverify_every. sends share a global budget of rps, new targets first
+    :param rps: identify requests per second over all targets
+    :param burst: requests allowed at once after an idle time
+    :param buffer_size: best crops kept per target
+    :param min_candidates: frames a new target is watched before its first send
+    :param max_wait: seconds a new target waits for min_candidates at most
+    :param retry_after: seconds before an unidentified target is sent again
+    :param reverify_every: seconds between sends of an identified target
+    :ivar sent: crops sent
+    :ivar sent_new: crops sent of targets never sent before
+    :ivar deferred: due crops put off for the budget, counted every frame they wait
+    :ivar legacy_sends: crops the former Identifier would have sent, every frame until identified
+    """
+
+    def __init__(
+            self,
+            rps: float = 10.,
+            burst: int = 5,
+            buffer_size: int = 3,
+            min_candidates: int = 3,
+            max_wait: float = 0.3,
+            retry_after: float = 2.,
+            reverify_every: float = 5.):
+        self.rps = rps
+        self.burst = burst
+        self.buffer_size = buffer_size
+        self.min_candidates = min_candidates
+        self.max_wait = max_wait
+        self.retry_after = retry_after
+        self.reverify_every = reverify_every
+        self._tracks: dict[str, TrackSchedule] = {}
+        self._tokens = float(burst)
+        self._refilled_at: float | None = None
+        self.sent = 0
+        self.sent_new = 0
+        self.deferred = 0
+        self.legacy_sends = 0
+
+    def schedule(self, targets: list["Target"], scene: Image, now: float | None = None) -> list[Face2Search]:
+        """
+        offer crops of targets of a frame, forget targets not offered any more
+        :param targets: alive targets of the frame
+        :param scene: image of the frame, crops are copied out of it
+        :param now: time of the frame, current_time() if None
+        :return: crops to send now, in priority order
+        """
+        now = current_time() if now is None else now
+        alive = {}
+        for tar in targets:
+            uid = tar.face.uid
+            track = alive[uid] = self._tracks.get(uid) or TrackSchedule(now)
+            if tar.identify_candidate:
+                self._count_legacy(tar, track)
+                self._offer(tar.face, scene, track)
+        self._tracks = alive
+        return self._due(targets, now)
+
+    def _offer(self, face: Face, scene: Image, track: TrackSchedule):
+        track.offers += 1
+        quality = crop_quality(face)
+        if len(track.candidates) == self.buffer_size and quality <= track.candidates[-1][0]:
+            return
+        crop = face.face_image(scene)
+        # scene is a pooled frame buffer reused by camera, the crop must outlive it
+        crop.face_img = crop.face_img.copy()
+        track.candidates.append((quality, crop))
+        track.candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+        del track.candidates[self.buffer_size:]
+
+    def _count_legacy(self, tar: "Target", track: TrackSchedule):
+        """sends of the former Identifier, every frame until identified, then every LEGACY_REVERIFY_FRAMES"""
+        if not tar.identified:
+            self.legacy_sends += 1
+            return
+        track.legacy_frames += 1
+        if track.legacy_frames > LEGACY_REVERIFY_FRAMES:
+            track.legacy_frames = 0
+            self.legacy_sends += 1
+
+    def _due(self, targets: list["Target"], now: float) -> list[Face2Search]:
+        due: list[tuple[int, float, TrackSchedule]] = []
+        for tar in targets:
+            track = self._tracks[tar.face.uid]
+            if not track.candidates:
+                continue
+            if track.last_sent is None:
+                if track.offers >= self.min_candidates or now - track.first_seen >= self.max_wait:
+                    due.append((0, track.first_seen, track))
+            elif not tar.identified:
+                if now - track.last_sent >= self.retry_after:
+                    due.append((1, track.last_sent, track))
+            elif now - track.last_sent >= self.reverify_every:
+                due.append((2, track.last_sent, track))
+        if not due:
+            return []
+        self._refill(now)
+        due.sort(key=lambda item: item[:2])
+        to_send = []
+        for priority, _, track in due:
+            if self._tokens < 1:
+                self.deferred += len(due) - len(to_send)
+                break
+            self._tokens -= 1
+            to_send.append(track.candidates[0][1])
+            if priority == 0:
+                self.sent_new += 1
+            track.candidates.clear()
+            track.offers = 0
+            track.last_sent = now
+        self.sent += len(to_send)
+        return to_send
+
+    def _refill(self, now: float):
+        if self._refilled_at is not None:
+            self._tokens = min(float(self.burst), self._tokens + (now - self._refilled_at) * self.rps)
+        self._refilled_at = now
+
+    @property
+    def saved(self) -> int:
+        """sends saved compared with sending every frame a target is worth identifying"""
+        return self.legacy_sends - self.sent
+
+    def stats(self) -> dict[str, int]:
+        return {
+            'sent': self.sent,
+            'sent_new': self.sent_new,
+            'deferred': self.deferred,
+            'legacy_sends': self.legacy_sends,
+            'saved': self.saved,
+            'tracks': len(self._tracks),
+        }
+
+    def __repr__(self):
+        return (f"IdentifyScheduler(sent={self.sent}, new={self.sent_new}, deferred={self.deferred}, "
+                f"saved={self.saved} of {self.legacy_sends})")
@@ -0,0 +1,99 @@
+"""
+-*- coding: utf-8 -*-
+@Organization : SupaVision
+@Author       : 18317
+@Date Created : 18/10/2026
+@Description  : skip detection on static scenes
+"""
+from typing import Callable
+
+import cv2
+import numpy as np
+from timeit import default_timer as current_time
+
+from src.app.common.types import Image
+from src.app.utils.boostface.common import ImageFaces, Face
+from src.app.utils.time_tracker import time_tracker
+
+
+class MotionGate:
+    """
+    cheap pre-stage of detector, compares frames on a heavily downscaled grayscale copy,
+    reuses last detections while nothing changed and forces a full detection every force_every frames
+    :param size: (width, height) of downscaled copy
+    :param pixel_threshold: gray level difference of a pixel counted as changed
+    :param area_ratio: ratio of changed pixels regarded as motion
+    :param force_every: max frames reusing detections before a full detection
+    """
+
+    def __init__(
+            self,
+            size: tuple[int, int] = (64, 36),
+            pixel_threshold: int = 12,
+            area_ratio: float = 0.002,
+            force_every: int = 15):
+        self.size = size
+        self.pixel_threshold = pixel_threshold
+        self.area_ratio = area_ratio
+        self.force_every = force_every
+        self.frames = 0
+        self.skipped = 0
+        self._reference: Image | None = None
+        self._since_detect = 0
+        self._last_faces: list[Face] = []
+        self._detect_time = 0.0
+        self._gate_time = 0.0
+
+    @property
+    def skip_ratio(self) -> float:
+        return self.skipped / self.frames if self.frames else 0.0
+
+    @property
+    def cpu_saved(self) -> float:
+        """estimated seconds of detection saved, minus time spent on gating"""
+        detected = self.frames - self.skipped
+        if not detected:
+            return 0.0
+        return self.skipped * self._detect_time / detected - self._gate_time
+
+    def run(self, run_onnx: Callable[[ImageFaces], ImageFaces], img2detect: ImageFaces) -> ImageFaces:
+        """
+        detect by run_onnx only when scene changed
+        :param run_onnx: DetectorBase.run_onnx
+        :param img2detect: ImageFaces
+        :return: ImageFaces with faces
+        """
+        self.frames += 1
+        start = current_time()
+        static = self._is_static(img2detect.nd_arr)
+        self._gate_time += current_time() - start
+        if static:
+            self.skipped += 1
+            self._since_detect += 1
+            time_tracker.count("motion_gate.skipped")
+            img2detect.faces.extend(face.copy() for face in self._last_faces)
+            return img2detect
+
+        start = current_time()
+        detected = run_onnx(img2detect)
+        self._detect_time += current_time() - start
+        self._since_detect = 0
+        # tracker updates faces it owns, keep own copies
+        self._last_faces = [face.copy() for face in detected.faces]
+        return detected
+
+    def _is_static(self, image: Image) -> bool:
+        """compare with the frame of last full detection, update it when scene changed"""
+        small = cv2.cvtColor(
+            cv2.resize(image, self.size, interpolation=cv2.INTER_AREA),
+            cv2.COLOR_BGR2GRAY)
+        if self._reference is not None and self._since_detect < self.force_every:
+            changed = cv2.absdiff(small, self._reference) > self.pixel_threshold
+            if np.count_nonzero(changed) <= self.area_ratio * changed.size:
+                return True
+        self._reference = small
+        return False
+
+    def __repr__(self):
+        return (f"MotionGate(frames={self.frames}, skip_ratio={self.skip_ratio:.2%}, "
+                f"cpu_saved={self.cpu_saved:.2f}s)")
@@ -0,0 +1,296 @@
+"""
+-*- coding: utf-8 -*-
+@Organization : SupaVision
+@Author       : 18317
+@Date Created : 18/10/2026
+@Description  : detector backend running DetectorBase in worker processes
+"""
+import multiprocessing as mp
+import queue
+from multiprocessing.shared_memory import SharedMemory
+from threading import Thread, Lock
+from timeit import default_timer as current_time
+from typing import Callable, NamedTuple
+
+import numpy as np
+
+from src.app.config import qt_logger
+from src.app.utils.boostface.common import ImageFaces, ThreadBase, ChannelClosed, PooledFrame, StageTime
+from src.app.utils.boostface.shared_memory import SharedFramePool, SharedFrame
+from .detector import DetectorBase
+from ..model_zoo.model_router import SessionConfig
+from ...decorator import error_handler
+from ...time_tracker import time_tracker
+
+# x1, y1, x2, y2, score and 5 keypoints of a face in result slots
+RESULT_WIDTH = 15
+
+
+class WorkerFailed(NamedTuple):
+    """sent on done by a worker which could not start"""
+    worker: str
+    error: str
+
+
+def detect_worker(
+        tasks: mp.Queue,
+        done: mp.Queue,
+        results_name: str,
+        max_faces: int,
+        session_config: SessionConfig,
+        det_thresh: float,
+        make_detector: Callable[[SessionConfig, float], DetectorBase] = DetectorBase):
+    """
+    worker process, detect frames in SharedFramePool slots and write detections back to result slots
+    task: (seq, pool shm name, frame slot, result slot), done: (seq, result slot, faces), None to stop,
+    WorkerFailed on done if the detector can not be made
+    """
+    try:
+        detector = make_detector(session_config, det_thresh)
+    except Exception as e:
+        done.put(WorkerFailed(mp.current_process().name, f"{e.__class__.__name__}: {e}"))
+        return
+    # spawned workers share resource tracker of parent, which unlinks shared memory on stop
+    results = SharedMemory(name=results_name)
+    pools: dict[str, SharedFramePool] = {}
+    while (task := tasks.get()) is not None:
+        seq, pool_name, slot, result_slot = task
+        if pool_name not in pools:
+            pools[pool_name] = SharedFramePool.attach(pool_name)
+        frame = pools[pool_name].frame(slot)
+        out = np.ndarray((max_faces, RESULT_WIDTH), np.float32, results.buf,
+                         offset=result_slot * max_faces * RESULT_WIDTH * 4)
+        n = 0
+        try:
+            bboxes, kpss = detector.detector_model.detect(frame.buffer, max_num=0, metric='default')
+            n = min(bboxes.shape[0], max_faces)
+            out[:n, :5] = bboxes[:n]
+            out[:n, 5:] = kpss[:n].reshape(n, -1) if kpss is not None else 0
+        except Exception as e:
+            qt_logger.error(f"detect_worker failed on frame {seq}: {e}")
+        # views must be gone before shared memory is closed
+        del frame, out
+        done.put((seq, result_slot, n))
+    for pool in pools.values():
+        pool.close()
+    results.close()
+
+
+class ProcessDetector(ThreadBase):
+    """
+    detector backend running DetectorBase in a pool of worker processes, so numpy post-processing
+    does not contend for the GIL with camera, tracker and UI threads.
+    frames of a Camera with shared_memory are read by workers from the camera slots without copying,
+    other frames are copied once into slots of a staging SharedFramePool,
+    detections come back through result slots, only slot indexes and sequence numbers are pickled.
+    results are published in frame order restored by sequence numbers.
+    if a worker fails to start or dies, frames in flight are released and the result channel is closed
+    :param workers: worker processes
+    :param frame_shape: max (height, width, 3) of frames staged for workers
+    :param max_faces: max faces kept per frame
+    :param session_config: SessionConfig of onnxruntime in each worker
+    :param det_thresh: min score of detections
+    :param wait_time: max seconds to wait for a job or a result before checking state again
+    :param make_detector: makes the detector of a worker from session_config and det_thresh,
+     importable as workers are spawned
+    """
+
+    def __init__(
+            self,
+            workers: int = 2,
+            frame_shape: tuple[int, int, int] = (1080, 1920, 3),
+            max_faces: int = 256,
+            session_config: SessionConfig = SessionConfig(),
+            det_thresh: float = 0.5,
+            wait_time: float = 1.0,
+            make_detector: Callable[[SessionConfig, float], DetectorBase] = DetectorBase):
+        super().__init__()
+        self._max_faces = max_faces
+        self._wait_time = wait_time
+        # two frames per worker in flight, one detecting while the other is being dispatched
+        slots = workers * 2
+        self._staging = SharedFramePool(frame_shape, slots, name="ProcessDetector.staging")
+        self._results = SharedMemory(create=True, size=slots * max_faces * RESULT_WIDTH * 4)
+        self._free_slots: queue.Queue[int] = queue.Queue()
+        for slot in range(slots):
+            self._free_slots.put(slot)
+        # seq -> (image, frame read by worker, dispatched at)
+        self._in_flight: dict[int, tuple[ImageFaces, SharedFrame, float]] = {}
+        self._in_flight_lock = Lock()
+        self._dispatch_done = False
+        self._stopping = False
+        self._seq = 0
+
+        ctx = mp.get_context('spawn')
+        self._tasks = ctx.Queue()
+        self._done = ctx.Queue()
+        self._workers = [ctx.Process(
+            target=detect_worker,
+            args=(self._tasks, self._done, self._results.name, max_faces, session_config, det_thresh,
+                  make_detector),
+            name=f"ProcessDetector.worker[{i}]",
+            daemon=True) for i in range(workers)]
+        for worker in self._workers:
+            worker.start()
+        self._collector = Thread(target=self._collect, name="ProcessDetector.collector", daemon=True)
+        self._collector.start()
+        super().start()
+        qt_logger.info(f"ProcessDetector started with {workers} worker processes")
+
+    @time_tracker.track_func
+    def produce(self) -> ImageFaces:
+        """
+        wait for next detected image
+        :exception ChannelClosed: detector stopped
+        """
+        return self._result_queue.get()
+
+    @error_handler
+    def run(self):
+        """dispatch frames to workers through free shared memory slots"""
+        while self._is_running.is_set():
+            self._is_sleeping.wait()
+            try:
+                img2detect = self._jobs_queue.get(timeout=self._wait_time)
+            except queue.Empty:
+                continue
+            except ChannelClosed:
+                break
+            result_slot = self._wait_free_slot()
+            if result_slot is None:
+                img2detect.release()
+                break
+            with time_tracker.track("ProcessDetector.dispatch"):
+                dispatched_at = current_time()
+                frame = self._shared_frame(img2detect)
+                if frame is None:
+                    qt_logger.error(f"ProcessDetector: frame {img2detect.nd_arr.shape} larger than slot, skipped")
+                    self._free_slots.put(result_slot)
+                    img2detect.release()
+                    continue
+                with self._in_flight_lock:
+                    # collector gave up meanwhile, nobody would release the frame
+                    if not self._is_running.is_set():
+                        frame.release()
+                        img2detect.release()
+                        break
+                    self._in_flight[self._seq] = img2detect, frame, dispatched_at
+                self._tasks.put((self._seq, frame.shm_name, frame.slot, result_slot))
+                self._seq += 1
+        # no more frames, result channel is closed once workers finished what they hold
+        with self._in_flight_lock:
+            self._dispatch_done = True
+            if not self._in_flight:
+                self._result_queue.close()
+
+    def stop(self):
+        # workers exit from now on, the collector must not take it for a failure
+        self._stopping = True
+        super().stop()
+        self.join()
+        for _ in self._workers:
+            self._tasks.put(None)
+        for worker in self._workers:
+            worker.join(timeout=5)
+        self._done.put(None)
+        self._collector.join()
+        self._staging.close()
+        self._results.close()
+        self._results.unlink()
+        qt_logger.debug("ProcessDetector stopped")
+
+    def _shared_frame(self, img2detect: ImageFaces) -> SharedFrame | None:
+        """
+        frame workers can read, the camera slot itself if img2detect wraps one,
+        else a staging slot with image copied in, None if image does not fit
+        """
+        if isinstance(img2detect.frame, SharedFrame):
+            return img2detect.frame.retain()
+        image = img2detect.nd_arr
+        self._staging.resize(image.shape)
+        frame: PooledFrame = self._staging.acquire()
+        if not isinstance(frame, SharedFrame):
+            frame.release()
+            return None
+        frame.buffer[...] = image
+        return frame
+
+    def _wait_free_slot(self) -> int | None:
+        """wait until a worker gives a result slot back, None if stopped meanwhile"""
+        while self._is_running.is_set():
+            try:
+                return self._free_slots.get(timeout=self._wait_time)
+            except queue.Empty:
+                continue
+        return None
+
+    def _collect(self):
+        """collect detections from result slots, publish them in frame order"""
+        finished: dict[int, ImageFaces] = {}
+        next_seq = 0
+        try:
+            while True:
+                failure = self._failed_worker()
+                if failure is not None:
+                    self._fail(failure, finished)
+                    return
+                try:
+                    done = self._done.get(timeout=self._wait_time)
+                except queue.Empty:
+                    continue
+                if done is None:
+                    return
+                if isinstance(done, WorkerFailed):
+                    self._fail(f"{done.worker} failed to start, {done.error}", finished)
+                    return
+                seq, result_slot, n = done
+                result = np.ndarray((n, RESULT_WIDTH), np.float32, self._results.buf,
+                                    offset=result_slot * self._max_faces * RESULT_WIDTH * 4).copy()
+                self._free_slots.put(result_slot)
+                with self._in_flight_lock:
+                    img2detect, frame, dispatched_at = self._in_flight.pop(seq)
+                    last = self._dispatch_done and not self._in_flight
+                frame.release()
+                img2detect.stages.append(StageTime("detector", dispatched_at, current_time()))
+                finished[seq] = DetectorBase.fill_faces(
+                    img2detect, result[:, :5], result[:, 5:].reshape(n, -1, 2))
+                while next_seq in finished:
+                    try:
+                        self._result_queue.append(finished.pop(next_seq))
+                    except ChannelClosed:
+                        pass
+                    next_seq += 1
+                if last:
+                    self._result_queue.close()
+        except Exception as e:
+            self._fail(f"collector failed, {e.__class__.__name__}: {e}", finished)
+
+    def _failed_worker(self) -> str | None:
+        """why a worker is gone while it should be running, None if all are alive or stopping"""
+        if self._stopping:
+            return None
+        for worker in self._workers:
+            if not worker.is_alive():
+                return f"{worker.name} died with exit code {worker.exitcode}"
+        return None
+
+    def _fail(self, reason: str, finished: dict[int, ImageFaces]):
+        """
+        give up on detection, frames waiting for a result are released and consumers see ChannelClosed
+        :param reason: logged
+        :param finished: detected frames not published yet
+        """
+        qt_logger.error(f"ProcessDetector stopped detecting: {reason}")
+        # dispatch stops too, frames given to workers would never come back
+        with self._in_flight_lock:
+            self._is_running.clear()
+            self._is_sleeping.set()
+            in_flight = list(self._in_flight.values())
+            self._in_flight.clear()
+        for img2detect, frame, _ in in_flight:
+            frame.release()
+            img2detect.release()
+        for img2detect in finished.values():
+            img2detect.release()
+        finished.clear()
+        self._result_queue.close()
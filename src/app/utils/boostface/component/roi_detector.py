@@ -0,0 +1,145 @@
+"""
+-*- coding: utf-8 -*-
+@Organization : SupaVision
+@Author       : 18317
+@Date Created : 18/10/2026
+@Description  : detect on tracked regions between full-frame detection passes
+"""
+import math
+from typing import Callable, TYPE_CHECKING
+
+import cv2
+import numpy as np
+
+from src.app.common.types import Bbox, Image
+from src.app.utils.boostface.common import ImageFaces
+from src.app.utils.time_tracker import time_tracker
+
+if TYPE_CHECKING:
+    from .detector import DetectorBase
+
+
+class RoiDetector:
+    """
+    run full-frame detection every full_every frames, on the frames between run the detector only on
+    padded crops around boxes predicted by trackers. crops are packed into cells of one mosaic image,
+    so all of them cost one inference call and every face gets cell_size pixels instead of
+    a 1080p frame letterboxed into 320x320
+    :param detector: DetectorBase
+    :param roi_provider: predicted bboxes of tracked targets, like Identifier.predicted_rois
+    :param full_every: frames between full-frame detection passes
+    :param pad: padding around predicted box, ratio of its size
+    :param cell_size: pixels of a mosaic cell, multiple of 32, smaller when the mosaic would take
+     more pixels than a full-frame pass
+    :param max_rois: more rois than that fall back to full-frame detection
+    """
+
+    def __init__(
+            self,
+            detector: "DetectorBase",
+            roi_provider: Callable[[], list[Bbox]],
+            full_every: int = 5,
+            pad: float = 0.5,
+            cell_size: int = 160,
+            max_rois: int = 9):
+        self.detector = detector
+        self.roi_provider = roi_provider
+        self.full_every = full_every
+        self.pad = pad
+        self.cell_size = cell_size
+        self.max_rois = max_rois
+        self.full_passes = 0
+        self.roi_passes = 0
+        self._frames = 0
+
+    @time_tracker.track_func
+    def run_onnx(self, img2detect: ImageFaces) -> ImageFaces:
+        """
+        same as DetectorBase.run_onnx, detect on rois between full-frame passes
+        :param img2detect:
+        :return: Image2Detect with faces
+        """
+        self._frames += 1
+        rois = self.roi_provider() if self._frames % self.full_every else []
+        rois = [roi for roi in rois if self._padded(roi, img2detect.nd_arr.shape) is not None]
+        cell = self._cell_for(len(rois)) if rois and len(rois) <= self.max_rois else None
+        if cell is None:
+            self.full_passes += 1
+            return self.detector.run_onnx(img2detect)
+        self.roi_passes += 1
+        bboxes, kpss = self._detect_rois(img2detect.nd_arr, rois, cell)
+        return self.detector.fill_faces(img2detect, bboxes, kpss)
+
+    def _cell_for(self, rois: int) -> int | None:
+        """
+        largest cell up to cell_size whose mosaic of rois takes no more pixels than the model input
+        of a full-frame pass, None if cells would be smaller than one 32 pixel stride
+        """
+        input_size = self.detector.detector_model.input_size
+        if input_size is None:
+            return self.cell_size
+        cols = math.ceil(math.sqrt(rois))
+        rows = math.ceil(rois / cols)
+        fit = int(math.sqrt(input_size[0] * input_size[1] / (rows * cols))) // 32 * 32
+        cell = min(self.cell_size, fit)
+        return cell if cell >= 32 else None
+
+    def _detect_rois(self, image: Image, rois: list[Bbox], cell: int) -> tuple[np.ndarray, np.ndarray | None]:
+        """
+        :param cell: pixels of a mosaic cell
+        :return: bboxes shape [n,5] and kpss shape [n,5,2] in image coordinates
+        """
+        cols = math.ceil(math.sqrt(len(rois)))
+        rows = math.ceil(len(rois) / cols)
+        mosaic = np.zeros((rows * cell, cols * cell, 3), dtype=np.uint8)
+        # per cell: x0, y0 of crop in image and scale from image to cell
+        origins = np.zeros((len(rois), 2), dtype=np.float32)
+        scales = np.zeros(len(rois), dtype=np.float32)
+        for i, roi in enumerate(rois):
+            x1, y1, x2, y2 = self._padded(roi, image.shape)
+            crop = image[y1:y2, x1:x2]
+            scale = cell / max(x2 - x1, y2 - y1)
+            resized = cv2.resize(crop, (max(1, int((x2 - x1) * scale)), max(1, int((y2 - y1) * scale))))
+            row, col = divmod(i, cols)
+            mosaic[row * cell:row * cell + resized.shape[0],
+                   col * cell:col * cell + resized.shape[1]] = resized
+            origins[i] = x1, y1
+            scales[i] = scale
+
+        model = self.detector.detector_model
+        bboxes, kpss = model.detect(mosaic, input_size=(mosaic.shape[1], mosaic.shape[0]))
+        if bboxes.shape[0] == 0:
+            return bboxes, kpss
+
+        # assign detections to cells by their centers, map back to image
+        cx = (bboxes[:, 0] + bboxes[:, 2]) / 2
+        cy = (bboxes[:, 1] + bboxes[:, 3]) / 2
+        index = (cy // cell).astype(int) * cols + (cx // cell).astype(int)
+        keep = index < len(rois)
+        bboxes, index = bboxes[keep], index[keep]
+        cell_origin = np.stack([index % cols, index // cols], axis=1) * cell
+        scale = scales[index][:, None]
+        offset = origins[index] - cell_origin / scale
+        bboxes[:, 0:4] = bboxes[:, 0:4] / np.repeat(scale, 4, axis=1) + np.tile(offset, 2)
+        if kpss is not None:
+            kpss = kpss[keep] / scale[:, :, None] + offset[:, None, :]
+
+        # overlapping rois detect the same face twice
+        keep = model.nms(bboxes)
+        return bboxes[keep], kpss[keep] if kpss is not None else None
+
+    def _padded(self, roi: Bbox, shape: tuple[int, ...]) -> tuple[int, int, int, int] | None:
+        """roi padded by self.pad and clipped to image, None if nothing left in image"""
+        if not np.all(np.isfinite(roi[:4])):
+            return None
+        w, h = roi[2] - roi[0], roi[3] - roi[1]
+        x1 = int(max(0, roi[0] - w * self.pad))
+        y1 = int(max(0, roi[1] - h * self.pad))
+        x2 = int(min(shape[1], roi[2] + w * self.pad))
+        y2 = int(min(shape[0], roi[3] + h * self.pad))
+        if x2 <= x1 or y2 <= y1:
+            return None
+        return x1, y1, x2, y2
+
+    def __repr__(self):
+        return f"RoiDetector(full_passes={self.full_passes}, roi_passes={self.roi_passes})"
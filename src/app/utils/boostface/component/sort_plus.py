@@ -21,9 +21,11 @@ import collections
 import numpy as np
 from filterpy.kalman import KalmanFilter
 from scipy.optimize import linear_sum_assignment
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
 
 np.random.seed(0)
-__all__ = ['KalmanBoxTracker', 'associate_detections_to_trackers']
+__all__ = ['KalmanBoxTracker', 'KalmanBoxBank', 'associate_detections_to_trackers']
 
 
 def linear_assignment(cost_matrix):
@@ -160,53 +162,218 @@ class KalmanBoxTracker:
         return convert_x_to_bbox(self.kf.x)
 
 
+def convert_bboxes_to_z(bboxes):
+    """
+  convert_bbox_to_z of many bboxes, [n,4+] -> [n,4]
+  """
+    w = bboxes[:, 2] - bboxes[:, 0]
+    h = bboxes[:, 3] - bboxes[:, 1]
+    return np.stack([bboxes[:, 0] + w / 2., bboxes[:, 1] + h / 2., w * h, w / h], axis=1)
+
+
+def convert_xs_to_bboxes(xs):
+    """
+  convert_x_to_bbox of many states, [n,7] -> [n,4]
+  """
+    w = np.sqrt(xs[:, 2] * xs[:, 3])
+    h = xs[:, 2] / w
+    return np.stack([xs[:, 0] - w / 2., xs[:, 1] - h / 2., xs[:, 0] + w / 2., xs[:, 1] + h / 2.], axis=1)
+
+
+class KalmanBoxBank:
+    """
+    Kalman filters of many tracked bboxes as stacked arrays, the same constant velocity model
+    and filterpy predict and update (Joseph form) as KalmanBoxTracker,
+    but predict and update run for all tracks in one batched operation.
+    a track is a slot, reused after it is removed
+    :param capacity: initial slots, doubled when full
+    """
+    F = np.array(
+        [[1, 0, 0, 0, 1, 0, 0],
+         [0, 1, 0, 0, 0, 1, 0],
+         [0, 0, 1, 0, 0, 0, 1],
+         [0, 0, 0, 1, 0, 0, 0],
+         [0, 0, 0, 0, 1, 0, 0],
+         [0, 0, 0, 0, 0, 1, 0],
+         [0, 0, 0, 0, 0, 0, 1]], dtype=float)
+    R = np.diag([1., 1., 10., 10.])
+    Q = np.diag([1., 1., 1., 1., 0.01, 0.01, 0.0001])
+    P0 = np.diag([10., 10., 10., 10., 10000., 10000., 10000.])
+
+    def __init__(self, capacity: int = 64):
+        self.x = np.zeros((capacity, 7))
+        self.P = np.zeros((capacity, 7, 7))
+        self.alive = np.zeros(capacity, dtype=bool)
+        self._free: list[int] = list(range(capacity - 1, -1, -1))
+
+    def add(self, bbox) -> int:
+        """
+        start a track at bbox
+        :return: slot of track
+        """
+        if not self._free:
+            self._grow()
+        slot = self._free.pop()
+        self.x[slot] = 0.
+        self.x[slot, :4] = convert_bboxes_to_z(np.asarray(bbox)[None, :4])[0]
+        self.P[slot] = self.P0
+        self.alive[slot] = True
+        return slot
+
+    def remove(self, slot: int):
+        self.alive[slot] = False
+        self._free.append(slot)
+
+    def predict(self):
+        """
+        advance every alive track by a frame
+        """
+        slots = np.flatnonzero(self.alive)
+        x, P = self._held_area(self.x[slots]), self.P[slots]
+        self.x[slots] = x @ self.F.T
+        self.P[slots] = self.F @ P @ self.F.T + self.Q
+
+    def update(self, slots: np.ndarray, bboxes: np.ndarray):
+        """
+        correct tracks by observed bboxes
+        :param slots: [n] slots of tracks
+        :param bboxes: [n,4+] observed bboxes, in order of slots
+        """
+        if not len(slots):
+            return
+        x, P = self.x[slots], self.P[slots]
+        y = convert_bboxes_to_z(bboxes) - x[:, :4]
+        # H selects the first 4 of 7 dims, so P H' and H P H' are slices of P
+        PHT = P[:, :, :4]
+        S = P[:, :4, :4] + self.R
+        K = PHT @ np.linalg.inv(S)
+        self.x[slots] = x + (K @ y[:, :, None])[:, :, 0]
+        I_KH = np.broadcast_to(np.eye(7), P.shape).copy()
+        I_KH[:, :, :4] -= K
+        self.P[slots] = I_KH @ P @ I_KH.transpose(0, 2, 1) + K @ self.R @ K.transpose(0, 2, 1)
+
+    def bboxes(self, slots: np.ndarray | None = None) -> np.ndarray:
+        """current bbox estimate of slots [n,4], of all slots if None"""
+        return convert_xs_to_bboxes(self.x if slots is None else self.x[slots])
+
+    def predicted_bboxes(self, slots: np.ndarray) -> np.ndarray:
+        """bboxes of slots [n,4] a frame ahead, as predict would make them, without advancing tracks"""
+        return convert_xs_to_bboxes(self._held_area(self.x[slots]) @ self.F.T)
+
+    @staticmethod
+    def _held_area(x: np.ndarray) -> np.ndarray:
+        """states x [n,7] whose area must not shrink below zero, held still"""
+        x[x[:, 6] + x[:, 2] <= 0, 6] = 0.
+        return x
+
+    def _grow(self):
+        capacity = len(self.alive)
+        self.x = np.concatenate([self.x, np.zeros_like(self.x)])
+        self.P = np.concatenate([self.P, np.zeros_like(self.P)])
+        self.alive = np.concatenate([self.alive, np.zeros_like(self.alive)])
+        self._free.extend(range(2 * capacity - 1, capacity - 1, -1))
+
+    def __len__(self):
+        return int(self.alive.sum())
+
+
+def iou_pairs(bb_test, bb_gt):
+    """
+  IOU of bb_test[i] and bb_gt[i] for each i, [n,4] and [n,4] -> [n]
+  """
+    w = np.maximum(0., np.minimum(bb_test[:, 2], bb_gt[:, 2]) - np.maximum(bb_test[:, 0], bb_gt[:, 0]))
+    h = np.maximum(0., np.minimum(bb_test[:, 3], bb_gt[:, 3]) - np.maximum(bb_test[:, 1], bb_gt[:, 1]))
+    wh = w * h
+    area_test = (bb_test[:, 2] - bb_test[:, 0]) * (bb_test[:, 3] - bb_test[:, 1])
+    area_gt = (bb_gt[:, 2] - bb_gt[:, 0]) * (bb_gt[:, 3] - bb_gt[:, 1])
+    return wh / (area_test + area_gt - wh)
+
+
+def overlapping_pairs(bb_test, bb_gt):
+    """
+  Indexes (i, j) of every bb_test[i] and bb_gt[j] that intersect, found by a sweep over
+    bb_gt sorted by x1: only boxes whose x1 is within a box width of bb_test[i] can intersect it,
+    so boxes far apart are never compared
+  """
+    order = np.argsort(bb_gt[:, 0], kind='stable')
+    x1_sorted = bb_gt[order, 0]
+    max_w = max(float(np.max(bb_gt[:, 2] - bb_gt[:, 0])), 0.)
+    lo = np.searchsorted(x1_sorted, bb_test[:, 0] - max_w, side='right')
+    hi = np.searchsorted(x1_sorted, bb_test[:, 2], side='left')
+    counts = np.maximum(hi - lo, 0)
+    test_idx = np.repeat(np.arange(len(bb_test)), counts)
+    # position in x1_sorted of each candidate, lo of its box plus its rank among candidates of the box
+    ends = np.cumsum(counts)
+    gt_idx = order[np.repeat(lo - ends + counts, counts) + np.arange(ends[-1])]
+    a, b = bb_test[test_idx], bb_gt[gt_idx]
+    keep = (np.minimum(a[:, 2], b[:, 2]) > np.maximum(a[:, 0], b[:, 0])) & \
+           (np.minimum(a[:, 3], b[:, 3]) > np.maximum(a[:, 1], b[:, 1]))
+    return test_idx[keep], gt_idx[keep]
+
+
+def match_pairs(det_idx, pred_idx, iou, n_det, n_pred, iou_threshold):
+    """
+  Max IOU assignment over pairs of overlapping boxes, as linear_assignment of the dense IOU matrix
+    would give, since pairs that do not overlap add nothing. Detections and predictions connected
+    by overlapping pairs form components, in crowds most are a single pair matched directly,
+    the rest are solved together in an assignment of only the boxes in them
+
+  Returns matched det indexes, pred indexes and their IOU
+  """
+    above = iou > iou_threshold
+    if above.any() and np.bincount(det_idx[above]).max() == 1 and np.bincount(pred_idx[above]).max() == 1:
+        # every box overlaps at most one other well enough
+        return det_idx[above], pred_idx[above], iou[above]
+    graph = coo_matrix((np.ones(len(det_idx)), (det_idx, n_det + pred_idx)), shape=(n_det + n_pred,) * 2)
+    _, labels = connected_components(graph, directed=False)
+    pair_labels = labels[det_idx]
+    single = np.bincount(pair_labels)[pair_labels] == 1
+    rest = ~single
+    if not rest.any():
+        return det_idx, pred_idx, iou
+    # components are not connected to each other, so one assignment solves each of them
+    rows, d_local = np.unique(det_idx[rest], return_inverse=True)
+    cols, p_local = np.unique(pred_idx[rest], return_inverse=True)
+    sub = np.zeros((len(rows), len(cols)))
+    sub[d_local, p_local] = iou[rest]
+    r, c = linear_sum_assignment(-sub)
+    return (np.concatenate([det_idx[single], rows[r]]),
+            np.concatenate([pred_idx[single], cols[c]]),
+            np.concatenate([iou[single], sub[r, c]]))
+
+
 def associate_detections_to_trackers(
         detected_tars: list,
         predicted_tars: list,
-        iou_threshold: float = 0.3):
+        iou_threshold: float = 0.3,
+        predicted_bboxes: np.ndarray | None = None):
     """
   Assigns detections to tracked object (both represented as bounding boxes)
+  predicted_bboxes are bboxes of predicted_tars stacked, read from their bbox if None.
+  IOU is computed only for boxes that overlap, so crowds of hundreds of faces stay cheap
 
   Returns 3 lists of matches, unmatched_det_tars and unmatched_pred_tars
   """
     if len(predicted_tars) == 0:
         return [], [], predicted_tars
-    if detected_tars:
-        detected_bboxes = np.array([tar.bbox for tar in detected_tars])
-    else:
-        detected_bboxes = np.empty((0, 4))
-    if predicted_tars:
-        predicted_bboxes = np.array([tar.bbox for tar in predicted_tars])
-    else:
-        predicted_bboxes = np.empty((0, 4))
-    # 计算代价矩阵
-    iou_matrix = iou_batch(detected_bboxes, predicted_bboxes)
-
-    if min(iou_matrix.shape) > 0:
-        a = (iou_matrix > iou_threshold).astype(np.int32)
-        if a.sum(1).max() == 1 and a.sum(0).max() == 1:
-            matched_indices = np.stack(np.where(a), axis=1)
-        else:
-            matched_indices = linear_assignment(-iou_matrix)
-    else:
-        matched_indices = np.empty(shape=(0, 2))
-    # 不在匹配结果中
-    unmatched_det_tars = []
-    for d in range(len(detected_tars)):
-        if d not in matched_indices[:, 0]:
-            unmatched_det_tars.append(detected_tars[d])
-    unmatched_pred_tars = []
-    for t in range(len(predicted_tars)):
-        if t not in matched_indices[:, 1]:
-            unmatched_pred_tars.append(predicted_tars[t])
+    if not detected_tars:
+        return [], [], list(predicted_tars)
+    detected_bboxes = np.array([tar.bbox[:4] for tar in detected_tars], dtype=float)
+    if predicted_bboxes is None:
+        predicted_bboxes = np.array([tar.bbox[:4] for tar in predicted_tars], dtype=float)
 
-    # filter out matched with low IOU
-    matches = []
-    for m in matched_indices:
-        if iou_matrix[m[0], m[1]] < iou_threshold:
-            unmatched_det_tars.append(detected_tars[m[0]])
-            unmatched_pred_tars.append(predicted_tars[m[1]])
-        else:
-            matches.append((predicted_tars[m[1]], detected_tars[m[0]]))
+    det_idx, pred_idx = overlapping_pairs(detected_bboxes, predicted_bboxes)
+    iou = iou_pairs(detected_bboxes[det_idx], predicted_bboxes[pred_idx])
+    matched_det, matched_pred, matched_iou = match_pairs(
+        det_idx, pred_idx, iou, len(detected_tars), len(predicted_tars), iou_threshold)
 
+    # filter out matched with low IOU
+    good = matched_iou >= iou_threshold
+    det_matched = np.zeros(len(detected_tars), dtype=bool)
+    pred_matched = np.zeros(len(predicted_tars), dtype=bool)
+    det_matched[matched_det[good]] = True
+    pred_matched[matched_pred[good]] = True
+    matches = [(predicted_tars[p], detected_tars[d]) for d, p in zip(matched_det[good], matched_pred[good])]
+    unmatched_det_tars = [detected_tars[d] for d in np.flatnonzero(~det_matched)]
+    unmatched_pred_tars = [predicted_tars[p] for p in np.flatnonzero(~pred_matched)]
     return matches, unmatched_det_tars, unmatched_pred_tars
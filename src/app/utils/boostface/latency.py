@@ -0,0 +1,82 @@
+"""
+-*- coding: utf-8 -*-
+@Organization : SupaVision
+@Author       : 18317
+@Date Created : 18/10/2026
+@Description  : end-to-end latency of frames from capture to each pipeline stage
+"""
+from collections import deque
+from threading import Lock
+
+import numpy as np
+
+from src.app.utils.boostface.common import ImageFaces
+
+
+class LatencyTracker:
+    """
+    rolling latency of frames stamped by camera,
+    for each stage both end-to-end latency (capture to exit of stage) and time spent in it.
+    frames shown with a sequence number not after the previous one are counted as stale,
+    gaps in sequence numbers as skipped
+    :param window: frames kept for rolling percentiles
+    """
+
+    def __init__(self, window: int = 300):
+        self.window = window
+        self.frames = 0
+        self.stale = 0
+        self.skipped = 0
+        self._last_seq = -1
+        self._lock = Lock()
+        self._latency: dict[str, deque[float]] = {}
+        self._duration: dict[str, deque[float]] = {}
+
+    def record(self, img: ImageFaces):
+        """record stages of a frame at the end of pipeline, ignored if frame is not stamped"""
+        if img.seq < 0:
+            return
+        with self._lock:
+            self.frames += 1
+            if img.seq <= self._last_seq:
+                self.stale += 1
+            else:
+                if self._last_seq >= 0:
+                    self.skipped += img.seq - self._last_seq - 1
+                self._last_seq = img.seq
+            for stage in img.stages:
+                if stage.name not in self._latency:
+                    self._latency[stage.name] = deque(maxlen=self.window)
+                    self._duration[stage.name] = deque(maxlen=self.window)
+                self._latency[stage.name].append(stage.exit - img.captured_at)
+                self._duration[stage.name].append(stage.exit - stage.enter)
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """
+        per stage in pipeline order, milliseconds
+        :return: {stage: {'p50': , 'p95': , 'p99': , 'duration': }}
+        """
+        with self._lock:
+            latency = {name: np.array(values) for name, values in self._latency.items()}
+            duration = {name: float(np.mean(values)) for name, values in self._duration.items()}
+        return {name: {
+            'p50': float(np.percentile(values, 50)) * 1000,
+            'p95': float(np.percentile(values, 95)) * 1000,
+            'p99': float(np.percentile(values, 99)) * 1000,
+            'duration': duration[name] * 1000,
+        } for name, values in latency.items()}
+
+    def reset(self):
+        with self._lock:
+            self.frames = self.stale = self.skipped = 0
+            self._last_seq = -1
+            self._latency.clear()
+            self._duration.clear()
+
+    def __repr__(self):
+        stages = ", ".join(f"{name}: p50 {stats['p50']:.1f}ms p99 {stats['p99']:.1f}ms"
+                           for name, stats in self.summary().items())
+        return f"LatencyTracker(frames={self.frames}, stale={self.stale}, skipped={self.skipped}, {stages})"
+
+
+latency_tracker = LatencyTracker()
@@ -5,14 +5,15 @@
 @Date Created : 14/12/2023
 @Description  :
 """
-from time import sleep
-
 from src.app.common.types import Image
-from src.app.utils.boostface.common import ImageFaces
+from src.app.config.camera_config import CameraConfig
+from src.app.utils.boostface.common import ImageFaces, FrameChannel
 from src.app.utils.boostface.component.camera import Camera
-from src.app.utils.boostface.component.detector import Detector
+from src.app.utils.boostface.component.detector import Detector, TRACKING_DET_THRESH
 from src.app.utils.boostface.component.drawer import Drawer
 from src.app.utils.boostface.component.identifier import Identifier
+from src.app.utils.boostface.component.process_detector import ProcessDetector
+from src.app.utils.boostface.pipeline import Pipeline, Stage
 from src.app.utils.decorator import error_handler
 from src.app.utils.time_tracker import time_tracker
 
@@ -21,28 +22,49 @@ class BoostFace:
     """
     sub-threads:
         camera
+        detector, or ProcessDetector with its worker processes
+        pipeline stages: detector -> identifier -> drawer -> output
+    :param detector_workers: detector worker processes, 0 to detect in a thread of this process
+    :param config: CameraConfig, None for the one in app settings
     """
 
-    def __init__(self):
-        self._camera = Camera()
-        self._detector = Detector()
-        self._detector.connect_jobs_queue(self._camera.result_queue)
+    def __init__(self, detector_workers: int = 0, config: CameraConfig | None = None):
+        # detector worker processes read camera frames from shared memory
+        self._camera = Camera(config=config, shared_memory=detector_workers > 0)
         self._identifier = Identifier()
+        # identifier keeps targets alive on detections of low score
+        self._detector = ProcessDetector(workers=detector_workers, det_thresh=TRACKING_DET_THRESH) \
+            if detector_workers \
+            else Detector(roi_provider=self._identifier.predicted_rois, det_thresh=TRACKING_DET_THRESH)
+        self._detector.connect_jobs_queue(self._camera.result_queue)
         self._draw = Drawer()
+        # camera feeds detector through a latest-frame-wins channel, so a slow detector never
+        # works on stale frames, detections are pushed through identifier and drawer stages
+        self._pipeline = Pipeline(
+            sources={'detector': self._detector.result_queue},
+            stages=[
+                Stage('identifier', self._identifier.identify, upstream='detector'),
+                Stage('drawer', self._draw.show, upstream='identifier'),
+            ])
+        self._output = self._pipeline.subscribe()
 
-    @error_handler
     @time_tracker.track_func
     def get_result(self) -> ImageFaces:
         """
-        :exception CameraOpenError
+        wait for the newest frame out of the pipeline
+        :exception ChannelClosed: stopped
         :return: Image
         """
-        # FIXME: run it for while will crash the app
-        img = self._camera.produce()
-        detected = self._detector.produce()
-        identified = self._identifier.identify(detected)
-        draw_on = self._draw.show(identified)
-        return draw_on
+        return self._output.get()
+
+    @property
+    def channels(self) -> list[FrameChannel]:
+        """channels between sub-threads, for monitoring depth and dropped frames"""
+        return [self._camera.result_queue] + self._pipeline.channels
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        """per stage throughput of pipeline"""
+        return self._pipeline.stats()
 
     def wake_up(self):
         self._camera.wake_up()
@@ -56,4 +78,5 @@ class BoostFace:
     def stop_app(self):
         self._camera.stop()
         self._detector.stop()
+        self._pipeline.stop()
         self._identifier.stop_ws_client()
@@ -5,13 +5,52 @@
 @Date Created : 14/12/2023
 @Description  :
 """
+import os
 from pathlib import Path
+from timeit import default_timer as current_time
+from typing import NamedTuple
 
 import onnxruntime
 
+from src.app.config import qt_logger
 from .scrfd import *
 
-__all__ = ['get_model']
+__all__ = ['get_model', 'SessionConfig']
+
+GRAPH_OPTIMIZATION_LEVELS = {
+    'disable': onnxruntime.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    'basic': onnxruntime.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    'extended': onnxruntime.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    'all': onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+EXECUTION_MODES = {
+    'sequential': onnxruntime.ExecutionMode.ORT_SEQUENTIAL,
+    'parallel': onnxruntime.ExecutionMode.ORT_PARALLEL,
+}
+
+
+class SessionConfig(NamedTuple):
+    """
+    config for onnxruntime.SessionOptions
+    :param intra_op_threads: threads inside an operator, 0 for onnxruntime default
+    :param inter_op_threads: threads between operators in parallel mode, 0 for onnxruntime default
+    :param execution_mode: 'sequential' or 'parallel'
+    :param optimization_level: 'disable', 'basic', 'extended' or 'all', 'all' is the onnxruntime default
+    :param cache_optimized: serialize optimized graph next to the model, later starts skip optimization
+    """
+    intra_op_threads: int = 0
+    inter_op_threads: int = 0
+    execution_mode: str = 'sequential'
+    optimization_level: str = 'all'
+    cache_optimized: bool = True
+
+    def session_options(self) -> onnxruntime.SessionOptions:
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = self.intra_op_threads
+        options.inter_op_num_threads = self.inter_op_threads
+        options.execution_mode = EXECUTION_MODES[self.execution_mode]
+        options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS[self.optimization_level]
+        return options
 
 
 # TODO: need to reduce useless
@@ -35,9 +74,9 @@ class ModelRouter:
     def __init__(self, onnx_file):
         self.onnx_file = onnx_file
 
-    def get_model(self, **kwargs):
-        session = InferenceSession(str(self.onnx_file), **kwargs)
-        print(
+    def get_model(self, session_config: SessionConfig = SessionConfig(), **kwargs):
+        session = self._create_session(session_config, **kwargs)
+        qt_logger.debug(
             f'Applied providers: {session._providers}, with options: {session._provider_options}')
         inputs = session.get_inputs()
         input_cfg = inputs[0]
@@ -46,6 +85,59 @@ class ModelRouter:
             raise TypeError('outputs should be more than 5')
         return SCRFD(model_file=self.onnx_file, session=session)
 
+    def optimized_file(self, session_config: SessionConfig, providers) -> Path:
+        """cache of optimized graph, depends on onnxruntime version, optimization level and providers"""
+        tag = '_'.join(p.replace('ExecutionProvider', '').lower() for p in providers)
+        return self.onnx_file.with_name(
+            f'{self.onnx_file.stem}.ort{onnxruntime.__version__}.{session_config.optimization_level}.{tag}.onnx')
+
+    def _create_session(self, session_config: SessionConfig, **kwargs) -> "InferenceSession":
+        """
+        load optimized graph from cache if it is newer than the model (warm),
+        else optimize and save it to cache (cold).
+        cache is written under a name of this process and moved in place once complete,
+        a cache failing to load is removed and the model optimized again
+        """
+        cache = None
+        if session_config.cache_optimized and session_config.optimization_level != 'disable':
+            cache = self.optimized_file(session_config, kwargs.get('providers') or ['CPUExecutionProvider'])
+            if cache.exists() and cache.stat().st_mtime >= self.onnx_file.stat().st_mtime:
+                options = session_config.session_options()
+                # already optimized, skip optimization on start
+                options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS['disable']
+                try:
+                    return self._load(cache, options, 'warm', **kwargs)
+                except Exception as e:
+                    qt_logger.warning(f'optimized graph {cache.name} failed to load, removed: {e}')
+                    cache.unlink(missing_ok=True)
+            if not os.access(cache.parent, os.W_OK):
+                cache = None
+        options = session_config.session_options()
+        if cache is None:
+            return self._load(self.onnx_file, options, 'uncached', **kwargs)
+        # processes starting together each write their own file, readers never see a partial cache
+        partial = cache.with_suffix(f'.{os.getpid()}.tmp')
+        options.optimized_model_filepath = str(partial)
+        try:
+            session = self._load(self.onnx_file, options, 'cold', **kwargs)
+        except Exception:
+            partial.unlink(missing_ok=True)
+            raise
+        try:
+            os.replace(partial, cache)
+        except OSError as e:
+            qt_logger.warning(f'optimized graph {cache.name} not cached: {e}')
+            partial.unlink(missing_ok=True)
+        return session
+
+    def _load(self, model_file: Path, options: onnxruntime.SessionOptions, load: str, **kwargs) -> "InferenceSession":
+        """create session of model_file, log how long it took as load"""
+        start = current_time()
+        session = InferenceSession(str(model_file), sess_options=options, **kwargs)
+        qt_logger.info(
+            f'{self.onnx_file.name} session created in {(current_time() - start) * 1000:.1f} ms ({load} load)')
+        return session
+
 
 def find_onnx_file(dir_path: Path):
     if not dir_path.exists():
@@ -60,11 +152,26 @@ def get_default_providers():
     return ['CUDAExecutionProvider', 'CPUExecutionProvider']
 
 
+def get_available_providers(providers) -> list[str]:
+    """keep providers available in installed onnxruntime, fall back to cpu"""
+    available = onnxruntime.get_available_providers()
+    applied = [p for p in providers if p in available]
+    if len(applied) < len(providers):
+        qt_logger.debug(f'providers {set(providers) - set(applied)} not available, skipped')
+    return applied or ['CPUExecutionProvider']
+
+
 def get_default_provider_options():
     return None
 
 
 def get_model(model_root: Path, **kwargs):
+    """
+    :param model_root: onnx file or dir to search for it
+    :keyword providers: execution providers, unavailable ones skipped
+    :keyword provider_options: options of providers
+    :keyword session_config: SessionConfig
+    """
     if model_root.suffix != '.onnx':  # 没有那就从默认路径中再找一遍
         model_file = find_onnx_file(model_root)
         if model_file is None:
@@ -74,11 +181,14 @@ def get_model(model_root: Path, **kwargs):
     assert model_file.exists(), f'model_file {model_file} should exist'
     assert model_file.is_file(), f'model_file {model_file} should be a file'
     router = ModelRouter(model_file)
-    providers = kwargs.get('providers', get_default_providers())
+    providers = get_available_providers(kwargs.get('providers', get_default_providers()))
     provider_options = kwargs.get(
         'provider_options',
         get_default_provider_options())
+    if provider_options is not None and len(provider_options) != len(providers):
+        provider_options = None
     model = router.get_model(
+        session_config=kwargs.get('session_config', SessionConfig()),
         providers=providers,
         provider_options=provider_options)
     return model
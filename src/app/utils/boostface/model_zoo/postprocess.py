@@ -0,0 +1,68 @@
+"""
+-*- coding: utf-8 -*-
+@Organization : SupaVision
+@Author       : 18317
+@Date Created : 18/10/2026
+@Description  : vectorized SCRFD post-processing, threshold before decoding
+"""
+import cv2
+import numpy as np
+
+__all__ = ['distance2bbox', 'distance2kps', 'decode_positive', 'nms']
+
+
+def distance2bbox(points, distance):
+    """
+    decode distance prediction to bounding box
+    :param points: shape (n, 2), [x, y]
+    :param distance: shape (n, 4), distance from point to left, top, right, bottom
+    :return: shape (n, 4), x1, y1, x2, y2
+    """
+    return np.hstack((points - distance[:, 0:2], points + distance[:, 2:4]))
+
+
+def distance2kps(points, distance):
+    """
+    decode distance prediction to keypoints
+    :param points: shape (n, 2), [x, y]
+    :param distance: shape (n, 2k), offsets of k keypoints
+    :return: shape (n, 2k), x, y of k keypoints
+    """
+    return distance + np.tile(points, distance.shape[1] // 2)
+
+
+def decode_positive(scores, bbox_preds, kps_preds, anchor_centers, stride, threshold):
+    """
+    keep anchors with score above threshold, then decode only them
+    :param scores: shape (k, 1)
+    :param bbox_preds: shape (k, 4), not scaled by stride
+    :param kps_preds: shape (k, 10) not scaled by stride, or None
+    :param anchor_centers: shape (k, 2)
+    :return: scores (n, 1), bboxes (n, 4), kpss (n, 5, 2) or None
+    """
+    pos_inds = np.flatnonzero(scores[:, 0] >= threshold)
+    centers = anchor_centers[pos_inds]
+    bboxes = distance2bbox(centers, bbox_preds[pos_inds] * stride)
+    kpss = None
+    if kps_preds is not None:
+        kpss = distance2kps(centers, kps_preds[pos_inds] * stride)
+        # keypoint count from predictions, -1 can not be inferred when no anchor is positive
+        kpss = kpss.reshape((kpss.shape[0], kpss.shape[1] // 2, 2))
+    return scores[pos_inds], bboxes, kpss
+
+
+def nms(dets, thresh):
+    """
+    non maximum suppression by cv2.dnn.NMSBoxes, same +1 pixel box convention as the numpy loop it replaces
+    :param dets: shape (n, 5), x1, y1, x2, y2, score
+    :param thresh: iou above which the lower score box is suppressed
+    :return: kept indices, highest score first
+    """
+    if dets.shape[0] == 0:
+        return []
+    boxes = np.empty((dets.shape[0], 4), dtype=np.float64)
+    boxes[:, 0:2] = dets[:, 0:2]
+    boxes[:, 2:4] = dets[:, 2:4] - dets[:, 0:2] + 1
+    # scores come from detections above det_thresh, so none of them is dropped by score_threshold 0
+    keep = cv2.dnn.NMSBoxes(boxes, dets[:, 4].astype(np.float32), 0.0, thresh)
+    return np.asarray(keep, dtype=np.int64).reshape(-1).tolist()
@@ -13,6 +13,8 @@ import os.path as osp
 import cv2
 import numpy as np
 
+from .postprocess import distance2bbox, distance2kps, decode_positive, nms
+
 
 def softmax(z):
     assert len(z.shape) == 2
@@ -24,54 +26,6 @@ def softmax(z):
     return e_x / div
 
 
-def distance2bbox(points, distance, max_shape=None):
-    """Decode distance prediction to bounding box.
-
-    Args:
-        points (Tensor): Shape (n, 2), [x, y].
-        distance (Tensor): Distance from the given point to 4
-            boundaries (left, top, right, bottom).
-        max_shape (tuple): Shape of the image.
-
-    Returns:
-        Tensor: Decoded bboxes.
-    """
-    x1 = points[:, 0] - distance[:, 0]
-    y1 = points[:, 1] - distance[:, 1]
-    x2 = points[:, 0] + distance[:, 2]
-    y2 = points[:, 1] + distance[:, 3]
-    if max_shape is not None:
-        x1 = x1.clamp(min=0, max=max_shape[1])
-        y1 = y1.clamp(min=0, max=max_shape[0])
-        x2 = x2.clamp(min=0, max=max_shape[1])
-        y2 = y2.clamp(min=0, max=max_shape[0])
-    return np.stack([x1, y1, x2, y2], axis=-1)
-
-
-def distance2kps(points, distance, max_shape=None):
-    """Decode distance prediction to bounding box.
-
-    Args:
-        points (Tensor): Shape (n, 2), [x, y].
-        distance (Tensor): Distance from the given point to 4
-            boundaries (left, top, right, bottom).
-        max_shape (tuple): Shape of the image.
-
-    Returns:
-        Tensor: Decoded bboxes.
-    """
-    preds = []
-    for i in range(0, distance.shape[1], 2):
-        px = points[:, i % 2] + distance[:, i]
-        py = points[:, i % 2 + 1] + distance[:, i + 1]
-        if max_shape is not None:
-            px = px.clamp(min=0, max=max_shape[1])
-            py = py.clamp(min=0, max=max_shape[0])
-        preds.append(px)
-        preds.append(py)
-    return np.stack(preds, axis=-1)
-
-
 class SCRFD:
     def __init__(self, model_file=None, session=None):
         import onnxruntime
@@ -99,6 +53,8 @@ class SCRFD:
         # print('image_size:', self.image_size)
         input_name = input_cfg.name
         self.input_shape = input_shape
+        # fixed batch dim of input limits images per session.run
+        self.max_batch = input_shape[0] if isinstance(input_shape[0], int) else None
         outputs = self.session.get_outputs()
         if len(outputs[0].shape) == 3:
             self.batched = True
@@ -166,65 +122,77 @@ class SCRFD:
             if self.batched:
                 scores = net_outs[idx][0]
                 bbox_preds = net_outs[idx + fmc][0]
-                bbox_preds = bbox_preds * stride
-                if self.use_kps:
-                    kps_preds = net_outs[idx + fmc * 2][0] * stride
+                kps_preds = net_outs[idx + fmc * 2][0] if self.use_kps else None
             # If model doesn't support batching take output as is
             else:
                 scores = net_outs[idx]
                 bbox_preds = net_outs[idx + fmc]
-                bbox_preds = bbox_preds * stride
-                if self.use_kps:
-                    kps_preds = net_outs[idx + fmc * 2] * stride
-
-            height = input_height // stride
-            width = input_width // stride
-            K = height * width
-            key = (height, width, stride)
-            if key in self.center_cache:
-                anchor_centers = self.center_cache[key]
-            else:
-                # solution-1, c style:
-                # anchor_centers = np.zeros( (height, width, 2), dtype=np.float32 )
-                # for i in range(height):
-                #    anchor_centers[i, :, 1] = i
-                # for i in range(width):
-                #    anchor_centers[:, i, 0] = i
-
-                # solution-2:
-                # ax = np.arange(width, dtype=np.float32)
-                # ay = np.arange(height, dtype=np.float32)
-                # xv, yv = np.meshgrid(np.arange(width), np.arange(height))
-                # anchor_centers = np.stack([xv, yv], axis=-1).astype(np.float32)
-
-                # solution-3:
-                anchor_centers = np.stack(np.mgrid[:height, :width][::-1], axis=-1).astype(np.float32)
-                # print(anchor_centers.shape)
+                kps_preds = net_outs[idx + fmc * 2] if self.use_kps else None
 
-                anchor_centers = (anchor_centers * stride).reshape((-1, 2))
-                if self._num_anchors > 1:
-                    anchor_centers = np.stack([anchor_centers] * self._num_anchors, axis=1).reshape((-1, 2))
-                if len(self.center_cache) < 100:
-                    self.center_cache[key] = anchor_centers
-
-            pos_inds = np.where(scores >= threshold)[0]
-            bboxes = distance2bbox(anchor_centers, bbox_preds)
-            pos_scores = scores[pos_inds]
-            pos_bboxes = bboxes[pos_inds]
+            anchor_centers = self._anchor_centers(input_height // stride, input_width // stride, stride)
+            pos_scores, pos_bboxes, pos_kpss = decode_positive(
+                scores, bbox_preds, kps_preds, anchor_centers, stride, threshold)
             scores_list.append(pos_scores)
             bboxes_list.append(pos_bboxes)
             if self.use_kps:
-                kpss = distance2kps(anchor_centers, kps_preds)
-                # kpss = kps_preds
-                kpss = kpss.reshape((kpss.shape[0], -1, 2))
-                pos_kpss = kpss[pos_inds]
                 kpss_list.append(pos_kpss)
         return scores_list, bboxes_list, kpss_list
 
-    def detect(self, img, input_size=None, max_num=0, metric='default'):
-        assert input_size is not None or self.input_size is not None
-        input_size = self.input_size if input_size is None else input_size
+    def _anchor_centers(self, height, width, stride):
+        key = (height, width, stride)
+        if key in self.center_cache:
+            return self.center_cache[key]
+        anchor_centers = np.stack(np.mgrid[:height, :width][::-1], axis=-1).astype(np.float32)
+        anchor_centers = (anchor_centers * stride).reshape((-1, 2))
+        if self._num_anchors > 1:
+            anchor_centers = np.stack([anchor_centers] * self._num_anchors, axis=1).reshape((-1, 2))
+        if len(self.center_cache) < 100:
+            self.center_cache[key] = anchor_centers
+        return anchor_centers
+
+    def forward_batch(self, imgs, threshold):
+        """
+        one session.run for a list of images of the same size, decode only anchors above threshold
+        across the whole batch at once, falls back to forward per image for not batched models
+        :return: [(scores_list, bboxes_list, kpss_list), ...] for each image
+        """
+        if not self.batched:
+            return [self.forward(img, threshold) for img in imgs]
+        if self.max_batch is not None and len(imgs) > self.max_batch:
+            return (self.forward_batch(imgs[:self.max_batch], threshold) +
+                    self.forward_batch(imgs[self.max_batch:], threshold))
+        input_size = tuple(imgs[0].shape[0:2][::-1])
+        blob = cv2.dnn.blobFromImages(imgs, 1.0 / self.input_std, input_size,
+                                      (self.input_mean, self.input_mean, self.input_mean), swapRB=True)
+        net_outs = self.session.run(self.output_names, {self.input_name: blob})
 
+        batch = blob.shape[0]
+        input_height = blob.shape[2]
+        input_width = blob.shape[3]
+        fmc = self.fmc
+        results = [([], [], []) for _ in range(batch)]
+        for idx, stride in enumerate(self._feat_stride_fpn):
+            anchor_centers = self._anchor_centers(input_height // stride, input_width // stride, stride)
+            scores = net_outs[idx][..., 0]
+            # positives of all images, sorted by image index
+            img_inds, pos_inds = np.nonzero(scores >= threshold)
+            bboxes = distance2bbox(anchor_centers[pos_inds], net_outs[idx + fmc][img_inds, pos_inds] * stride)
+            pos_scores = scores[img_inds, pos_inds][:, np.newaxis]
+            if self.use_kps:
+                kpss = distance2kps(anchor_centers[pos_inds], net_outs[idx + fmc * 2][img_inds, pos_inds] * stride)
+                # -1 can not be inferred when no anchor of the batch is positive
+                kpss = kpss.reshape((kpss.shape[0], kpss.shape[1] // 2, 2))
+            bounds = np.searchsorted(img_inds, np.arange(batch + 1))
+            for i, (start, end) in enumerate(zip(bounds[:-1], bounds[1:])):
+                results[i][0].append(pos_scores[start:end])
+                results[i][1].append(bboxes[start:end])
+                if self.use_kps:
+                    results[i][2].append(kpss[start:end])
+        return results
+
+    @staticmethod
+    def _letterbox(img, input_size):
+        """resize img into input_size keeping aspect ratio, pad right and bottom"""
         im_ratio = float(img.shape[0]) / img.shape[1]
         model_ratio = float(input_size[1]) / input_size[0]
         if im_ratio > model_ratio:
@@ -237,9 +205,34 @@ class SCRFD:
         resized_img = cv2.resize(img, (new_width, new_height))
         det_img = np.zeros((input_size[1], input_size[0], 3), dtype=np.uint8)
         det_img[:new_height, :new_width, :] = resized_img
+        return det_img, det_scale
+
+    def detect_batch(self, imgs, input_size=None, max_num=0, metric='default'):
+        """
+        detect a list of images by one inference call
+        :return: [(det, kpss), ...] for each image, same as detect
+        """
+        assert input_size is not None or self.input_size is not None
+        input_size = self.input_size if input_size is None else input_size
+        if not imgs:
+            return []
+        det_imgs, det_scales = zip(*(self._letterbox(img, input_size) for img in imgs))
+        outs = self.forward_batch(list(det_imgs), self.det_thresh)
+        return [self._post_detect(img, det_scale, *out, max_num=max_num, metric=metric)
+                for img, det_scale, out in zip(imgs, det_scales, outs)]
+
+    def detect(self, img, input_size=None, max_num=0, metric='default'):
+        assert input_size is not None or self.input_size is not None
+        input_size = self.input_size if input_size is None else input_size
+
+        det_img, det_scale = self._letterbox(img, input_size)
         # 最耗时
         scores_list, bboxes_list, kpss_list = self.forward(det_img, self.det_thresh)
+        return self._post_detect(img, det_scale, scores_list, bboxes_list, kpss_list,
+                                 max_num=max_num, metric=metric)
 
+    def _post_detect(self, img, det_scale, scores_list, bboxes_list, kpss_list, max_num=0, metric='default'):
+        """rescale to img, nms and keep max_num of one image"""
         scores = np.vstack(scores_list)
         scores_ravel = scores.ravel()
         order = scores_ravel.argsort()[::-1]
@@ -277,34 +270,7 @@ class SCRFD:
         return det, kpss
 
     def nms(self, dets):
-        thresh = self.nms_thresh
-        x1 = dets[:, 0]
-        y1 = dets[:, 1]
-        x2 = dets[:, 2]
-        y2 = dets[:, 3]
-        scores = dets[:, 4]
-
-        areas = (x2 - x1 + 1) * (y2 - y1 + 1)
-        order = scores.argsort()[::-1]
-
-        keep = []
-        while order.size > 0:
-            i = order[0]
-            keep.append(i)
-            xx1 = np.maximum(x1[i], x1[order[1:]])
-            yy1 = np.maximum(y1[i], y1[order[1:]])
-            xx2 = np.minimum(x2[i], x2[order[1:]])
-            yy2 = np.minimum(y2[i], y2[order[1:]])
-
-            w = np.maximum(0.0, xx2 - xx1 + 1)
-            h = np.maximum(0.0, yy2 - yy1 + 1)
-            inter = w * h
-            ovr = inter / (areas[i] + areas[order[1:]] - inter)
-
-            inds = np.where(ovr <= thresh)[0]
-            order = order[inds + 1]
-
-        return keep
+        return nms(dets, self.nms_thresh)
 
 
 def get_scrfd(name, download=False, root='~/.insightface/models', **kwargs):
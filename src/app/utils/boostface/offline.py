@@ -0,0 +1,274 @@
+"""
+-*- coding: utf-8 -*-
+@Organization : SupaVision
+@Author       : 18317
+@Date Created : 18/10/2026
+@Description  : offline analytics of a video file, frame range chunks on a process pool
+"""
+import argparse
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from timeit import default_timer as current_time
+from typing import Callable, NamedTuple
+
+import cv2
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from src.app.config import qt_logger
+from src.app.utils.boostface.common import ImageFaces
+from src.app.utils.boostface.component.detector import DetectorBase, TRACKING_DET_THRESH
+from src.app.utils.boostface.component.identifier import Tracker
+from src.app.utils.boostface.component.sort_plus import iou_batch
+from src.app.utils.boostface.model_zoo.model_router import SessionConfig
+
+__all__ = ['VideoChunk', 'Detections', 'split_video', 'seek', 'stitch_tracks', 'analyze_video']
+
+
+class VideoChunk(NamedTuple):
+    """
+    frames [start, stop) of a video, tracked from first = start - overlap,
+    frames before start are shared with the previous chunk to stitch track ids
+    """
+    index: int
+    first: int
+    start: int
+    stop: int
+
+
+class Detections(NamedTuple):
+    """
+    tracked detections of many frames as columns, one row per face
+    :ivar frame: frame index in video
+    :ivar track: track id, local to a chunk until stitched
+    :ivar bbox: x1, y1, x2, y2
+    :ivar score: det_score
+    :ivar kps: 5 keypoints
+    """
+    frame: np.ndarray
+    track: np.ndarray
+    bbox: np.ndarray
+    score: np.ndarray
+    kps: np.ndarray
+
+    @classmethod
+    def empty(cls) -> "Detections":
+        return cls(np.empty(0, np.int32), np.empty(0, np.int32), np.empty((0, 4), np.float32),
+                   np.empty(0, np.float32), np.empty((0, 5, 2), np.float32))
+
+    @classmethod
+    def concat(cls, parts: list["Detections"]) -> "Detections":
+        if not parts:
+            return cls.empty()
+        return cls(*(np.concatenate(columns) for columns in zip(*parts)))
+
+    def rows(self, mask: np.ndarray) -> "Detections":
+        return Detections(*(column[mask] for column in self))
+
+    def save(self, path: Path, **meta):
+        """columns and meta to a compressed npz"""
+        np.savez_compressed(path, **self._asdict(), **meta)
+
+    @classmethod
+    def load(cls, path: Path) -> "Detections":
+        with np.load(path) as data:
+            return cls(*(data[name] for name in cls._fields))
+
+
+def split_video(frame_count: int, chunks: int, overlap: int = 15) -> list[VideoChunk]:
+    """
+    split frames of a video into chunks of about equal length
+    :param frame_count: frames in video
+    :param chunks: number of chunks, less if the video is short
+    :param overlap: frames tracked by both neighbouring chunks
+    """
+    chunks = max(1, min(chunks, frame_count // max(overlap, 1)))
+    bounds = np.linspace(0, frame_count, chunks + 1).astype(int)
+    return [VideoChunk(i, max(0, start - overlap), start, stop)
+            for i, (start, stop) in enumerate(zip(bounds[:-1], bounds[1:]))]
+
+
+# detector of a pool worker process, loaded once and reused by every chunk it gets
+_detector: DetectorBase | None = None
+
+
+def _init_worker(session_config: SessionConfig, make_detector: Callable[[SessionConfig, float], DetectorBase]):
+    global _detector
+    _detector = make_detector(session_config, TRACKING_DET_THRESH)
+
+
+def seek(cap: cv2.VideoCapture, frame_index: int):
+    """
+    position cap so the next read() returns frame_index.
+    backends seeking to keyframes only may land elsewhere, then cap is rewound and grabs forward
+    :exception ValueError: video ends before frame_index or cap can not be positioned
+    """
+    if frame_index == 0:
+        return
+    cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+    position = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+    if position == frame_index:
+        return
+    if not 0 <= position < frame_index:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        position = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+    qt_logger.debug(f"seek to frame {frame_index} landed at {position}, grabbing forward")
+    for _ in range(position, frame_index):
+        if not cap.grab():
+            raise ValueError(f"video ended before frame {frame_index}")
+    if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != frame_index:
+        raise ValueError(f"can not seek to frame {frame_index}")
+
+
+def track_chunk(video: str, chunk: VideoChunk) -> Detections:
+    """
+    worker process, detect and track frames [first, stop) of the video with a tracker of its own
+    :return: detections with track ids local to the chunk
+    """
+    cap = cv2.VideoCapture(video)
+    tracker = Tracker()
+    local_ids: dict[tuple[int, int], int] = {}
+    frames, tracks, bboxes, scores, kpss = [], [], [], [], []
+    try:
+        seek(cap, chunk.first)
+        for frame_index in range(chunk.first, chunk.stop):
+            ret, frame = cap.read()
+            if not ret:
+                qt_logger.warning(f"chunk {chunk.index} of {video} ended at frame {frame_index}")
+                break
+            img = _detector.run_onnx(ImageFaces(frame, []))
+            for tar in tracker.track(img):
+                # tentative targets may be born of a few false detections
+                if not tar.confirmed:
+                    continue
+                face = tar.face
+                frames.append(frame_index)
+                tracks.append(local_ids.setdefault((face.id, face.generation), len(local_ids)))
+                bboxes.append(face.bbox[:4])
+                scores.append(face.det_score)
+                kpss.append(face.kps if face.kps is not None else np.zeros((5, 2)))
+    finally:
+        cap.release()
+    if not frames:
+        return Detections.empty()
+    return Detections(
+        np.array(frames, np.int32), np.array(tracks, np.int32), np.array(bboxes, np.float32),
+        np.array(scores, np.float32), np.array(kpss, np.float32))
+
+
+def stitch_tracks(
+        chunks: list[VideoChunk],
+        detections: list[Detections],
+        iou_threshold: float = 0.5) -> Detections:
+    """
+    join detections of chunks into one track id space.
+    a track of a chunk takes the id of the track of the previous chunk it overlaps best,
+    by mean IoU over overlapping frames, solved as an assignment, others get new ids.
+    overlapping frames are kept from the previous chunk, whose tracker is warmed up
+    :param chunks: chunks in order
+    :param detections: detections of each chunk, local track ids
+    :param iou_threshold: min mean IoU to carry a track id over
+    """
+    stitched: list[Detections] = []
+    previous: Detections | None = None
+    next_id = 0
+    for chunk, current in zip(chunks, detections):
+        global_ids: dict[int, int] = {}
+        if previous is not None and chunk.first < chunk.start:
+            global_ids = _match_overlap(previous, current, chunk, iou_threshold)
+        mapped = np.empty_like(current.track)
+        for i, local_id in enumerate(current.track):
+            if local_id not in global_ids:
+                global_ids[local_id] = next_id
+                next_id += 1
+            mapped[i] = global_ids[local_id]
+        current = current._replace(track=mapped)
+        stitched.append(current.rows(current.frame >= chunk.start))
+        previous = current
+    return Detections.concat(stitched)
+
+
+def _match_overlap(
+        previous: Detections,
+        current: Detections,
+        chunk: VideoChunk,
+        iou_threshold: float) -> dict[int, int]:
+    """local track id of current -> global track id of previous"""
+    prev_overlap = previous.rows((previous.frame >= chunk.first) & (previous.frame < chunk.start))
+    cur_overlap = current.rows(current.frame < chunk.start)
+    prev_ids, cur_ids = np.unique(prev_overlap.track), np.unique(cur_overlap.track)
+    if not len(prev_ids) or not len(cur_ids):
+        return {}
+    iou_sum = np.zeros((len(cur_ids), len(prev_ids)))
+    frames_seen = np.zeros(len(cur_ids))
+    for frame_index in np.unique(cur_overlap.frame):
+        cur_rows = cur_overlap.frame == frame_index
+        prev_rows = prev_overlap.frame == frame_index
+        cur_at = np.searchsorted(cur_ids, cur_overlap.track[cur_rows])
+        frames_seen[cur_at] += 1
+        if prev_rows.any():
+            iou = iou_batch(cur_overlap.bbox[cur_rows], prev_overlap.bbox[prev_rows])
+            prev_at = np.searchsorted(prev_ids, prev_overlap.track[prev_rows])
+            np.add.at(iou_sum, (cur_at[:, None], prev_at[None, :]), iou)
+    mean_iou = iou_sum / frames_seen[:, None]
+    rows, cols = linear_sum_assignment(-mean_iou)
+    return {int(cur_ids[r]): int(prev_ids[c]) for r, c in zip(rows, cols) if mean_iou[r, c] >= iou_threshold}
+
+
+def analyze_video(
+        video: Path,
+        output: Path,
+        workers: int = mp.cpu_count(),
+        chunks: int | None = None,
+        overlap: int = 15,
+        session_config: SessionConfig = SessionConfig(intra_op_threads=1),
+        make_detector: Callable[[SessionConfig, float], DetectorBase] = DetectorBase) -> Detections:
+    """
+    detect and track faces of a whole video file as fast as cores allow, not at its real-time speed.
+    frames are split into chunks tracked in parallel, track ids are stitched across chunks
+    and every face of every frame is saved as columns to an npz
+    :param video: video file, must be seekable
+    :param output: npz path
+    :param workers: worker processes, each with its own detector
+    :param chunks: frame range chunks, None for 4 per worker so a slow chunk does not hold the pool
+    :param overlap: frames shared by neighbouring chunks to stitch track ids
+    :param session_config: SessionConfig of onnxruntime in each worker, one thread since workers use the cores
+    :param make_detector: makes the detector of a worker from session_config and det_thresh,
+     importable as workers are spawned
+    """
+    cap = cv2.VideoCapture(str(video))
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+    if frame_count <= 0:
+        raise ValueError(f"{video} has no frames or can not be opened")
+    video_chunks = split_video(frame_count, chunks or workers * 4, overlap)
+    qt_logger.info(f"analyze {video}, {frame_count} frames in {len(video_chunks)} chunks on {workers} workers")
+    started_at = current_time()
+    with ProcessPoolExecutor(workers, mp_context=mp.get_context('spawn'),
+                             initializer=_init_worker, initargs=(session_config, make_detector)) as pool:
+        detections = list(pool.map(track_chunk, [str(video)] * len(video_chunks), video_chunks))
+    result = stitch_tracks(video_chunks, detections)
+    result.save(output, fps=fps, frame_count=frame_count)
+    elapsed = current_time() - started_at
+    qt_logger.info(f"analyzed {frame_count} frames in {elapsed:.1f}s, {frame_count / elapsed:.1f} fps, "
+                   f"{len(result.frame)} faces of {len(np.unique(result.track))} tracks saved to {output}")
+    return result
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(
+        prog='python -m src.app.utils.boostface.offline',
+        description='detect and track faces of a video file on all cores')
+    parser.add_argument('video', type=Path)
+    parser.add_argument('output', type=Path, help='npz with frame, track, bbox, score and kps columns')
+    parser.add_argument('--workers', type=int, default=mp.cpu_count())
+    parser.add_argument('--chunks', type=int, help='frame range chunks, 4 per worker by default')
+    parser.add_argument('--overlap', type=int, default=15, help='frames shared by neighbouring chunks')
+    args = parser.parse_args(argv)
+    analyze_video(args.video, args.output, args.workers, args.chunks, args.overlap)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+"""
+-*- coding: utf-8 -*-
+@Organization : SupaVision
+@Author       : 18317
+@Date Created : 18/10/2026
+@Description  : push-based pipeline of named stages connected by bounded channels
+"""
+from collections import deque
+from threading import Condition, Lock
+from timeit import default_timer as current_time
+from typing import Any, Callable, Iterator
+
+from src.app.config import qt_logger
+from src.app.utils.boostface.common import (
+    ImageFaces, FrameChannel, ChannelPolicy, ChannelClosed, WorkingThread, release_dropped)
+from src.app.utils.time_tracker import time_tracker
+
+
+class StageStats:
+    """
+    throughput of a stage
+    :param window: items kept for rolling fps
+    """
+
+    def __init__(self, window: int = 200):
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.busy = 0.0
+        self._done_at: deque[float] = deque(maxlen=window)
+
+    def record(self, started_at: float, done_at: float):
+        self.processed += 1
+        self.busy += done_at - started_at
+        self._done_at.append(done_at)
+
+    @property
+    def fps(self) -> float:
+        if len(self._done_at) < 2:
+            return 0.0
+        return (len(self._done_at) - 1) / (self._done_at[-1] - self._done_at[0])
+
+
+class Stage:
+    """
+    named stage of a Pipeline, its workers take items from the inbound channel
+    and push results to every downstream stage.
+    results leave a stage in the order items entered it, whatever the number of workers,
+    stateful work like tracking should still keep workers=1
+    :param name: name of stage, also recorded as ImageFaces stage
+    :param func: item -> result, None to drop the item
+    :param upstream: name of a source or an earlier stage to take items from
+    :param workers: worker threads
+    :param maxlen: bound of inbound channel
+    :param policy: what inbound channel does when full, BLOCK pushes back on upstream
+    """
+
+    def __init__(
+            self,
+            name: str,
+            func: Callable[[Any], Any],
+            upstream: str,
+            workers: int = 1,
+            maxlen: int = 4,
+            policy: ChannelPolicy = ChannelPolicy.BLOCK):
+        self.name = name
+        self.func = func
+        self.upstream = upstream
+        self.workers = workers
+        self.maxlen = maxlen
+        self.policy = policy
+        self.stats = StageStats()
+        self.inbound: FrameChannel | None = None
+        self.outbound: list[FrameChannel] = []
+        self._threads: list[WorkingThread] = []
+        self._take_lock = Lock()
+        self._taken = 0
+        self._published = 0
+        self._in_order = Condition()
+        self._running_workers = 0
+
+    def start(self):
+        self._running_workers = self.workers
+        self._threads = [WorkingThread(
+            f"{self.name}[{i}]", self._jobs(), self._work, on_done=self._worker_done)
+            for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def join(self, timeout: float | None = None):
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _jobs(self) -> Iterator[tuple[int, Any]]:
+        """items of inbound channel with tickets in the order taken, until it is closed and drained"""
+        while True:
+            with self._take_lock:
+                try:
+                    item = self.inbound.get()
+                except ChannelClosed:
+                    return
+                ticket = self._taken
+                self._taken += 1
+            yield ticket, item
+
+    def _work(self, job: tuple[int, Any]):
+        ticket, item = job
+        started_at = current_time()
+        result = None
+        try:
+            if isinstance(item, ImageFaces):
+                with item.stage(self.name):
+                    result = self.func(item)
+            else:
+                result = self.func(item)
+        except Exception as e:
+            self.stats.errors += 1
+            qt_logger.error(f"stage {self.name} failed: {e}")
+        finally:
+            # wait for the turn of this ticket, so results keep the order items came in
+            with self._in_order:
+                self._in_order.wait_for(lambda: self._published == ticket)
+                if result is None:
+                    self.stats.dropped += 1
+                    release_dropped(item)
+                else:
+                    self.stats.record(started_at, current_time())
+                    self._publish(result)
+                self._published += 1
+                self._in_order.notify_all()
+
+    def _publish(self, result: Any):
+        for channel in self.outbound:
+            try:
+                channel.append(result)
+            except ChannelClosed:
+                release_dropped(result)
+
+    def _worker_done(self):
+        """last worker leaving closes outbound channels, so stages downstream drain and stop"""
+        with self._in_order:
+            self._running_workers -= 1
+            if self._running_workers:
+                return
+        for channel in self.outbound:
+            channel.close()
+
+
+class Pipeline:
+    """
+    push-based pipeline, stages form a graph by naming their upstream, a source or an earlier stage.
+    each stage pulls from its own bounded inbound channel, so a slow stage blocks the ones before it
+    instead of piling up frames, back to the source whose channel drops frames.
+    stages nobody consumes are final, their results go to an output channel to subscribe to.
+    a stage with many downstream stages pushes the same item to all of them, which must not modify it
+    :param sources: name -> channel filled by a producer outside the pipeline, like Camera.result_queue
+    :param stages: stages, listed after their upstream
+    :param output_maxlen: bound of output channels of final stages
+    :param output_policy: policy of output channels, LATEST so subscribers always see the newest frame
+    """
+
+    def __init__(
+            self,
+            sources: dict[str, FrameChannel],
+            stages: list[Stage],
+            output_maxlen: int = 2,
+            output_policy: ChannelPolicy = ChannelPolicy.LATEST):
+        self.sources = sources
+        self.stages: dict[str, Stage] = {}
+        self._outputs: dict[str, FrameChannel] = {}
+        consumed_sources: set[str] = set()
+        for stage in stages:
+            if stage.name in self.stages or stage.name in sources:
+                raise ValueError(f"stage name {stage.name} is not unique")
+            if stage.upstream in sources:
+                if stage.upstream in consumed_sources:
+                    raise ValueError(f"source {stage.upstream} can feed only one stage")
+                consumed_sources.add(stage.upstream)
+                stage.inbound = sources[stage.upstream]
+            elif stage.upstream in self.stages:
+                stage.inbound = FrameChannel(
+                    stage.maxlen, stage.policy, name=f"{stage.name}.inbound", on_drop=release_dropped)
+                self.stages[stage.upstream].outbound.append(stage.inbound)
+            else:
+                raise ValueError(f"upstream {stage.upstream} of {stage.name} is neither a source nor an earlier stage")
+            self.stages[stage.name] = stage
+        for stage in self.stages.values():
+            if not stage.outbound:
+                output = FrameChannel(
+                    output_maxlen, output_policy, name=f"{stage.name}.output", on_drop=release_dropped)
+                stage.outbound.append(output)
+                self._outputs[stage.name] = output
+        for stage in self.stages.values():
+            stage.start()
+        qt_logger.info(f"Pipeline started, {self}")
+
+    def subscribe(self, stage: str | None = None) -> FrameChannel:
+        """
+        output channel of a final stage
+        :param stage: name of final stage, None if there is only one
+        """
+        if stage is None:
+            if len(self._outputs) != 1:
+                raise ValueError(f"pipeline has final stages {list(self._outputs)}, name one")
+            return next(iter(self._outputs.values()))
+        return self._outputs[stage]
+
+    @property
+    def channels(self) -> list[FrameChannel]:
+        """inbound channels of stages and output channels, for monitoring depth and dropped items"""
+        return [stage.inbound for stage in self.stages.values()] + list(self._outputs.values())
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        """per stage fps, items processed, dropped and failed, seconds workers were busy and inbound depth"""
+        return {name: {
+            'fps': stage.stats.fps,
+            'processed': stage.stats.processed,
+            'dropped': stage.stats.dropped,
+            'errors': stage.stats.errors,
+            'busy_s': stage.stats.busy,
+            'inbound_depth': stage.inbound.depth,
+        } for name, stage in self.stages.items()}
+
+    def stop(self, timeout: float = 5.0):
+        """close every channel, workers finish what they hold and stop"""
+        for stage in self.stages.values():
+            stage.inbound.close()
+        for output in self._outputs.values():
+            output.close()
+        for stage in self.stages.values():
+            stage.join(timeout)
+        for name, stats in self.stats().items():
+            time_tracker.count(f"pipeline.{name}.processed", stats['processed'])
+        qt_logger.info(f"Pipeline stopped, {self.stats()}")
+
+    def __repr__(self):
+        graph = ", ".join(f"{stage.upstream} -> {name}(x{stage.workers})" for name, stage in self.stages.items())
+        return f"Pipeline({graph})"
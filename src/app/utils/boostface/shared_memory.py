@@ -0,0 +1,194 @@
+"""
+-*- coding: utf-8 -*-
+@Organization : SupaVision
+@Author       : 18317
+@Date Created : 18/10/2026
+@Description  : ring of frame slots in shared memory, read by other processes without copying
+"""
+from multiprocessing.shared_memory import SharedMemory
+from threading import Lock
+from time import time
+
+import numpy as np
+
+from src.app.config import qt_logger
+from src.app.utils.boostface.common import PooledFrame
+from src.app.utils.time_tracker import time_tracker
+
+# header of one slot, refs counts holders in the owner process, 0 for a free slot
+SLOT_HEADER = np.dtype([
+    ('seq', np.int64),
+    ('timestamp', np.float64),
+    ('shape', np.int32, 3),
+    ('refs', np.int32),
+])
+# slot count and slot bytes at the start of the segment, for processes attaching by name
+POOL_HEADER = np.dtype([('size', np.int64), ('slot_bytes', np.int64)])
+ALIGN = 64
+
+
+def _aligned(offset: int) -> int:
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+class SharedFrame(PooledFrame):
+    """
+    frame living in a slot of SharedFramePool, reference count kept in the slot header
+    :param pool: SharedFramePool owns the slot
+    :param slot: index of slot
+    """
+
+    def __init__(self, pool: "SharedFramePool", slot: int):
+        self.slot = slot
+        self._header = pool.headers[slot:slot + 1]
+        shape = tuple(int(i) for i in self._header['shape'][0])
+        super().__init__(pool, pool.slot_array(slot, shape))
+
+    @property
+    def seq(self) -> int:
+        return int(self._header['seq'][0])
+
+    @property
+    def timestamp(self) -> float:
+        """time.time() when the slot was handed to the writer"""
+        return float(self._header['timestamp'][0])
+
+    @property
+    def shm_name(self) -> str:
+        """shared memory of the pool, to attach it from another process"""
+        return self._pool.shm_name
+
+    def retain(self) -> "SharedFrame":
+        with self._pool.lock:
+            self._header['refs'] += 1
+        return self
+
+    def release(self):
+        with self._pool.lock:
+            refs = int(self._header['refs'][0])
+            if refs <= 0:
+                qt_logger.warning(f"{self._pool.name}: slot {self.slot} released more than retained")
+                return
+            self._header['refs'] = refs - 1
+
+
+class SharedFramePool:
+    """
+    fixed ring of frame slots in one shared memory segment, drop-in for FramePool.
+    each slot has a header of sequence number, timestamp, shape and reference count,
+    so a process attaching by name can read any slot it is told about without copying.
+    only the owner process hands out slots and changes reference counts.
+    frames larger than a slot fall back to private buffers, counted as misses
+    :param shape: (height, width, 3) of frames, also the capacity of a slot
+    :param size: slots in the ring
+    :param name: name for time_tracker counters and logs
+    """
+
+    def __init__(self, shape: tuple[int, ...], size: int = 8, name: str = "shared_frame_pool"):
+        self.shape = tuple(shape)
+        self.size = size
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.lock = Lock()
+        self.slot_bytes = _aligned(int(np.prod(shape)))
+        self._owner = True
+        self._seq = 0
+        self._cursor = 0
+        self._shm = SharedMemory(create=True, size=self._data_offset(size) + size * self.slot_bytes)
+        self._map(size)
+        self._meta[0] = size, self.slot_bytes
+        self.headers[:] = 0
+
+    @classmethod
+    def attach(cls, shm_name: str) -> "SharedFramePool":
+        """read-only view of a pool created by another process"""
+        pool = cls.__new__(cls)
+        pool.name = shm_name
+        pool.lock = Lock()
+        pool._owner = False
+        pool._shm = SharedMemory(name=shm_name)
+        meta = np.ndarray((1,), POOL_HEADER, pool._shm.buf)
+        pool.size, pool.slot_bytes = int(meta['size'][0]), int(meta['slot_bytes'][0])
+        del meta
+        pool._map(pool.size)
+        return pool
+
+    @property
+    def shm_name(self) -> str:
+        """name to attach this pool from another process"""
+        return self._shm.name
+
+    def acquire(self) -> PooledFrame:
+        """
+        take next free slot of the ring, stamped with a new sequence number,
+        a private buffer if every slot is held or frames do not fit in a slot
+        """
+        if not self._owner:
+            raise RuntimeError(f"{self.name}: attached pool can not hand out slots")
+        with self.lock:
+            slot = self._free_slot() if int(np.prod(self.shape)) <= self.slot_bytes else None
+            if slot is None:
+                self.misses += 1
+                time_tracker.count(f"{self.name}.miss")
+                return PooledFrame(self, np.empty(self.shape, dtype=np.uint8))
+            self.hits += 1
+            time_tracker.count(f"{self.name}.hit")
+            self._seq += 1
+            self.headers[slot] = self._seq, time(), self.shape, 1
+            return SharedFrame(self, slot)
+
+    def frame(self, slot: int) -> SharedFrame:
+        """frame of a slot, as in its header, reference count not changed"""
+        return SharedFrame(self, slot)
+
+    def give_back(self, frame: PooledFrame):
+        """private buffers are simply dropped, slots are free once their refs are 0"""
+
+    def resize(self, shape: tuple[int, ...]):
+        """frames changed shape, slots keep their capacity"""
+        with self.lock:
+            if tuple(shape) != self.shape:
+                qt_logger.debug(f"{self.name}: resize from {self.shape} to {shape}")
+                self.shape = tuple(shape)
+                if int(np.prod(shape)) > self.slot_bytes:
+                    qt_logger.warning(f"{self.name}: frames of {shape} do not fit in slots, not shared")
+
+    def slot_array(self, slot: int, shape: tuple[int, ...]) -> np.ndarray:
+        """image view on slot memory"""
+        return np.ndarray(shape, np.uint8, self._shm.buf,
+                          offset=self._data_offset(self.size) + slot * self.slot_bytes)
+
+    def close(self):
+        """
+        unmap, the owner also unlinks the segment,
+        mapping stays alive while frames handed out still reference it
+        """
+        del self._meta, self.headers
+        try:
+            self._shm.close()
+        except BufferError:
+            qt_logger.debug(f"{self.name}: frames still in use, unmapped when they are gone")
+        if self._owner:
+            self._shm.unlink()
+
+    def _map(self, size: int):
+        self._meta = np.ndarray((1,), POOL_HEADER, self._shm.buf)
+        self.headers = np.ndarray((size,), SLOT_HEADER, self._shm.buf, offset=POOL_HEADER.itemsize)
+
+    @staticmethod
+    def _data_offset(size: int) -> int:
+        return _aligned(POOL_HEADER.itemsize + size * SLOT_HEADER.itemsize)
+
+    def _free_slot(self) -> int | None:
+        """next slot after cursor with no holder, with self.lock held"""
+        for offset in range(self.size):
+            slot = (self._cursor + offset) % self.size
+            if self.headers['refs'][slot] == 0:
+                self._cursor = (slot + 1) % self.size
+                return slot
+        return None
+
+    def __repr__(self):
+        return (f"SharedFramePool(name={self.name}, shm={self._shm.name}, size={self.size}, "
+                f"hits={self.hits}, misses={self.misses})")
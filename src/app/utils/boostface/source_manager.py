@@ -0,0 +1,203 @@
+"""
+-*- coding: utf-8 -*-
+@Organization : SupaVision
+@Author       : 18317
+@Date Created : 18/10/2026
+@Description  : many cameras feeding one shared detector engine
+"""
+from collections import deque
+from threading import Thread, Condition, Event, Lock
+from timeit import default_timer as current_time
+
+import numpy as np
+
+from src.app.config import qt_logger
+from src.app.config.camera_config import CameraConfig
+from src.app.utils.boostface.common import ImageFaces, FrameChannel, ChannelClosed
+from src.app.utils.boostface.component.camera import Camera, CameraOpenError
+from src.app.utils.boostface.component.detector import DetectorBase, TRACKING_DET_THRESH
+from src.app.utils.boostface.component.drawer import Drawer
+from src.app.utils.boostface.component.identifier import Identifier
+from src.app.utils.boostface.component.motion_gate import MotionGate
+from src.app.utils.boostface.component.roi_detector import RoiDetector
+from src.app.utils.decorator import error_handler
+from src.app.utils.time_tracker import time_tracker
+
+
+class SourceStats:
+    """
+    rolling fps and latency of one source
+    latency is from the frame taken off the camera channel to its result published
+    :param window: results kept for rolling stats
+    """
+
+    def __init__(self, window: int = 200):
+        self.processed = 0
+        self._done_at: deque[float] = deque(maxlen=window)
+        self._latency: deque[float] = deque(maxlen=window)
+
+    def record(self, started_at: float, done_at: float):
+        self.processed += 1
+        self._done_at.append(done_at)
+        self._latency.append(done_at - started_at)
+
+    @property
+    def fps(self) -> float:
+        if len(self._done_at) < 2:
+            return 0.0
+        return (len(self._done_at) - 1) / (self._done_at[-1] - self._done_at[0])
+
+    def latency(self, percentile: float = 50) -> float:
+        """latency percentile in seconds"""
+        if not self._latency:
+            return 0.0
+        return float(np.percentile(self._latency, percentile))
+
+
+class Source:
+    """
+    one camera with its own tracker state, drawer and result channel
+    :param index: index of source in SourceManager
+    :param config: CameraConfig
+    :param detector: DetectorBase shared by all sources
+    """
+
+    def __init__(self, index: int, config: CameraConfig, detector: DetectorBase):
+        self.index = index
+        self.name = f"source[{index}] ({config.source})"
+        self.camera = Camera(config=config)
+        self.identifier = Identifier()
+        self.drawer = Drawer()
+        self.motion_gate = MotionGate()
+        self.roi_detector = RoiDetector(detector, self.identifier.predicted_rois)
+        self.result_queue = FrameChannel(name=f"source[{index}].result")
+        self.stats = SourceStats()
+        # a source is handled by one worker at a time, keeps tracker thread safe and frames in order
+        self.busy = False
+
+    def process(self, img: ImageFaces, started_at: float):
+        """detect, track, identify and draw a frame of this source"""
+        with img.stage("detector"):
+            detected = self.motion_gate.run(self.roi_detector.run_onnx, img)
+        with detected.stage("identifier"):
+            identified = self.identifier.identify(detected)
+        with identified.stage("drawer"):
+            drawn = self.drawer.show(identified)
+        self.result_queue.append(drawn)
+        self.stats.record(started_at, current_time())
+
+    def stop(self):
+        self.camera.stop()
+        self.result_queue.close()
+        self.identifier.stop_ws_client()
+
+
+class SourceManager:
+    """
+    run N Camera threads and feed them into one pool of detector workers sharing one DetectorBase,
+    sources are scheduled round-robin so a fast camera can not starve the others
+    :param configs: CameraConfig for each source
+    :param workers: detector worker threads
+    :param wait_time: max seconds a worker waits for frames before checking running state again
+    :param detector: DetectorBase shared by the sources, a new one at TRACKING_DET_THRESH if None
+    """
+
+    def __init__(self, configs: list[CameraConfig], workers: int = 2, wait_time: float = 1.0,
+                 detector: DetectorBase | None = None):
+        self._detector = detector if detector is not None else DetectorBase(det_thresh=TRACKING_DET_THRESH)
+        self._sources: list[Source] = [
+            Source(i, config, self._detector) for i, config in enumerate(configs)]
+        self._wait_time = wait_time
+        self._cursor = 0
+        self._lock = Lock()
+        self._frame_ready = Condition(self._lock)
+        self._is_running = Event()
+        self._is_running.set()
+        for source in self._sources:
+            source.camera.result_queue.add_listener(self._notify_frame)
+        self._workers = [
+            Thread(target=self._work, name=f"SourceManager.worker[{i}]", daemon=True)
+            for i in range(workers)]
+        for worker in self._workers:
+            worker.start()
+        qt_logger.info(f"SourceManager started with {len(self._sources)} sources and {workers} workers")
+
+    def __len__(self) -> int:
+        return len(self._sources)
+
+    def get_result(self, index: int) -> ImageFaces:
+        """
+        wait for the newest result of a source
+        :exception ChannelClosed: manager stopped and its last result taken
+        """
+        return self._sources[index].result_queue.get()
+
+    def stats(self) -> list[dict[str, float]]:
+        """per-source fps, latency in ms, frames dropped by camera channel and skipped by motion gate"""
+        return [{
+            'fps': source.stats.fps,
+            'latency_p50_ms': source.stats.latency(50) * 1000,
+            'latency_p95_ms': source.stats.latency(95) * 1000,
+            'processed': source.stats.processed,
+            'dropped': source.camera.result_queue.dropped,
+            'skip_ratio': source.motion_gate.skip_ratio,
+        } for source in self._sources]
+
+    @error_handler
+    def stop(self):
+        self._is_running.clear()
+        with self._lock:
+            self._frame_ready.notify_all()
+        for worker in self._workers:
+            worker.join()
+        for source in self._sources:
+            source.stop()
+        qt_logger.info(f"SourceManager stopped, {self.stats()}")
+
+    def _notify_frame(self):
+        """listener of camera channels"""
+        with self._lock:
+            self._frame_ready.notify()
+
+    def _next_job(self) -> tuple[Source, ImageFaces] | None:
+        """
+        take a frame from the next idle source with one waiting, round-robin, with self._lock held
+        """
+        for offset in range(len(self._sources)):
+            source = self._sources[(self._cursor + offset) % len(self._sources)]
+            if source.busy:
+                continue
+            try:
+                img = source.camera.result_queue.popleft()
+            except IndexError:
+                continue
+            self._cursor = (source.index + 1) % len(self._sources)
+            source.busy = True
+            return source, img
+        return None
+
+    @error_handler
+    def _work(self):
+        while self._is_running.is_set():
+            with self._lock:
+                job = self._next_job()
+                if job is None:
+                    self._frame_ready.wait(self._wait_time)
+                    continue
+            source, img = job
+            started_at = current_time()
+            try:
+                with time_tracker.track(f"SourceManager.source[{source.index}]"):
+                    source.process(img, started_at)
+            except (CameraOpenError, ChannelClosed):
+                pass
+            except Exception as e:
+                # one bad frame must not take the worker, and every other source, down with it
+                qt_logger.error(f"SourceManager: {source.name} failed on frame {img.seq}, "
+                                f"{e.__class__.__name__}: {e}")
+                img.release()
+            finally:
+                with self._lock:
+                    source.busy = False
+                    # source may have frames waiting that were skipped while busy
+                    self._frame_ready.notify()
@@ -6,6 +6,7 @@
 @Description  :
 """
 import logging
+import uuid
 from pathlib import Path
 
 import cv2
@@ -28,26 +29,45 @@ async def sign_up(session, base_url, face2register, id, name):
     async with session.post(url, json=data, headers=headers) as response:
         return await response.text()  # 或者根据你的需求调整返回值
 class Register:
-    def __init__(self, src_dir: Path, base_url: str):
+    """
+    :param batch_size: images detected by one inference call
+    """
+
+    def __init__(self, src_dir: Path, base_url: str, batch_size: int = 8):
         self.detector = DetectorBase()
         self.img_path = src_dir.glob('*')
         self.base_url = base_url
+        self.batch_size = batch_size
+
+    def _detected(self):
+        """read images and detect them in batches, yield (file, ImageFaces)"""
+        batch: list[tuple[Path, ImageFaces]] = []
+        for file in self.img_path:
+            img = cv2.imread(file.as_posix())
+            if img is None:
+                continue
+            batch.append((file, ImageFaces(image=img, faces=[])))
+            if len(batch) >= self.batch_size:
+                yield from self._detect_batch(batch)
+                batch = []
+        if batch:
+            yield from self._detect_batch(batch)
+
+    def _detect_batch(self, batch: list[tuple[Path, ImageFaces]]):
+        files, dets = zip(*batch)
+        return zip(files, self.detector.run_onnx_batch(list(dets)))
 
     async def work(self):
         i = 0
         tasks = []
         async with aiohttp.ClientSession() as session:
-            for file in self.img_path:
-                img = cv2.imread(file.as_posix())
-                if img is None:
-                    continue
-                det = ImageFaces(image=img, faces=[])
-                res = self.detector.run_onnx(det)  # 假设这不是异步的
+            for file, res in self._detected():  # 假设这不是异步的
                 if not res:
                     continue
                 for face in res.faces:
                     try:
-                        face.sign_up_info.id = face.id
+                        # faces of registered images are not tracked, each identity needs an id of its own
+                        face.sign_up_info.id = str(uuid.uuid4())
                         face.sign_up_info.name = file.stem
                         face_img = face.face_image(res.nd_arr)
                         task = asyncio.ensure_future(sign_up(session, self.base_url, face_img.to_schema(), id=face.sign_up_info.id, name=face.sign_up_info.name))
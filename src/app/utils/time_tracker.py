@@ -43,6 +43,7 @@ class TimeTracker:
 
     def __init_once(self, base_path):
         self.records = {}
+        self.counters = {}
         self.start_time = None
         self.base_path = Path(base_path)
 
@@ -72,6 +73,11 @@ class TimeTracker:
                 name, []).append(
                 (start - self.start_time, duration))
 
+    def count(self, name, value: int = 1):
+        """count events such as pool hits and misses, saved with the plots"""
+        name = self._sanitize_filename(name)
+        self.counters[name] = self.counters.get(name, 0) + value
+
     def track_func(self, func: Callable):
         """self.track decorator for functions"""
 
@@ -100,13 +106,19 @@ class TimeTracker:
         :param time_scale_sec: The time scale in seconds for grouping plots.
         """
 
-        self._save_execution_time_plots(dpi)
-
-    def _save_execution_time_plots(self, dpi):
         output_directory = self.base_path / \
             f"timetracker_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         output_directory.mkdir(parents=True, exist_ok=True)
+        self._save_execution_time_plots(output_directory, dpi)
+        self._save_counters(output_directory)
+
+    def _save_counters(self, output_directory: Path):
+        if not self.counters:
+            return
+        lines = [f"{name}: {value}" for name, value in sorted(self.counters.items())]
+        (output_directory / "counters.txt").write_text("\n".join(lines))
 
+    def _save_execution_time_plots(self, output_directory: Path, dpi):
         for name, durations in self.records.items():
             plt.figure()
             x, y = zip(*durations)
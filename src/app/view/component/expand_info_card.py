@@ -13,6 +13,7 @@ class KeyValueWidget(QWidget):
     def __init__(self, data_dict, parent=None):
         super().__init__(parent=parent)
         self.layout = QGridLayout(self)
+        self.value_labels: dict[str, QLabel] = {}
 
         # 设置固定的间距和列宽
         key_padding = 60  # key的左边距
@@ -38,6 +39,7 @@ class KeyValueWidget(QWidget):
                 QPalette.ColorRole.WindowText,
                 QColor('#6c757d'))  # 浅黑色
             value_label.setPalette(palette)
+            self.value_labels[key] = value_label
 
             # 将键和值标签添加到网格布局中
             self.layout.addWidget(key_label, row, 0)
@@ -51,6 +53,11 @@ class KeyValueWidget(QWidget):
         # 设置整体布局的边距为0
         self.layout.setContentsMargins(key_padding, 0, key_padding, 0)
 
+    def update_values(self, data_dict: dict):
+        """update values of existing keys"""
+        for key, value in data_dict.items():
+            self.value_labels[key].setText(str(value))
+
 
 class ExpandInfoCard(ExpandGroupSettingCard):
     def __init__(self, icon: Union[str, QIcon, FIF], title: str, content: str = None, parent=None):
@@ -69,6 +76,19 @@ class ExpandInfoCard(ExpandGroupSettingCard):
         self.adjustSize()
         self.setExpand(True)
 
+    def update_info(self, data_dict: dict):
+        """
+        update info in place, rebuild it when keys changed
+        :param data_dict: dict
+        """
+        if self.key_value_widget and self.key_value_widget.value_labels.keys() == data_dict.keys():
+            self.key_value_widget.update_values(data_dict)
+            return
+        if self.key_value_widget:
+            self.removeGroupWidget(self.key_value_widget)
+            self.key_value_widget.deleteLater()
+        self.add_info(data_dict)
+
 
 # 假设的主窗口类
 
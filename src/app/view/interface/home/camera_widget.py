@@ -15,8 +15,9 @@ from src.app.common.types import Image
 from src.app.config import qt_logger
 from src.app.config.config import HELP_URL, REPO_URL, EXAMPLE_URL, FEEDBACK_URL
 from src.app.utils.boostface import BoostFace
-from src.app.utils.boostface.common import ImageFaces, Face
+from src.app.utils.boostface.common import ImageFaces, Face, ChannelClosed
 from src.app.utils.boostface.component.camera import CameraOpenError
+from src.app.utils.boostface.latency import latency_tracker
 from src.app.utils.decorator import error_handler, calm_down
 from src.app.utils.time_tracker import time_tracker
 from src.app.view.component.link_card import LinkCardView
@@ -80,15 +81,19 @@ class CameraModel(QThread):
                     try:
                         # frame = self.capture.read()
                         res: ImageFaces = self.ai_camera.get_result()
-                    except CameraOpenError:
+                    except (CameraOpenError, ChannelClosed):
                         print("camera open error or camera has released")
                         break
-                    rgb_image = cv2.cvtColor(res.nd_arr, cv2.COLOR_BGR2RGB)
-                    h, w, ch = rgb_image.shape
-                    bytes_per_line = ch * w
-                    convert_to_Qt_format = QImage(
-                        rgb_image.data, w, h, bytes_per_line, QImage.Format.Format_RGB888)
-                    self.change_pixmap_signal.emit(convert_to_Qt_format)
+                    with res.stage("display"):
+                        rgb_image = cv2.cvtColor(res.nd_arr, cv2.COLOR_BGR2RGB)
+                        # converted to a new image, pooled camera buffer is free to reuse
+                        res.release()
+                        h, w, ch = rgb_image.shape
+                        bytes_per_line = ch * w
+                        convert_to_Qt_format = QImage(
+                            rgb_image.data, w, h, bytes_per_line, QImage.Format.Format_RGB888)
+                        self.change_pixmap_signal.emit(convert_to_Qt_format)
+                    latency_tracker.record(res)
 
 
     def _wake_up(self):
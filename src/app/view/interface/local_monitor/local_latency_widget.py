@@ -0,0 +1,45 @@
+from PyQt6.QtCore import QTimer
+from qfluentwidgets import FluentIcon as FIF
+
+from src.app.utils.boostface.latency import latency_tracker, LatencyTracker
+from src.app.utils.decorator import error_handler
+from src.app.view.component.expand_info_card import ExpandInfoCard
+
+__all__ = ['create_latency_card']
+
+
+class LatencyCardC:
+    """ Controller for pipeline latency card"""
+
+    def __init__(self, view: ExpandInfoCard, model: LatencyTracker):
+        self.view = view
+        self.model = model
+        self.view.add_info({'Frames': 'waiting for camera'})
+        self.timer = QTimer()
+        self.timer.timeout.connect(self.update_latency)
+        self.timer.start(1000)
+
+    @error_handler
+    def update_latency(self):
+        """capture to exit of each stage, p50 / p95 / p99 in ms"""
+        summary = self.model.summary()
+        if not summary:
+            return
+        info = {
+            name: f"{stats['p50']:.1f} / {stats['p95']:.1f} / {stats['p99']:.1f} ms"
+                  f"  (in stage {stats['duration']:.1f} ms)"
+            for name, stats in summary.items()}
+        info['Frames'] = f"{self.model.frames}, stale {self.model.stale}, skipped {self.model.skipped}"
+        self.view.update_info(info)
+
+
+def create_latency_card(parent=None) -> LatencyCardC:
+    """create pipeline latency card"""
+    created_view = ExpandInfoCard(
+        FIF.STOP_WATCH,
+        'Pipeline Latency',
+        'capture to each stage, p50 / p95 / p99',
+        parent=parent)
+    created_controller = LatencyCardC(created_view, latency_tracker)
+
+    return created_controller
@@ -3,6 +3,7 @@ from qfluentwidgets import FluentIcon as FIF
 
 from src.app.config.logging_config import QLoggingHandler
 from src.app.view.component.expand_info_card import ExpandInfoCard
+from src.app.view.interface.local_monitor.local_latency_widget import create_latency_card
 from src.app.view.interface.local_monitor.local_log_widget import create_local_log
 from src.app.view.interface.local_monitor.local_sm_widget import create_local_system_monitor
 
@@ -23,12 +24,14 @@ class LocalMonitorInterface(QWidget):
         # init widgets
 
         self._init_camera_card()
+        self._init_latency_card()
         self._init_resource_monitor()
         self._init_console_log()
 
         # add widgets to layout
         self.a_layout.addWidget(self.console_log)
         self.bc_layout.addWidget(self.camera_info_card, 1)
+        self.bc_layout.addWidget(self.latency_card, 1)
         self.bc_layout.addWidget(self.system_monitor, 2)
 
         # init window
@@ -51,6 +54,10 @@ class LocalMonitorInterface(QWidget):
             }
         )
 
+    def _init_latency_card(self):
+        self.latency_card_c = create_latency_card(parent=self)
+        self.latency_card = self.latency_card_c.view
+
     def _init_resource_monitor(self):
         self.system_monitor_c = create_local_system_monitor(parent=self)
         self.system_monitor = self.system_monitor_c.view
@@ -0,0 +1,30 @@
+"""
+-*- coding: utf-8 -*-
+@Organization : SupaVision
+@Author       : 18317
+@Date Created : 18/10/2026
+@Description  : association of detections to tracked targets in crowds
+
+python -m tests.performance.bench_associate
+"""
+from timeit import timeit
+
+import numpy as np
+
+from src.app.utils.boostface.component.sort_plus import associate_detections_to_trackers
+from tests.test_sort_plus import dense_associate, crowd
+
+
+def bench(number: int = 20):
+    rng = np.random.default_rng(0)
+    print(f"{'targets':>8} {'dense ms':>10} {'gated ms':>10} {'speedup':>8}")
+    for n in (10, 100, 500):
+        # a 1080p frame packed as a stadium stand gets denser with more targets
+        detected, predicted = crowd(n, rng, spread=200. * np.sqrt(n))
+        dense = timeit(lambda: dense_associate(detected, predicted), number=number) / number * 1000
+        gated = timeit(lambda: associate_detections_to_trackers(detected, predicted), number=number) / number * 1000
+        print(f"{n:>8} {dense:>10.3f} {gated:>10.3f} {dense / gated:>7.1f}x")
+
+
+if __name__ == '__main__':
+    bench()
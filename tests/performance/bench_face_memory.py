@@ -0,0 +1,77 @@
+"""
+-*- coding: utf-8 -*-
+@Organization : SupaVision
+@Author       : 18317
+@Date Created : 18/10/2026
+@Description  : memory of faces made per frame, 100 faces in a crowded scene
+
+python -m tests.performance.bench_face_memory
+"""
+import tracemalloc
+import uuid
+from timeit import timeit
+
+import numpy as np
+
+from src.app.common.types import MatchedResult
+from src.app.utils.boostface.common import Face, ImageFaces, SignUpInfo
+from src.app.utils.boostface.component.identifier import Tracker
+
+
+class DictFace:
+    """face as it used to be, a __dict__, uuid string, embedding, match and sign up info per face"""
+
+    def __init__(self, bbox, kps, det_score, scene_scale, face_id=None):
+        self.bbox = bbox
+        self.kps = kps
+        self.det_score = det_score
+        self.scene_scale = scene_scale
+        self.embedding = np.zeros(512)
+        self.id = face_id if face_id else str(uuid.uuid4())
+        self.match_info = MatchedResult(uid=self.id)
+        self.sign_up_info = SignUpInfo(id=face_id, name='')
+
+
+def crowd(frame: int, n: int = 100) -> list[tuple[np.ndarray, np.ndarray, float]]:
+    """detections of n faces on a grid, moving a little every frame"""
+    detections = []
+    for i in range(n):
+        x, y = 60. * (i % 20) + frame, 100. * (i // 20) + frame
+        bbox = np.array([x, y, x + 40, y + 50])
+        detections.append((bbox, np.tile(bbox[:2], (5, 1)), 0.9))
+    return detections
+
+
+def allocated(make) -> int:
+    """bytes still allocated by what make returns"""
+    tracemalloc.start()
+    kept = make()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return current
+
+
+def bench(frames: int = 100):
+    scene = (0, 0, 1920, 1080)
+    detections = crowd(0)
+    for face_type in (DictFace, Face):
+        size = allocated(lambda: [face_type(*det, scene) for det in detections])
+        ms = timeit(lambda: [face_type(*det, scene) for det in detections], number=frames) / frames * 1000
+        print(f"{face_type.__name__:>8}: 100 faces {size / 1024:8.1f} KB, {ms:.3f} ms to make")
+
+    tracker = Tracker()
+    image = np.zeros((1080, 1920, 3), np.uint8)
+    for frame in range(10):
+        tracker.track(ImageFaces(image, [Face(*det, scene) for det in crowd(frame)]))
+    tracemalloc.start()
+    for frame in range(10, 10 + frames):
+        tracker.track(ImageFaces(image, [Face(*det, scene) for det in crowd(frame)]))
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"tracker with 100 targets over {frames} frames: {current / 1024:.1f} KB kept, "
+          f"{peak / 1024:.1f} KB peak, {len(tracker._generations)} track ids")
+
+
+if __name__ == '__main__':
+    bench()
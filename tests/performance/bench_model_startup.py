@@ -0,0 +1,40 @@
+"""
+-*- coding: utf-8 -*-
+@Organization : SupaVision
+@Author       : 18317
+@Date Created : 18/10/2026
+@Description  : startup time of detector session, cold (optimize and cache) vs warm (load cache)
+
+python -m tests.performance.bench_model_startup
+"""
+from pathlib import Path
+from timeit import default_timer as current_time
+
+from src.app.utils.boostface.model_zoo.model_router import (
+    ModelRouter, SessionConfig, get_available_providers, get_default_providers)
+
+MODEL = Path(__file__).parents[2] / 'src' / 'app' / 'utils' / 'boostface' / 'model_zoo' / 'models' / 'det_2.5g.onnx'
+
+
+def load_ms(router: ModelRouter, session_config: SessionConfig, providers: list[str]) -> float:
+    start = current_time()
+    router._create_session(session_config, providers=providers)
+    return (current_time() - start) * 1000
+
+
+def bench(repeat: int = 5):
+    router = ModelRouter(MODEL)
+    providers = get_available_providers(get_default_providers())
+    for level in ('basic', 'extended', 'all'):
+        session_config = SessionConfig(optimization_level=level)
+        cache = router.optimized_file(session_config, providers)
+        cache.unlink(missing_ok=True)
+        cold = load_ms(router, session_config, providers)
+        warm = min(load_ms(router, session_config, providers) for _ in range(repeat))
+        uncached = min(load_ms(router, session_config._replace(cache_optimized=False), providers)
+                       for _ in range(repeat))
+        print(f"{level:>9}: cold {cold:7.1f} ms, warm {warm:7.1f} ms, without cache {uncached:7.1f} ms")
+
+
+if __name__ == '__main__':
+    bench()
@@ -0,0 +1,52 @@
+"""
+-*- coding: utf-8 -*-
+@Organization : SupaVision
+@Author       : 18317
+@Date Created : 18/10/2026
+@Description  : micro-benchmark of scrfd post-processing on crowded frames
+
+python -m tests.performance.bench_postprocess
+"""
+from timeit import timeit
+
+import numpy as np
+
+from src.app.utils.boostface.model_zoo.postprocess import distance2kps, decode_positive, nms
+from tests.test_postprocess import loop_nms, loop_distance2kps, crowded_dets
+
+
+def bench(number: int = 50):
+    print(f"{'boxes':>8} {'loop nms ms':>12} {'nms ms':>8} {'speedup':>8}")
+    for n in (50, 200, 1000, 3000):
+        dets = crowded_dets(n)
+        loop = timeit(lambda: loop_nms(dets, 0.4), number=number) / number * 1000
+        vectorized = timeit(lambda: nms(dets, 0.4), number=number) / number * 1000
+        print(f"{n:>8} {loop:>12.3f} {vectorized:>8.3f} {loop / vectorized:>7.1f}x")
+
+    # all anchors of a 640x640 input with 2 anchors, few faces above threshold
+    anchors = (80 * 80 + 40 * 40 + 20 * 20) * 2
+    rng = np.random.default_rng(0)
+    points = rng.uniform(0, 640, (anchors, 2)).astype(np.float32)
+    distance = rng.normal(0, 10, (anchors, 10)).astype(np.float32)
+    bbox_preds = rng.uniform(0, 4, (anchors, 4)).astype(np.float32)
+    scores = (rng.uniform(0, 1, (anchors, 1)) ** 20).astype(np.float32)
+    loop = timeit(lambda: loop_distance2kps(points, distance), number=number) / number * 1000
+    vectorized = timeit(lambda: distance2kps(points, distance), number=number) / number * 1000
+    print(f"distance2kps on {anchors} anchors: loop {loop:.3f} ms, vectorized {vectorized:.3f} ms")
+
+    def decode_all():
+        """decode every anchor then threshold, as scrfd forward used to"""
+        pos_inds = np.where(scores >= 0.5)[0]
+        bboxes = np.stack([points[:, 0] - bbox_preds[:, 0] * 8, points[:, 1] - bbox_preds[:, 1] * 8,
+                           points[:, 0] + bbox_preds[:, 2] * 8, points[:, 1] + bbox_preds[:, 3] * 8], axis=-1)
+        kpss = loop_distance2kps(points, distance * 8).reshape((anchors, -1, 2))
+        return scores[pos_inds], bboxes[pos_inds], kpss[pos_inds]
+
+    loop = timeit(decode_all, number=number) / number * 1000
+    vectorized = timeit(lambda: decode_positive(scores, bbox_preds, distance, points, 8, 0.5),
+                        number=number) / number * 1000
+    print(f"decode {anchors} anchors: all then threshold {loop:.3f} ms, "
+          f"threshold then decode {vectorized:.3f} ms")
+
+if __name__ == '__main__':
+    bench()
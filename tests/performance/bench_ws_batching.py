@@ -0,0 +1,76 @@
+"""
+-*- coding: utf-8 -*-
+@Organization : SupaVision
+@Author       : 18317
+@Date Created : 18/10/2026
+@Description  : identify messages and latency of sending faces one by one against in batches
+
+python -m tests.performance.bench_ws_batching
+"""
+import asyncio
+import struct
+import time
+
+import numpy as np
+
+from src.app.common.client.web_socket import WebSocketClient, BINARY_SUBPROTOCOL, BINARY_BATCH_SUBPROTOCOL
+from src.app.common.types import Face2Search
+from tests.performance.bench_ws_protocol import face_crop
+
+# websocket frame header of a client message over 125 bytes, 2 bytes, 2 of length and 4 of mask
+FRAME_OVERHEAD = 8
+
+
+class TimedSocket:
+    """websocket timing when each queued face is sent"""
+
+    def __init__(self, queued_at: list[float]):
+        self.queued_at = queued_at
+        self.latencies: list[float] = []
+        self.messages = 0
+        self.bytes = 0
+
+    async def send(self, message: bytes):
+        now = time.perf_counter()
+        count = struct.unpack_from('<3sBH', message)[2] if message[:3] == b'F2B' else 1
+        self.latencies += [now - self.queued_at.pop(0) for _ in range(count)]
+        self.messages += 1
+        self.bytes += len(message) + FRAME_OVERHEAD
+        await asyncio.sleep(0)
+
+
+async def crowd(ws_client: WebSocketClient, faces: list[Face2Search], queued_at: list[float], frames: int):
+    """faces of a crowded frame queued one after another every 33 ms, as the identifier does"""
+    for _ in range(frames):
+        for face in faces:
+            queued_at.append(time.perf_counter())
+            ws_client._enqueue(face)
+        await asyncio.sleep(0.033)
+    ws_client._enqueue("STOP")
+
+
+async def run(protocol: str, batch_size: int, batch_linger: float, faces: list[Face2Search], frames: int):
+    ws_client = WebSocketClient("bench", binary=True, batch_size=batch_size, batch_linger=batch_linger)
+    ws_client.protocol, ws_client._is_running = protocol, True
+    queued_at = []
+    websocket = TimedSocket(queued_at)
+    await asyncio.gather(crowd(ws_client, faces, queued_at, frames), ws_client._send_messages(websocket))
+    return websocket
+
+
+def bench(n_faces: int = 30, frames: int = 30):
+    rng = np.random.default_rng(0)
+    faces = [Face2Search(face_crop(112, rng), rng.uniform(0, 100, (5, 2)), 0.9, f"{i}.0") for i in range(n_faces)]
+    print(f"{n_faces} faces a frame, {frames} frames")
+    print(f"{'batch':>6} {'linger ms':>10} {'messages':>9} {'KB':>8} {'mean ms':>8} {'max ms':>7}")
+    for protocol, batch_size, batch_linger in [(BINARY_SUBPROTOCOL, 1, 0.), (BINARY_BATCH_SUBPROTOCOL, 8, 0.002),
+                                               (BINARY_BATCH_SUBPROTOCOL, 16, 0.005),
+                                               (BINARY_BATCH_SUBPROTOCOL, 32, 0.01)]:
+        websocket = asyncio.run(run(protocol, batch_size, batch_linger, faces, frames))
+        latencies = np.array(websocket.latencies) * 1000
+        print(f"{batch_size:>6} {batch_linger * 1000:>10.1f} {websocket.messages:>9} {websocket.bytes / 1024:>8.1f} "
+              f"{latencies.mean():>8.2f} {latencies.max():>7.2f}")
+
+
+if __name__ == '__main__':
+    bench()
@@ -0,0 +1,77 @@
+"""
+-*- coding: utf-8 -*-
+@Organization : SupaVision
+@Author       : 18317
+@Date Created : 18/10/2026
+@Description  : throughput of encoding and sending face crops and how long they block the websocket loop
+
+python -m tests.performance.bench_ws_encoding
+"""
+import asyncio
+import time
+
+import numpy as np
+
+from src.app.common.client.web_socket import WebSocketClient, BINARY_BATCH_SUBPROTOCOL
+from src.app.common.types import Face2Search
+from tests.performance.bench_ws_protocol import face_crop
+from tests.test_websocket import SentMessages
+
+
+async def loop_lag(done: asyncio.Event, tick: float = 0.001) -> float:
+    """longest time the loop was late to wake a 1 ms timer, as a receive or a heartbeat would be"""
+    lag = 0.
+    while not done.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(tick)
+        lag = max(lag, time.perf_counter() - start - tick)
+    return lag
+
+
+async def send_all(ws_client: WebSocketClient, websocket: SentMessages) -> float:
+    done = asyncio.Event()
+    lag = asyncio.create_task(loop_lag(done))
+    await ws_client._send_messages(websocket)
+    done.set()
+    return await lag
+
+
+def run(faces: list[Face2Search], frames: int, **kwargs) -> tuple[float, float, float]:
+    """faces a second, ms of longest loop lag and KB a face sending frames of faces queued at once"""
+    # batched as the Identifier sends, a batch encoded on the loop blocks it the longest
+    ws_client = WebSocketClient("bench", binary=True, batch_size=16, batch_linger=0.005, **kwargs)
+    ws_client.protocol, ws_client._is_running = BINARY_BATCH_SUBPROTOCOL, True
+    websocket = SentMessages()
+    for _ in range(frames):
+        for face in faces:
+            ws_client.send(face)
+    ws_client.send("STOP")
+    start = time.perf_counter()
+    lag = ws_client._loop.run_until_complete(send_all(ws_client, websocket))
+    elapsed = time.perf_counter() - start
+    if ws_client._encoder is not None:
+        ws_client._encoder.shutdown()
+    sent = len(faces) * frames
+    kb = sum(len(message) for message in websocket.sent) / sent / 1024
+    return sent / elapsed, lag * 1000, kb
+
+
+def bench(total: int = 500):
+    rng = np.random.default_rng(0)
+    crops = [face_crop(int(side), rng) for side in rng.uniform(120, 320, 50)]
+    configs = {
+        'on loop': dict(encode_workers=0),
+        '2 threads': dict(encode_workers=2),
+        '4 threads': dict(encode_workers=4),
+        '2 thr, 224px q85': dict(encode_workers=2, max_side=224, jpeg_quality=85),
+    }
+    print(f"{'config':>18} {'faces/frame':>12} {'faces/s':>9} {'loop lag ms':>12} {'KB/face':>8}")
+    for n in (1, 10, 50):
+        faces = [Face2Search(crops[i], rng.uniform(0, 100, (5, 2)), 0.9, f"{i}.0") for i in range(n)]
+        for name, kwargs in configs.items():
+            rate, lag, kb = run(faces, total // n, **kwargs)
+            print(f"{name:>18} {n:>12} {rate:>9.0f} {lag:>12.2f} {kb:>8.1f}")
+
+
+if __name__ == '__main__':
+    bench()
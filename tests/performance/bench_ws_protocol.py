@@ -0,0 +1,40 @@
+"""
+-*- coding: utf-8 -*-
+@Organization : SupaVision
+@Author       : 18317
+@Date Created : 18/10/2026
+@Description  : wire size and encode time of a Face2Search, base64 in json against binary
+
+python -m tests.performance.bench_ws_protocol
+"""
+from timeit import timeit
+
+import cv2
+import numpy as np
+
+from src.app.common.types import Face2Search
+
+
+def face_crop(side: int, rng: np.random.Generator) -> np.ndarray:
+    """smooth image of a face like crop, noise would not compress as faces do"""
+    small = rng.integers(0, 256, (8, 8, 3), dtype=np.uint8)
+    crop = cv2.resize(small, (side, side), interpolation=cv2.INTER_CUBIC)
+    return cv2.add(crop, rng.integers(0, 8, crop.shape, dtype=np.uint8))
+
+
+def bench(number: int = 500):
+    rng = np.random.default_rng(0)
+    kps = rng.uniform(0, 100, (5, 2))
+    print(f"{'side':>6} {'json B':>8} {'binary B':>9} {'saved':>6} {'json us':>8} {'binary us':>10}")
+    for side in (64, 112, 224):
+        face = Face2Search(face_crop(side, rng), kps, 0.93, "12.3")
+        as_json, as_bytes = face.to_schema().model_dump_json(), face.to_bytes()
+        json_us = timeit(lambda: face.to_schema().model_dump_json(), number=number) / number * 1e6
+        binary_us = timeit(face.to_bytes, number=number) / number * 1e6
+        json_size = len(as_json.encode('utf-8'))
+        print(f"{side:>6} {json_size:>8} {len(as_bytes):>9} {1 - len(as_bytes) / json_size:>6.0%} "
+              f"{json_us:>8.1f} {binary_us:>10.1f}")
+
+
+if __name__ == '__main__':
+    bench()
@@ -0,0 +1,89 @@
+"""
+-*- coding: utf-8 -*-
+@Organization : SupaVision
+@Author       : 18317
+@Date Created : 18/10/2026
+@Description  :
+"""
+import queue
+from threading import Thread
+
+import pytest
+
+from src.app.utils.boostface.common import (
+    FrameChannel, ChannelPolicy, ChannelClosed, FramePool, ImageFaces, release_dropped)
+
+
+def test_latest_keeps_newest():
+    channel = FrameChannel(maxlen=2, policy=ChannelPolicy.LATEST)
+    for i in range(5):
+        channel.append(i)
+    assert channel.depth == 2
+    assert channel.popleft() == 4
+    assert channel.dropped == 4
+    with pytest.raises(IndexError):
+        channel.popleft()
+
+
+def test_drop_oldest_is_fifo():
+    channel = FrameChannel(maxlen=3, policy=ChannelPolicy.DROP_OLDEST)
+    for i in range(5):
+        channel.append(i)
+    assert [channel.popleft() for _ in range(3)] == [2, 3, 4]
+    assert channel.dropped == 2
+    assert channel.max_depth == 3
+
+
+def test_block_waits_for_consumer():
+    channel = FrameChannel(maxlen=1, policy=ChannelPolicy.BLOCK)
+    channel.append(0)
+    producer = Thread(target=channel.append, args=(1,))
+    producer.start()
+    producer.join(timeout=0.1)
+    assert producer.is_alive()
+    assert channel.popleft() == 0
+    producer.join(timeout=1)
+    assert channel.popleft() == 1
+    assert channel.dropped == 0
+
+
+def test_get_wakes_on_append():
+    channel = FrameChannel(maxlen=2)
+    Thread(target=channel.append, args=("frame",)).start()
+    assert channel.get(timeout=1) == "frame"
+    with pytest.raises(queue.Empty):
+        channel.get(timeout=0.01)
+
+
+def test_close_unblocks_waiting_threads():
+    channel = FrameChannel(maxlen=1, policy=ChannelPolicy.BLOCK)
+    errors = []
+
+    def consume():
+        try:
+            channel.get()
+        except ChannelClosed as e:
+            errors.append(e)
+
+    consumer = Thread(target=consume)
+    consumer.start()
+    channel.close()
+    consumer.join(timeout=1)
+    assert not consumer.is_alive()
+    assert len(errors) == 1
+    with pytest.raises(ChannelClosed):
+        channel.append("frame")
+
+
+def test_dropped_frames_go_back_to_pool():
+    pool = FramePool((4, 4, 3), size=2)
+    channel = FrameChannel(maxlen=1, on_drop=release_dropped)
+    first = pool.acquire()
+    channel.append(ImageFaces(first.buffer, [], frame=first))
+    second = pool.acquire()
+    channel.append(ImageFaces(second.buffer, [], frame=second))
+    # first frame dropped and released, so it is reused
+    assert pool.acquire().buffer is first.buffer
+    assert (pool.hits, pool.misses) == (3, 0)
+    assert pool.acquire() is not None
+    assert pool.misses == 1
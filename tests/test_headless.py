@@ -0,0 +1,73 @@
+"""
+-*- coding: utf-8 -*-
+@Organization : SupaVision
+@Author       : 18317
+@Date Created : 18/10/2026
+@Description  :
+"""
+import json
+import subprocess
+import sys
+
+import cv2
+import numpy as np
+
+
+class SquareModel:
+    """what DetectorBase uses of an SCRFD model, finds the bright square of an image"""
+    input_size = (320, 320)
+
+    def prepare(self, ctx_id: int, **kwargs):
+        pass
+
+    def detect(self, image: np.ndarray, **kwargs):
+        ys, xs = np.nonzero(image[..., 0] > 127)
+        if not len(xs):
+            return np.zeros((0, 5), np.float32), np.zeros((0, 5, 2), np.float32)
+        bboxes = np.array([[xs.min(), ys.min(), xs.max() + 1, ys.max() + 1, 0.9]], np.float32)
+        return bboxes, np.repeat(bboxes[:, None, :2], 5, axis=1)
+
+    @staticmethod
+    def nms(dets: np.ndarray) -> list[int]:
+        return list(range(dets.shape[0]))
+
+
+# the headless runner with the square model, no Qt may be imported on the way
+RUN = """
+import sys
+from tests.test_headless import SquareModel
+from src.app.utils.boostface.component import detector
+detector.get_model = lambda *args, **kwargs: SquareModel()
+from src.app.utils.boostface.__main__ import main
+main(sys.argv[1:])
+assert 'PyQt6' not in sys.modules, 'PyQt6 imported'
+"""
+
+
+def test_headless_run_ends_with_video(tmp_path):
+    video = tmp_path / 'square.avi'
+    writer = cv2.VideoWriter(str(video), cv2.VideoWriter_fourcc(*'MJPG'), 30, (320, 240))
+    # long enough to outlast start up of detector and identifier, read at 30ms a frame
+    for frame_index in range(120):
+        frame = np.zeros((240, 320, 3), np.uint8)
+        x = 20 + 2 * frame_index
+        frame[100:140, x:x + 40] = 255
+        writer.write(frame)
+    writer.release()
+    output = tmp_path / 'out'
+    run = subprocess.run(
+        [sys.executable, '-c', RUN, '--source', str(video), '--output', str(output), '--no-video'],
+        capture_output=True, text=True, timeout=120)
+    assert run.returncode == 0, run.stderr[-2000:]
+    # final report once the video ran out, after logs on stdout
+    lines = run.stdout.splitlines()
+    starts = [i for i, line in enumerate(lines) if line.startswith('frames ')]
+    assert starts
+    report = lines[starts[-1]:]
+    assert any(line.strip().startswith('latency detector') for line in report)
+    events = [json.loads(line) for line in (output / 'events.jsonl').read_text().splitlines()]
+    # the square is tracked once it is confirmed
+    assert any(event['faces'] for event in events)
+    assert not (output / 'annotated.mp4').exists()
+    seqs = [event['seq'] for event in events]
+    assert seqs == sorted(seqs)
@@ -0,0 +1,66 @@
+"""
+-*- coding: utf-8 -*-
+@Organization : SupaVision
+@Author       : 18317
+@Date Created : 18/10/2026
+@Description  :
+"""
+import numpy as np
+
+from src.app.utils.boostface.common import Face
+from src.app.utils.boostface.component.identify_scheduler import IdentifyScheduler, frontalness
+
+SCENE = np.zeros((720, 1280, 3), np.uint8)
+
+
+class FakeTarget:
+    """what IdentifyScheduler reads of a Target"""
+
+    def __init__(self, face_id: int, identified: bool = False):
+        self.face = Face(np.array([100. * face_id, 0., 100. * face_id + 90, 110.]), kps(0.5), 0.9,
+                         (0, 0, 1280, 720), face_id=face_id)
+        self.identify_candidate = True
+        self.identified = identified
+
+
+def kps(nose: float) -> np.ndarray:
+    """keypoints of a face in a 90x110 box, nose at ratio between the eyes"""
+    return np.array([[30., 40.], [60., 40.], [30 + 30 * nose, 60.], [35., 85.], [55., 85.]])
+
+
+def test_frontalness():
+    assert frontalness(kps(0.5)) == 1.
+    assert frontalness(kps(0.)) == 0.
+    assert 0 < frontalness(kps(0.8)) < frontalness(kps(0.6)) < 1
+
+
+def test_new_target_sends_best_of_first_frames():
+    scheduler = IdentifyScheduler(min_candidates=3)
+    target = FakeTarget(0)
+    sent = []
+    for frame, (nose, score) in enumerate([(0.9, 0.9), (0.5, 0.95), (0.6, 0.7), (0.5, 0.99)]):
+        target.face.kps, target.face.det_score = kps(nose), score
+        sent += scheduler.schedule([target], SCENE, now=frame * 0.03)
+    # sent once after 3 frames, with the frontal and confident crop of frame 1
+    assert len(sent) == 1
+    assert sent[0].det_score == 0.95
+    assert sent[0].uid == target.face.uid
+    assert scheduler.legacy_sends == 4
+    assert scheduler.saved == 3
+
+
+def test_budget_prefers_new_targets():
+    scheduler = IdentifyScheduler(rps=10, burst=4, min_candidates=1, reverify_every=1.)
+    identified = [FakeTarget(i) for i in range(3)]
+    scheduler.schedule(identified, SCENE, now=0.)
+    for target in identified:
+        target.identified = True
+    new = [FakeTarget(i) for i in range(3, 6)]
+    # 1.5s later identified targets are due to re-verify, tokens are back to 4 and new targets take 3 of them
+    sent = scheduler.schedule(identified + new, SCENE, now=1.5)
+    assert [crop.uid for crop in sent[:3]] == [target.face.uid for target in new]
+    assert len(sent) == 4
+    assert scheduler.deferred == 2
+    # tracks of targets gone are forgotten
+    scheduler.schedule(new, SCENE, now=1.6)
+    assert scheduler.stats()['tracks'] == 3
@@ -0,0 +1,60 @@
+"""
+-*- coding: utf-8 -*-
+@Organization : SupaVision
+@Author       : 18317
+@Date Created : 18/10/2026
+@Description  :
+"""
+import numpy as np
+import pytest
+
+from src.app.utils.boostface.common import ImageFaces, StageTime
+from src.app.utils.boostface.latency import LatencyTracker
+
+
+def shown(seq: int, latency_ms: float) -> ImageFaces:
+    """frame captured at seq seconds, detected for 1ms and left detector latency_ms after capture, drawn in 5ms"""
+    img = ImageFaces(np.zeros((1, 1, 3), np.uint8), []).stamp(seq, float(seq))
+    detected_at = seq + latency_ms / 1000
+    img.stages.append(StageTime("detector", detected_at - 0.001, detected_at))
+    img.stages.append(StageTime("drawer", detected_at, detected_at + 0.005))
+    return img
+
+
+def test_percentiles_and_durations_per_stage():
+    tracker = LatencyTracker()
+    for seq in range(100):
+        tracker.record(shown(seq, latency_ms=seq + 1))
+    summary = tracker.summary()
+    assert list(summary) == ["detector", "drawer"]
+    # linear interpolation over latencies 1..100ms
+    assert summary["detector"]["p50"] == pytest.approx(50.5)
+    assert summary["detector"]["p95"] == pytest.approx(95.05)
+    assert summary["detector"]["p99"] == pytest.approx(99.01)
+    assert summary["detector"]["duration"] == pytest.approx(1)
+    assert summary["drawer"]["p50"] == pytest.approx(55.5)
+    assert summary["drawer"]["duration"] == pytest.approx(5)
+
+
+def test_window_keeps_newest_frames():
+    tracker = LatencyTracker(window=10)
+    for seq in range(100):
+        tracker.record(shown(seq, latency_ms=seq + 1))
+    assert tracker.summary()["detector"]["p50"] == pytest.approx(95.5)
+    assert tracker.frames == 100
+
+
+def test_stale_and_skipped_frames():
+    tracker = LatencyTracker()
+    for seq in (0, 1, 4, 4, 2, 5, 9):
+        tracker.record(shown(seq, latency_ms=10))
+    # not stamped by a camera
+    tracker.record(ImageFaces(np.zeros((1, 1, 3), np.uint8), []))
+    assert tracker.frames == 7
+    # the second 4 and the 2 after it are stale, 2 and 3 were skipped before 4, 6 to 8 before 9
+    assert tracker.stale == 2
+    assert tracker.skipped == 5
+    tracker.reset()
+    assert (tracker.frames, tracker.stale, tracker.skipped, tracker.summary()) == (0, 0, 0, {})
+    tracker.record(shown(3, latency_ms=10))
+    assert tracker.skipped == 0
@@ -0,0 +1,84 @@
+"""
+-*- coding: utf-8 -*-
+@Organization : SupaVision
+@Author       : 18317
+@Date Created : 18/10/2026
+@Description  :
+"""
+import os
+from pathlib import Path
+
+import numpy as np
+import onnxruntime
+import pytest
+from onnx import TensorProto, helper, save_model
+
+from src.app.utils.boostface.model_zoo.model_router import ModelRouter, SessionConfig
+
+CPU = ['CPUExecutionProvider']
+
+
+@pytest.fixture
+def router(tmp_path) -> ModelRouter:
+    """router of a graph adding 1 to its input twice, something for the optimizer to fold"""
+    one = helper.make_tensor('one', TensorProto.FLOAT, [1], [1.0])
+    graph = helper.make_graph(
+        [helper.make_node('Add', ['one', 'one'], ['two']), helper.make_node('Add', ['x', 'two'], ['y'])],
+        'tiny',
+        [helper.make_tensor_value_info('x', TensorProto.FLOAT, [1, 3])],
+        [helper.make_tensor_value_info('y', TensorProto.FLOAT, [1, 3])],
+        initializer=[one])
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', 13)])
+    model.ir_version = 8
+    onnx_file = tmp_path / 'tiny.onnx'
+    save_model(model, str(onnx_file))
+    return ModelRouter(onnx_file)
+
+
+def run(session) -> np.ndarray:
+    return session.run(None, {'x': np.zeros((1, 3), np.float32)})[0]
+
+
+def test_cache_named_after_runtime_level_and_providers(router):
+    cache = router.optimized_file(SessionConfig(optimization_level='extended'),
+                                  ['CUDAExecutionProvider', 'CPUExecutionProvider'])
+    assert cache == router.onnx_file.with_name(f'tiny.ort{onnxruntime.__version__}.extended.cuda_cpu.onnx')
+
+
+def test_cold_start_caches_then_warm_start_loads_cache(router):
+    config = SessionConfig()
+    cache = router.optimized_file(config, CPU)
+    cold = router._create_session(config, providers=CPU)
+    assert Path(cold.model_path) == router.onnx_file
+    assert cache.exists()
+    # nothing left under the temporary name
+    assert sorted(p.name for p in router.onnx_file.parent.iterdir()) == sorted([cache.name, 'tiny.onnx'])
+    warm = router._create_session(config, providers=CPU)
+    assert Path(warm.model_path) == cache
+    np.testing.assert_array_equal(run(warm), run(cold))
+
+
+def test_model_newer_than_cache_optimized_again(router):
+    config = SessionConfig()
+    cache = router.optimized_file(config, CPU)
+    router._create_session(config, providers=CPU)
+    cached_at = cache.stat().st_mtime
+    os.utime(router.onnx_file, (cached_at + 10, cached_at + 10))
+    session = router._create_session(config, providers=CPU)
+    assert Path(session.model_path) == router.onnx_file
+    assert cache.stat().st_mtime > cached_at
+
+
+def test_broken_cache_removed_and_rebuilt(router):
+    config = SessionConfig()
+    cache = router.optimized_file(config, CPU)
+    cache.write_bytes(b'half written')
+    session = router._create_session(config, providers=CPU)
+    assert Path(session.model_path) == router.onnx_file
+    np.testing.assert_array_equal(run(session), np.full((1, 3), 2, np.float32))
+    assert Path(router._create_session(config, providers=CPU).model_path) == cache
+
+
+def test_cache_disabled_writes_nothing(router):
+    router._create_session(SessionConfig(cache_optimized=False), providers=CPU)
+    assert [p.name for p in router.onnx_file.parent.iterdir()] == ['tiny.onnx']
@@ -0,0 +1,98 @@
+"""
+-*- coding: utf-8 -*-
+@Organization : SupaVision
+@Author       : 18317
+@Date Created : 18/10/2026
+@Description  :
+"""
+import numpy as np
+import pytest
+
+from src.app.utils.boostface.common import Face, ImageFaces
+from src.app.utils.boostface.component import motion_gate
+from src.app.utils.boostface.component.motion_gate import MotionGate
+
+
+class Clock:
+    """timer ticking 10ms a read, detection takes 1s more"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        self.now += 0.01
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(motion_gate, 'current_time', clock)
+    return clock
+
+
+class OneFaceDetector:
+    def __init__(self, clock: Clock):
+        self.clock = clock
+        self.calls = 0
+
+    def run_onnx(self, img2detect: ImageFaces) -> ImageFaces:
+        self.calls += 1
+        self.clock.now += 1.0
+        img2detect.faces.append(Face(np.array([10, 10, 50, 50], np.float32), None, 0.9, (0, 0, 640, 360)))
+        return img2detect
+
+
+def scene(moved: bool = False) -> ImageFaces:
+    image = np.full((360, 640, 3), 80, np.uint8)
+    if moved:
+        image[100:200, 300:400] = 255
+    return ImageFaces(image, [])
+
+
+def detected_on(gate: MotionGate, detector: OneFaceDetector, frames: list[ImageFaces]) -> list[bool]:
+    """whether each frame ran the detector"""
+    detected = []
+    for img2detect in frames:
+        calls = detector.calls
+        gate.run(detector.run_onnx, img2detect)
+        detected.append(detector.calls > calls)
+    return detected
+
+
+def test_static_scene_skips_until_forced(clock):
+    gate = MotionGate(force_every=3)
+    detected = detected_on(gate, OneFaceDetector(clock), [scene() for _ in range(9)])
+    # detect, 3 frames reusing faces, detect again
+    assert detected == [True, False, False, False, True, False, False, False, True]
+    assert (gate.frames, gate.skipped) == (9, 6)
+    assert gate.skip_ratio == pytest.approx(6 / 9)
+
+
+def test_skipped_frames_get_copies_of_last_faces(clock):
+    gate = MotionGate()
+    detector = OneFaceDetector(clock)
+    first = gate.run(detector.run_onnx, scene())
+    skipped = gate.run(detector.run_onnx, scene())
+    assert detector.calls == 1
+    assert len(skipped.faces) == 1
+    assert skipped.faces[0] is not first.faces[0]
+    np.testing.assert_array_equal(skipped.faces[0].bbox, first.faces[0].bbox)
+
+
+def test_motion_triggers_detection(clock):
+    gate = MotionGate()
+    detected = detected_on(gate, OneFaceDetector(clock), [scene(moved) for moved in (False, False, True, True, False)])
+    # a changed scene is the new reference, changing back is motion too
+    assert detected == [True, False, True, False, True]
+    assert gate.skipped == 2
+
+
+def test_cpu_saved_counts_skipped_detections_minus_gating(clock):
+    gate = MotionGate(force_every=3)
+    detector = OneFaceDetector(clock)
+    assert gate.cpu_saved == 0.0
+    detected_on(gate, detector, [scene() for _ in range(8)])
+    # 2 detections of 1.01s each, 6 skipped, 10ms of gating on each of 8 frames
+    assert (gate.frames - gate.skipped, gate.skipped) == (2, 6)
+    assert gate.cpu_saved == pytest.approx(6 * 1.01 - 8 * 0.01)
@@ -0,0 +1,136 @@
+"""
+-*- coding: utf-8 -*-
+@Organization : SupaVision
+@Author       : 18317
+@Date Created : 18/10/2026
+@Description  :
+"""
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+from src.app.utils.boostface import offline
+from src.app.utils.boostface.common import ImageFaces
+from src.app.utils.boostface.component.detector import DetectorBase
+from src.app.utils.boostface.model_zoo.model_router import SessionConfig
+from src.app.utils.boostface.offline import (Detections, VideoChunk, analyze_video, seek, split_video,
+                                             stitch_tracks, track_chunk)
+
+
+def detections(rows: list[tuple[int, int, float]]) -> Detections:
+    """rows of (frame, track, x1) with 10x10 boxes"""
+    frame, track, x1 = (np.array(column) for column in zip(*rows))
+    bbox = np.stack([x1, np.zeros_like(x1), x1 + 10, np.full_like(x1, 10)], axis=1).astype(np.float32)
+    return Detections(frame.astype(np.int32), track.astype(np.int32), bbox,
+                      np.ones(len(rows), np.float32), np.zeros((len(rows), 5, 2), np.float32))
+
+
+def test_split_covers_every_frame_once():
+    chunks = split_video(1000, 6, overlap=10)
+    assert chunks[0].first == chunks[0].start == 0
+    assert chunks[-1].stop == 1000
+    for before, after in zip(chunks, chunks[1:]):
+        assert after.start == before.stop
+        assert after.first == after.start - 10
+    # too short to overlap every chunk
+    assert len(split_video(25, 6, overlap=10)) == 2
+
+
+def test_stitch_carries_track_ids_over_overlap():
+    chunks = split_video(20, 2, overlap=4)
+    first = detections([(f, 0, 0.0) for f in range(10)] + [(f, 1, 100.0) for f in range(10)])
+    # same faces tracked again by the second chunk with its own ids, and a new face
+    second = detections([(f, 5, 100.0) for f in range(6, 20)] + [(f, 3, 0.5) for f in range(6, 20)]
+                        + [(f, 4, 200.0) for f in range(12, 20)])
+    stitched = stitch_tracks(chunks, [first, second])
+    # overlapping frames are kept once, from the first chunk
+    assert np.bincount(stitched.frame).tolist() == [2] * 12 + [3] * 8
+    tracks_at = {x: set(stitched.track[stitched.bbox[:, 0] == x].tolist()) for x in (0.0, 0.5, 100.0, 200.0)}
+    assert tracks_at[0.5] == tracks_at[0.0] == {0}
+    assert tracks_at[100.0] == {1}
+    assert tracks_at[200.0] == {2}
+
+
+class SquareDetector:
+    """what offline workers use of a DetectorBase, finds the bright square of a frame"""
+
+    def __init__(self, session_config: SessionConfig, det_thresh: float):
+        pass
+
+    @staticmethod
+    def run_onnx(img2detect: ImageFaces) -> ImageFaces:
+        ys, xs = np.nonzero(img2detect.nd_arr[..., 0] > 127)
+        if len(xs):
+            bbox = np.array([[xs.min(), ys.min(), xs.max() + 1, ys.max() + 1, 0.9]], np.float32)
+            DetectorBase.fill_faces(img2detect, bbox, np.repeat(bbox[:, None, :2], 5, axis=1))
+        return img2detect
+
+
+def square_x(frame_index: int) -> int:
+    return 20 + 3 * frame_index
+
+
+@pytest.fixture(scope='module')
+def video(tmp_path_factory) -> Path:
+    """60 frames of a 40x40 square moving right by 3 pixels a frame"""
+    path = tmp_path_factory.mktemp('offline') / 'square.avi'
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'MJPG'), 30, (320, 240))
+    for frame_index in range(60):
+        frame = np.zeros((240, 320, 3), np.uint8)
+        x = square_x(frame_index)
+        frame[100:140, x:x + 40] = 255
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+class LandsLate:
+    """capture seeking like a keyframe-only backend, 3 frames past the frame asked for"""
+
+    def __init__(self, video: Path):
+        self._cap = cv2.VideoCapture(str(video))
+
+    def set(self, prop: int, value: float) -> bool:
+        return self._cap.set(prop, value + 3 if prop == cv2.CAP_PROP_POS_FRAMES and value else value)
+
+    def __getattr__(self, name: str):
+        return getattr(self._cap, name)
+
+
+def first_x(image: np.ndarray) -> int:
+    return int(np.nonzero(image[120, :, 0] > 127)[0].min())
+
+
+def test_seek_lands_on_frame(video):
+    for frame_index in (0, 1, 25, 59):
+        cap = LandsLate(video)
+        seek(cap, frame_index)
+        ret, image = cap.read()
+        cap.release()
+        assert ret
+        assert abs(first_x(image) - square_x(frame_index)) <= 1
+    with pytest.raises(ValueError):
+        seek(LandsLate(video), 70)
+
+
+def test_track_chunk_indexes_frames_from_first(video, monkeypatch):
+    monkeypatch.setattr(offline, '_detector', SquareDetector(SessionConfig(), 0.1))
+    found = track_chunk(str(video), VideoChunk(1, 20, 25, 40))
+    # tentative for the first frames
+    assert found.frame.tolist() == list(range(23, 40))
+    assert set(found.track.tolist()) == {0}
+    np.testing.assert_allclose(found.bbox[:, 0], [square_x(f) for f in found.frame], atol=1)
+
+
+def test_analyze_video_stitches_one_track(video, tmp_path):
+    output = tmp_path / 'square.npz'
+    result = analyze_video(video, output, workers=2, chunks=3, overlap=5,
+                           session_config=SessionConfig(), make_detector=SquareDetector)
+    # chunks after the first are confirmed within the overlap, no frame is missing or doubled
+    assert result.frame.tolist() == list(range(3, 60))
+    assert set(result.track.tolist()) == {0}
+    np.testing.assert_allclose(result.bbox[:, 0], [square_x(f) for f in result.frame], atol=1)
+    saved = Detections.load(output)
+    np.testing.assert_array_equal(saved.frame, result.frame)
@@ -0,0 +1,71 @@
+"""
+-*- coding: utf-8 -*-
+@Organization : SupaVision
+@Author       : 18317
+@Date Created : 18/10/2026
+@Description  :
+"""
+import random
+import time
+
+import pytest
+
+from src.app.utils.boostface.common import FrameChannel, ChannelPolicy, ChannelClosed
+from src.app.utils.boostface.pipeline import Pipeline, Stage
+
+
+def drain(channel: FrameChannel) -> list:
+    items = []
+    while True:
+        try:
+            items.append(channel.get(timeout=5))
+        except ChannelClosed:
+            return items
+
+
+def test_stages_keep_order_and_drop_none():
+    source = FrameChannel(maxlen=64, policy=ChannelPolicy.BLOCK)
+
+    def slow_double(x):
+        time.sleep(random.random() * 0.005)
+        return x * 2
+
+    pipeline = Pipeline(
+        {'source': source},
+        [Stage('double', slow_double, 'source', workers=4),
+         Stage('filter', lambda x: x if x % 3 else None, 'double', maxlen=2)],
+        output_maxlen=64, output_policy=ChannelPolicy.BLOCK)
+    for i in range(50):
+        source.append(i)
+    # closing the source drains and closes every stage after it
+    source.close()
+    assert drain(pipeline.subscribe()) == [i * 2 for i in range(50) if (i * 2) % 3]
+    stats = pipeline.stats()
+    assert stats['double']['processed'] == 50
+    assert stats['filter']['dropped'] == 17
+    pipeline.stop()
+
+
+def test_slow_stage_pushes_back():
+    source = FrameChannel(maxlen=1, policy=ChannelPolicy.DROP_OLDEST)
+    pipeline = Pipeline(
+        {'source': source},
+        [Stage('pass', lambda x: x, 'source'),
+         Stage('slow', lambda x: time.sleep(0.05) or x, 'pass', maxlen=1)],
+        output_maxlen=64, output_policy=ChannelPolicy.BLOCK)
+    for i in range(20):
+        source.append(i)
+        time.sleep(0.005)
+    source.close()
+    results = drain(pipeline.subscribe())
+    # frames piled up in front of the slow stage are dropped at the source instead
+    assert source.dropped > 0
+    assert len(results) + source.dropped == 20
+    assert results == sorted(results)
+    pipeline.stop()
+
+
+def test_graph_is_checked():
+    source = FrameChannel()
+    with pytest.raises(ValueError):
+        Pipeline({'source': source}, [Stage('a', lambda x: x, 'missing')])
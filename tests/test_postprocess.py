@@ -0,0 +1,76 @@
+"""
+-*- coding: utf-8 -*-
+@Organization : SupaVision
+@Author       : 18317
+@Date Created : 18/10/2026
+@Description  : vectorized scrfd post-processing gives the same results as the python loops it replaced
+"""
+import numpy as np
+
+from src.app.utils.boostface.model_zoo.postprocess import distance2kps, decode_positive, nms
+
+
+def loop_nms(dets, thresh):
+    """numpy loop nms of insightface scrfd"""
+    x1, y1, x2, y2, scores = dets[:, 0], dets[:, 1], dets[:, 2], dets[:, 3], dets[:, 4]
+    areas = (x2 - x1 + 1) * (y2 - y1 + 1)
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        xx1 = np.maximum(x1[i], x1[order[1:]])
+        yy1 = np.maximum(y1[i], y1[order[1:]])
+        xx2 = np.minimum(x2[i], x2[order[1:]])
+        yy2 = np.minimum(y2[i], y2[order[1:]])
+        w = np.maximum(0.0, xx2 - xx1 + 1)
+        h = np.maximum(0.0, yy2 - yy1 + 1)
+        inter = w * h
+        ovr = inter / (areas[i] + areas[order[1:]] - inter)
+        order = order[np.where(ovr <= thresh)[0] + 1]
+    return keep
+
+
+def loop_distance2kps(points, distance):
+    preds = []
+    for i in range(0, distance.shape[1], 2):
+        preds.append(points[:, i % 2] + distance[:, i])
+        preds.append(points[:, i % 2 + 1] + distance[:, i + 1])
+    return np.stack(preds, axis=-1)
+
+
+def crowded_dets(n: int, seed: int = 0) -> np.ndarray:
+    """n boxes clustered around n // 4 faces, scores unique"""
+    rng = np.random.default_rng(seed)
+    centers = rng.uniform(0, 1000, (n // 4, 2))[rng.integers(0, n // 4, n)]
+    centers += rng.normal(0, 6, (n, 2))
+    size = rng.uniform(30, 60, (n, 1))
+    scores = (rng.permutation(n) + 1) / n
+    return np.hstack((centers - size / 2, centers + size / 2, scores[:, None])).astype(np.float32)
+
+
+def test_nms_matches_loop():
+    for seed in range(5):
+        dets = crowded_dets(400, seed)
+        assert nms(dets, 0.4) == loop_nms(dets, 0.4)
+    assert nms(np.empty((0, 5), dtype=np.float32), 0.4) == []
+
+
+def test_distance2kps_matches_loop():
+    rng = np.random.default_rng(0)
+    points = rng.uniform(0, 320, (100, 2))
+    distance = rng.normal(0, 10, (100, 10))
+    assert np.allclose(distance2kps(points, distance), loop_distance2kps(points, distance))
+
+
+def test_decode_positive_only_keeps_above_threshold():
+    rng = np.random.default_rng(0)
+    scores = rng.uniform(0, 1, (800, 1)).astype(np.float32)
+    bbox_preds = rng.uniform(0, 4, (800, 4)).astype(np.float32)
+    kps_preds = rng.normal(0, 2, (800, 10)).astype(np.float32)
+    centers = rng.uniform(0, 320, (800, 2)).astype(np.float32)
+    pos_scores, bboxes, kpss = decode_positive(scores, bbox_preds, kps_preds, centers, 8, 0.5)
+    mask = scores[:, 0] >= 0.5
+    assert np.array_equal(pos_scores, scores[mask])
+    assert np.allclose(bboxes[:, 0:2], centers[mask] - bbox_preds[mask, 0:2] * 8)
+    assert kpss.shape == (mask.sum(), 5, 2)
@@ -0,0 +1,113 @@
+"""
+-*- coding: utf-8 -*-
+@Organization : SupaVision
+@Author       : 18317
+@Date Created : 18/10/2026
+@Description  :
+"""
+import random
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pytest
+
+from src.app.utils.boostface.common import ChannelClosed, ChannelPolicy, FrameChannel, ImageFaces
+from src.app.utils.boostface.component.process_detector import ProcessDetector
+from src.app.utils.boostface.model_zoo.model_router import SessionConfig
+
+
+def test_worker_imports_do_not_log_in():
+    # spawned detector and offline workers import these, the websocket client logs in on import
+    code = ("import sys\n"
+            "import src.app.utils.boostface.component.process_detector\n"
+            "import src.app.utils.boostface.offline\n"
+            "assert 'src.app.common.client.client' not in sys.modules\n"
+            "assert 'PyQt6' not in sys.modules\n")
+    subprocess.run([sys.executable, '-c', code], check=True, timeout=60)
+
+
+class PixelModel:
+    """finds one face at x1 = first pixel of the frame, slow now and then so workers finish out of order"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    def detect(self, image: np.ndarray, **kwargs):
+        time.sleep(random.uniform(0, self.delay))
+        x1 = float(image[0, 0, 0])
+        return np.array([[x1, 0, x1 + 10, 10, 0.9]], np.float32), np.zeros((1, 5, 2), np.float32)
+
+
+class PixelDetector:
+    """what workers use of a DetectorBase"""
+
+    def __init__(self, session_config: SessionConfig, det_thresh: float, delay: float = 0.02):
+        self.detector_model = PixelModel(delay)
+
+
+def sleepy_detector(session_config: SessionConfig, det_thresh: float) -> PixelDetector:
+    return PixelDetector(session_config, det_thresh, delay=60)
+
+
+def broken_detector(session_config: SessionConfig, det_thresh: float):
+    raise RuntimeError("no model")
+
+
+def frame(value: int) -> ImageFaces:
+    return ImageFaces(np.full((32, 32, 3), value, np.uint8), [])
+
+
+def test_results_published_in_order_through_recycled_slots():
+    frames = 24
+    jobs = FrameChannel(frames, ChannelPolicy.BLOCK)
+    detector = ProcessDetector(workers=2, frame_shape=(32, 32, 3), max_faces=4,
+                               wait_time=0.1, make_detector=PixelDetector)
+    try:
+        # 4 result slots for 24 frames
+        for value in range(frames):
+            jobs.append(frame(value))
+        jobs.close()
+        detector.connect_jobs_queue(jobs)
+        published = []
+        with pytest.raises(ChannelClosed):
+            while True:
+                published.append(detector.produce())
+    finally:
+        detector.stop()
+    values = [int(img.faces[0].bbox[0]) for img in published]
+    # a slow consumer may miss results of a LATEST channel, never gets them out of order
+    assert values == sorted(set(values))
+    assert values[-1] == frames - 1
+    assert len(values) + detector.result_queue.dropped == frames
+    assert detector._free_slots.qsize() == 4
+
+
+def test_killed_worker_closes_results():
+    detector = ProcessDetector(workers=1, frame_shape=(32, 32, 3), max_faces=4,
+                               wait_time=0.1, make_detector=sleepy_detector)
+    try:
+        detector.connect_jobs_queue(FrameChannel(2, ChannelPolicy.BLOCK))
+        detector._jobs_queue.append(frame(1))
+        deadline = time.monotonic() + 30
+        while not detector._in_flight and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert detector._in_flight
+        detector._workers[0].kill()
+        with pytest.raises(ChannelClosed):
+            detector.produce()
+        # frame held by the dead worker is given back
+        assert not detector._in_flight
+    finally:
+        detector.stop()
+
+
+def test_worker_failing_to_start_closes_results():
+    detector = ProcessDetector(workers=1, frame_shape=(32, 32, 3), max_faces=4,
+                               wait_time=0.1, make_detector=broken_detector)
+    try:
+        with pytest.raises(ChannelClosed):
+            detector.produce()
+    finally:
+        detector.stop()
@@ -0,0 +1,85 @@
+"""
+-*- coding: utf-8 -*-
+@Organization : SupaVision
+@Author       : 18317
+@Date Created : 18/10/2026
+@Description  :
+"""
+import numpy as np
+
+from src.app.utils.boostface.common import ImageFaces
+from src.app.utils.boostface.component.detector import DetectorBase
+from src.app.utils.boostface.component.roi_detector import RoiDetector
+
+
+class FakeModel:
+    """answers detect with boxes given in mosaic coordinates, keypoints at their corners"""
+
+    def __init__(self, boxes: list[list[float]], input_size: tuple[int, int] = (320, 320)):
+        self.input_size = input_size
+        self.boxes = np.array(boxes, np.float32).reshape(-1, 4)
+        self.mosaics: list[np.ndarray] = []
+
+    def detect(self, image: np.ndarray, input_size: tuple[int, int], **kwargs):
+        assert input_size == (image.shape[1], image.shape[0])
+        self.mosaics.append(image)
+        bboxes = np.hstack([self.boxes, np.full((len(self.boxes), 1), 0.9, np.float32)])
+        kpss = np.repeat(self.boxes[:, None, 0:2], 5, axis=1)
+        return bboxes, kpss
+
+    def nms(self, dets: np.ndarray) -> np.ndarray:
+        return np.arange(dets.shape[0])
+
+
+class FakeDetector:
+    """what RoiDetector uses of a DetectorBase"""
+    fill_faces = staticmethod(DetectorBase.fill_faces)
+
+    def __init__(self, model: FakeModel):
+        self.detector_model = model
+        self.full_passes = 0
+
+    def run_onnx(self, img2detect: ImageFaces) -> ImageFaces:
+        self.full_passes += 1
+        return img2detect
+
+
+def roi_detector(model: FakeModel, rois: list[list[float]]) -> RoiDetector:
+    rois = [np.array(roi, np.float32) for roi in rois]
+    # every frame is a roi frame, no padding so crops are the rois
+    return RoiDetector(FakeDetector(model), lambda: rois, full_every=1000, pad=0)
+
+
+def frame() -> ImageFaces:
+    return ImageFaces(np.full((1000, 1000, 3), 255, np.uint8), [])
+
+
+def test_mosaic_detections_mapped_back_to_frame():
+    # roi 0 is 320x160 shrunk by 2 into cell (0, 0), roi 1 is 80x80 grown by 2 into cell (0, 1),
+    # faces found fill the resized crops
+    model = FakeModel([[0, 0, 160, 80], [160, 0, 320, 160]])
+    detector = roi_detector(model, [[100, 100, 420, 260], [500, 600, 580, 680]])
+    faces = detector.run_onnx(frame()).faces
+    assert detector.roi_passes == 1
+    mosaic = model.mosaics[0]
+    assert mosaic.shape == (160, 320, 3)
+    assert mosaic[:80, :160].all() and not mosaic[80:, :160].any() and mosaic[:, 160:].all()
+    np.testing.assert_allclose([face.bbox for face in faces], [[100, 100, 420, 260], [500, 600, 580, 680]])
+    np.testing.assert_allclose([face.kps[0] for face in faces], [[100, 100], [500, 600]])
+
+
+def test_mosaic_no_larger_than_full_frame_input():
+    rois = [[100 * i, 100 * i, 100 * i + 80, 100 * i + 80] for i in range(9)]
+    model = FakeModel([], input_size=(320, 320))
+    roi_detector(model, rois).run_onnx(frame())
+    # 3x3 cells of 160 would be 480x480, cells shrink to fit 320x320 pixels
+    assert model.mosaics[0].shape == (288, 288, 3)
+
+
+def test_mosaic_cells_too_small_fall_back_to_full_frame():
+    rois = [[100 * i, 100 * i, 100 * i + 80, 100 * i + 80] for i in range(9)]
+    model = FakeModel([], input_size=(64, 64))
+    detector = roi_detector(model, rois)
+    detector.run_onnx(frame())
+    assert not model.mosaics
+    assert detector.detector.full_passes == detector.full_passes == 1
@@ -0,0 +1,114 @@
+"""
+-*- coding: utf-8 -*-
+@Organization : SupaVision
+@Author       : 18317
+@Date Created : 18/10/2026
+@Description  :
+"""
+from types import SimpleNamespace
+
+import numpy as np
+
+from src.app.utils.boostface.common import ImageFaces
+from src.app.utils.boostface.component.detector import DetectorBase
+from src.app.utils.boostface.model_zoo.scrfd import SCRFD
+
+STRIDES = (8, 16, 32)
+
+
+class SquareSession:
+    """
+    onnxruntime session of a batched scrfd with keypoints, finds the bright square of each image:
+    one anchor of stride 8 near its center scores 0.9 and spans it, keypoints at its top left corner
+    :param batch: fixed batch dim of input, a name for dynamic batches
+    """
+
+    def __init__(self, batch: int | str = 'batch'):
+        self.batches: list[int] = []
+        self._inputs = [SimpleNamespace(name='input.1', shape=[batch, 3, '?', '?'])]
+        self._outputs = [SimpleNamespace(name=f'{kind}{stride}', shape=[batch, '?', width])
+                         for kind, width in (('score', 1), ('bbox', 4), ('kps', 10)) for stride in STRIDES]
+
+    def get_inputs(self):
+        return self._inputs
+
+    def get_outputs(self):
+        return self._outputs
+
+    def run(self, output_names, feed):
+        blob = feed['input.1']
+        self.batches.append(blob.shape[0])
+        height, width = blob.shape[2:]
+        outs = [np.zeros((blob.shape[0], (height // stride) * (width // stride) * 2, size), np.float32)
+                for size in (1, 4, 10) for stride in STRIDES]
+        for i, image in enumerate(blob):
+            ys, xs = np.nonzero(image[0] > 0)
+            if len(xs) == 0:
+                continue
+            x1, y1, x2, y2 = xs.min(), ys.min(), xs.max() + 1, ys.max() + 1
+            col, row = round((x1 + x2) / 16), round((y1 + y2) / 16)
+            cx, cy = col * 8, row * 8
+            anchor = (row * (width // 8) + col) * 2
+            outs[0][i, anchor] = 0.9
+            outs[3][i, anchor] = np.array([cx - x1, cy - y1, x2 - cx, y2 - cy]) / 8
+            outs[6][i, anchor] = np.tile([x1 - cx, y1 - cy], 5) / 8
+        return outs
+
+
+def square(height: int, width: int, box: tuple[int, int, int, int] | None) -> np.ndarray:
+    image = np.zeros((height, width, 3), np.uint8)
+    if box is not None:
+        x1, y1, x2, y2 = box
+        image[y1:y2, x1:x2] = 255
+    return image
+
+
+def scrfd(session: SquareSession) -> SCRFD:
+    model = SCRFD(session=session)
+    model.prepare(0, det_thresh=0.5, input_size=(320, 320))
+    return model
+
+
+# landscape shrunk by 2, portrait letterboxed with padding on the right, no face, square
+BOXES = [(100, 120, 300, 280), (40, 200, 120, 280), None, (16, 16, 96, 96)]
+IMAGES = [square(480, 640, BOXES[0]), square(320, 240, BOXES[1]), square(200, 200, BOXES[2]),
+          square(160, 160, BOXES[3])]
+
+
+def test_batch_detections_projected_back_to_each_image():
+    model = scrfd(SquareSession())
+    detected = model.detect_batch(IMAGES)
+    assert model.session.batches == [len(IMAGES)]
+    for (bboxes, kpss), box, image in zip(detected, BOXES, IMAGES):
+        if box is None:
+            # nothing bleeds over from the other images of the batch
+            assert bboxes.shape == (0, 5)
+            continue
+        assert bboxes.shape == (1, 5)
+        # one pixel of the letterboxed image, rounding of resize
+        tolerance = image.shape[1] / 320 + 1
+        np.testing.assert_allclose(bboxes[0, :4], box, atol=tolerance)
+        np.testing.assert_allclose(kpss[0], np.tile(box[:2], (5, 1)), atol=tolerance)
+
+
+def test_max_batch_chunks_match_single_detect():
+    batched = scrfd(SquareSession(batch=3))
+    single = scrfd(SquareSession(batch=1))
+    images = IMAGES * 2
+    detected = batched.detect_batch(images)
+    assert batched.session.batches == [3, 3, 2]
+    for image, (bboxes, kpss) in zip(images, detected):
+        expected_bboxes, expected_kpss = single.detect(image)
+        np.testing.assert_allclose(bboxes, expected_bboxes, rtol=1e-6)
+        np.testing.assert_allclose(kpss, expected_kpss, rtol=1e-6)
+
+
+def test_run_onnx_batch_fills_faces_of_each_image():
+    detector = DetectorBase.__new__(DetectorBase)
+    detector.detector_model = scrfd(SquareSession())
+    imgs = detector.run_onnx_batch([ImageFaces(image, []) for image in IMAGES])
+    assert [len(img.faces) for img in imgs] == [1, 1, 0, 1]
+    for img, box in zip(imgs, BOXES):
+        for face in img.faces:
+            assert face.scene_scale == (0, 0, img.nd_arr.shape[1], img.nd_arr.shape[0])
+            np.testing.assert_allclose(face.bbox, box, atol=img.nd_arr.shape[1] / 320 + 1)
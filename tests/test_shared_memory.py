@@ -0,0 +1,49 @@
+"""
+-*- coding: utf-8 -*-
+@Organization : SupaVision
+@Author       : 18317
+@Date Created : 18/10/2026
+@Description  :
+"""
+import numpy as np
+import pytest
+
+from src.app.utils.boostface.common import ImageFaces
+from src.app.utils.boostface.shared_memory import SharedFramePool, SharedFrame
+
+
+@pytest.fixture
+def pool():
+    pool = SharedFramePool((4, 6, 3), size=2, name="test_pool")
+    yield pool
+    pool.close()
+
+
+def test_slot_reused_after_last_release(pool):
+    first = pool.acquire()
+    assert isinstance(first, SharedFrame)
+    img = ImageFaces.from_frame(first.retain())
+    first.release()
+    second = pool.acquire()
+    # ring is full while img still holds the first slot
+    assert not isinstance(pool.acquire(), SharedFrame)
+    img.release()
+    second.release()
+    third = pool.acquire()
+    assert third.slot == first.slot
+    assert (third.seq, pool.hits, pool.misses) == (3, 3, 1)
+    third.release()
+
+
+def test_attached_pool_reads_same_buffer(pool):
+    frame = pool.acquire()
+    frame.buffer[...] = np.arange(frame.buffer.size, dtype=np.uint8).reshape(frame.buffer.shape)
+    attached = SharedFramePool.attach(frame.shm_name)
+    seen = attached.frame(frame.slot)
+    assert seen.seq == frame.seq and seen.buffer.shape == (4, 6, 3)
+    assert np.array_equal(seen.buffer, frame.buffer)
+    with pytest.raises(RuntimeError):
+        attached.acquire()
+    del seen
+    attached.close()
+    frame.release()
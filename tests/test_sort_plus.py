@@ -0,0 +1,190 @@
+"""
+-*- coding: utf-8 -*-
+@Organization : SupaVision
+@Author       : 18317
+@Date Created : 18/10/2026
+@Description  :
+"""
+import copy
+from typing import NamedTuple
+
+import numpy as np
+
+from src.app.utils.boostface.common import Face, ImageFaces
+from src.app.utils.boostface.component.identifier import Tracker
+from src.app.utils.boostface.component.sort_plus import (
+    KalmanBoxTracker, KalmanBoxBank, associate_detections_to_trackers, iou_batch, linear_assignment)
+
+
+class Box(NamedTuple):
+    id: int
+    bbox: np.ndarray
+
+
+def dense_associate(detected_tars: list, predicted_tars: list, iou_threshold: float = 0.3):
+    """associate_detections_to_trackers as it used to be, dense IOU matrix of every pair"""
+    if len(predicted_tars) == 0:
+        return [], [], predicted_tars
+    detected_bboxes = np.array([tar.bbox for tar in detected_tars]) if detected_tars else np.empty((0, 4))
+    iou_matrix = iou_batch(detected_bboxes, np.array([tar.bbox for tar in predicted_tars]))
+    if min(iou_matrix.shape) > 0:
+        a = (iou_matrix > iou_threshold).astype(np.int32)
+        if a.sum(1).max() == 1 and a.sum(0).max() == 1:
+            matched_indices = np.stack(np.where(a), axis=1)
+        else:
+            matched_indices = linear_assignment(-iou_matrix)
+    else:
+        matched_indices = np.empty(shape=(0, 2))
+    unmatched_det_tars = [tar for d, tar in enumerate(detected_tars) if d not in matched_indices[:, 0]]
+    unmatched_pred_tars = [tar for t, tar in enumerate(predicted_tars) if t not in matched_indices[:, 1]]
+    matches = []
+    for m in matched_indices:
+        if iou_matrix[m[0], m[1]] < iou_threshold:
+            unmatched_det_tars.append(detected_tars[m[0]])
+            unmatched_pred_tars.append(predicted_tars[m[1]])
+        else:
+            matches.append((predicted_tars[m[1]], detected_tars[m[0]]))
+    return matches, unmatched_det_tars, unmatched_pred_tars
+
+
+def crowd(n: int, rng: np.random.Generator, spread: float = 2000.) -> tuple[list[Box], list[Box]]:
+    """n tracked faces, detections moved a little with some missing and some new"""
+    xy = rng.uniform(0, spread, (n, 2))
+    wh = rng.uniform(30, 60, (n, 2))
+    predicted = [Box(i, np.concatenate([xy[i], xy[i] + wh[i]])) for i in range(n)]
+    detected = [Box(i, tar.bbox + rng.normal(0, 8, 4)) for i, tar in enumerate(predicted) if rng.random() < 0.9]
+    for j in range(n // 10):
+        x, y = rng.uniform(0, spread, 2)
+        detected.append(Box(n + j, np.array([x, y, x + 45, y + 45])))
+    return detected, predicted
+
+
+def random_bbox(rng: np.random.Generator) -> np.ndarray:
+    x1, y1 = rng.uniform(0, 500, 2)
+    w, h = rng.uniform(20, 120, 2)
+    return np.array([x1, y1, x1 + w, y1 + h])
+
+
+def test_bank_matches_filterpy_trackers():
+    rng = np.random.default_rng(0)
+    # small capacity, so the bank grows and reuses slots on the way
+    bank = KalmanBoxBank(capacity=2)
+    tracks: dict[int, KalmanBoxTracker] = {}
+    truth: dict[int, np.ndarray] = {}
+    for _ in range(200):
+        for _ in range(rng.integers(0, 3)):
+            bbox = random_bbox(rng)
+            slot = bank.add(bbox)
+            tracks[slot], truth[slot] = KalmanBoxTracker(bbox), bbox
+        for slot in [slot for slot in tracks if rng.random() < 0.05]:
+            bank.remove(slot)
+            del tracks[slot], truth[slot]
+        bank.predict()
+        for tracker in tracks.values():
+            tracker.predict()
+        for slot in truth:
+            truth[slot] = truth[slot] + np.tile(rng.normal(0, 4, 2), 2)
+        observed = [slot for slot in tracks if rng.random() < 0.7]
+        bboxes = np.array([truth[slot] + rng.normal(0, 2, 4) for slot in observed]).reshape(-1, 4)
+        bank.update(np.array(observed, dtype=int), bboxes)
+        for slot, bbox in zip(observed, bboxes):
+            tracks[slot].update(bbox)
+        for slot, tracker in tracks.items():
+            assert np.allclose(bank.x[slot], tracker.kf.x[:, 0])
+            assert np.allclose(bank.P[slot], tracker.kf.P)
+            assert np.allclose(bank.bboxes(np.array([slot]))[0], tracker.get_state()[0])
+    assert len(bank) == len(tracks)
+
+
+def test_tracker_keeps_ids_of_moving_faces():
+    tracker = Tracker()
+    starts = np.array([[0., 0.], [200., 50.], [400., 300.]])
+    ids = None
+    for frame in range(30):
+        faces = [Face(np.array([x + 3 * frame, y + 2 * frame, x + 3 * frame + 60, y + 2 * frame + 80]),
+                      None, 0.9, (0, 0, 640, 480)) for x, y in starts]
+        targets = tracker.track(ImageFaces(np.zeros((480, 640, 3), np.uint8), faces))
+        assert len(targets) == 3
+        frame_ids = sorted(tar.face.id for tar in targets)
+        assert ids is None or frame_ids == ids
+        ids = frame_ids
+
+
+def test_track_ids_are_recycled_with_new_generation():
+    tracker = Tracker(max_age=1)
+    image = np.zeros((480, 640, 3), np.uint8)
+    first = tracker.track(ImageFaces(image, [Face(np.array([0., 0., 50., 50.]), None, 0.9, (0, 0, 640, 480))]))[0]
+    # target is gone after max_age frames without detections
+    for _ in range(3):
+        tracker.track(ImageFaces(image, []))
+    second = tracker.track(ImageFaces(image, [Face(np.array([300., 300., 350., 350.]), None, 0.9, (0, 0, 640, 480))]))[0]
+    assert second.face.id == first.face.id
+    assert second.face.uid != first.face.uid
+
+
+def test_association_matches_dense_assignment():
+    rng = np.random.default_rng(0)
+    # dense scenes make components of many boxes solved by assignment
+    for n, spread in [(0, 100.), (1, 100.), (10, 300.), (100, 2000.), (100, 400.), (500, 3000.)]:
+        detected, predicted = crowd(n, rng, spread)
+        expected = dense_associate(detected, predicted)
+        got = associate_detections_to_trackers(detected, predicted)
+        assert {(p.id, d.id) for p, d in got[0]} == {(p.id, d.id) for p, d in expected[0]}
+        assert sorted(d.id for d in got[1]) == sorted(d.id for d in expected[1])
+        assert sorted(p.id for p in got[2]) == sorted(p.id for p in expected[2])
+
+
+def test_low_score_detections_keep_targets():
+    tracker = Tracker()
+    image = np.zeros((480, 640, 3), np.uint8)
+    uids = set()
+    for frame in range(30):
+        # score of the face dips under high_thresh every 4th frame, as when it turns away
+        score = 0.3 if frame % 4 == 3 else 0.9
+        bbox = np.array([100. + 4 * frame, 100., 160. + 4 * frame, 180.])
+        targets = tracker.track(ImageFaces(image, [Face(bbox, None, score, (0, 0, 640, 480))]))
+        assert len(targets) == 1
+        uids.add(targets[0].face.uid)
+        assert frame < 3 or targets[0].in_screen
+    assert len(uids) == 1
+    assert tracker.low_matches == 7
+    # low score detections never start a target
+    assert not tracker.track(ImageFaces(image, [Face(np.array([500., 300., 560., 380.]), None, 0.3, (0, 0, 640, 480))]))
+
+
+def test_targets_are_confirmed_once_in_screen():
+    tracker = Tracker()
+    image = np.zeros((480, 640, 3), np.uint8)
+    steady = np.array([100., 100., 160., 180.])
+    for frame in range(5):
+        faces = [Face(steady.copy(), None, 0.9, (0, 0, 640, 480))]
+        # a false detection in 2 frames only
+        if frame < 2:
+            faces.append(Face(np.array([400., 300., 450., 350.]), None, 0.9, (0, 0, 640, 480)))
+        targets = tracker.track(ImageFaces(image, faces))
+    ghost = [tar for tar in tracker._targets.values() if tar.face.bbox[0] == 400.]
+    assert [tar.confirmed for tar in targets] == [True]
+    assert ghost and not ghost[0].confirmed
+
+
+def test_predicted_rois_are_a_snapshot_a_frame_ahead():
+    tracker = Tracker()
+    image = np.zeros((480, 640, 3), np.uint8)
+
+    def faces(frame: int) -> list[Face]:
+        return [Face(np.array([x + 5. * frame, 100., x + 5. * frame + 60, 180.]), None, 0.9, (0, 0, 640, 480))
+                for x in (0., 300.)]
+
+    for frame in range(5):
+        tracker.track(ImageFaces(image, faces(frame)))
+    rois = tracker.predicted_rois()
+    bank = copy.deepcopy(tracker._kalman)
+    bank.predict()
+    slots = np.array([tar.slot for tar in tracker._targets.values()])
+    assert np.allclose(rois, bank.bboxes(slots))
+    # later updates publish a new snapshot and leave the one handed out alone
+    expected = [roi.copy() for roi in rois]
+    for frame in range(5, 8):
+        tracker.track(ImageFaces(image, faces(frame)[:1]))
+    assert all(np.array_equal(roi, before) for roi, before in zip(rois, expected))
+    assert not rois[0].flags.writeable
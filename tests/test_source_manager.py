@@ -0,0 +1,68 @@
+"""
+-*- coding: utf-8 -*-
+@Organization : SupaVision
+@Author       : 18317
+@Date Created : 18/10/2026
+@Description  :
+"""
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from src.app.config.camera_config import CameraConfig
+from src.app.utils.boostface.common import ChannelClosed, ImageFaces
+from src.app.utils.boostface.source_manager import SourceManager
+
+
+class NoFaceDetector:
+    """what sources use of a DetectorBase, finds no face"""
+
+    def run_onnx(self, img2detect: ImageFaces) -> ImageFaces:
+        return img2detect
+
+
+def blank_video(path, frames: int) -> str:
+    video = str(path)
+    writer = cv2.VideoWriter(video, cv2.VideoWriter_fourcc(*'MJPG'), 30, (320, 240))
+    for _ in range(frames):
+        writer.write(np.zeros((240, 320, 3), np.uint8))
+    writer.release()
+    return video
+
+
+def test_get_result_after_stop_raises(tmp_path):
+    video = blank_video(tmp_path / "blank.avi", 5)
+    manager = SourceManager([CameraConfig(url=video)], workers=1, detector=NoFaceDetector())
+    manager.stop()
+    # the newest result made before stop is still handed out, then consumers see shutdown
+    # instead of a logged error and None
+    with pytest.raises(ChannelClosed):
+        for _ in range(2):
+            manager.get_result(0)
+
+
+def test_failing_source_does_not_stop_others(tmp_path):
+    videos = [blank_video(tmp_path / f"blank{i}.avi", 60) for i in range(2)]
+    # one worker, a failure ending it would starve the healthy source too
+    manager = SourceManager([CameraConfig(url=video) for video in videos], workers=1,
+                            detector=NoFaceDetector())
+    failures = []
+
+    def process(img: ImageFaces, started_at: float):
+        failures.append(img.seq)
+        raise RuntimeError("broken frame")
+
+    manager._sources[0].process = process
+    try:
+        # a dead worker would leave the healthy source waiting forever
+        results = [manager._sources[1].result_queue.get(timeout=5) for _ in range(3)]
+        deadline = time.monotonic() + 10
+        while len(failures) < 2 and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        manager.stop()
+    assert [img.seq for img in results] == sorted(img.seq for img in results)
+    # the failing source is still scheduled after its first failure
+    assert len(failures) >= 2
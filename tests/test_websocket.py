@@ -7,14 +7,18 @@
 """
 import asyncio
 import datetime
+import threading
+import time
 
 from time import sleep
 
+import numpy as np
 import pytest
 import websockets
 
 from src.app.common.client import client
-from src.app.common.client.web_socket import WebSocketClient
+from src.app.common.client.web_socket import WebSocketClient, BINARY_SUBPROTOCOL, BINARY_BATCH_SUBPROTOCOL
+from src.app.common.types import Face2Search
 
 
 def test_WebSocketClient():
@@ -37,3 +41,140 @@ async def test_websocket_manager():
         await websocket.send("Hello, WebSocket!")
         data = await websocket.recv()
         assert data == "Hello, WebSocket!"
+
+
+def test_face2search_binary_round_trip():
+    face_img = np.full((112, 96, 3), 128, np.uint8)
+    kps = np.array([[30., 40.], [60., 40.], [45., 60.], [35., 85.], [55., 85.]])
+    face = Face2Search(face_img, kps, 0.875, "3.1")
+    decoded = Face2Search.from_bytes(face.to_bytes())
+    assert decoded.uid == "3.1" and decoded.det_score == 0.875
+    assert np.allclose(decoded.kps, kps)
+    assert decoded.face_img.shape == face_img.shape
+    assert Face2Search.from_bytes(Face2Search(face_img, None, 0.5, "0.0").to_bytes()).kps is None
+
+
+def test_encode_falls_back_to_json():
+    face = Face2Search(np.zeros((16, 16, 3), np.uint8), np.zeros((5, 2)), 0.5, "1.0")
+    ws_client = WebSocketClient("test", binary=True)
+    # server accepted no subprotocol
+    assert isinstance(ws_client._encode(face), str)
+    ws_client.protocol = BINARY_SUBPROTOCOL
+    assert Face2Search.from_bytes(ws_client._encode(face)).uid == "1.0"
+
+
+class SentMessages:
+    """what _send_messages uses of a websocket, keeps what is sent"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, message: str | bytes):
+        self.sent.append(message)
+
+
+def test_faces_are_sent_in_batches():
+    faces = [Face2Search(np.zeros((16, 16, 3), np.uint8), np.zeros((5, 2)), 0.5, f"{i}.0") for i in range(7)]
+    ws_client = WebSocketClient("test", binary=True, batch_size=3, batch_linger=0.01)
+    ws_client.protocol, ws_client._is_running = BINARY_BATCH_SUBPROTOCOL, True
+    websocket = SentMessages()
+    for face in faces[:5]:
+        ws_client.send(face)
+    # a message which is not a face closes the batch before it
+    ws_client.send("hello")
+    for face in faces[5:]:
+        ws_client.send(face)
+    ws_client.send("STOP")
+    ws_client._loop.run_until_complete(ws_client._send_messages(websocket))
+    assert websocket.sent[2] == "hello"
+    batches = [Face2Search.batch_from_bytes(message) for i, message in enumerate(websocket.sent) if i != 2]
+    assert [[face.uid for face in batch] for batch in batches] == [["0.0", "1.0", "2.0"], ["3.0", "4.0"], ["5.0", "6.0"]]
+    assert ws_client.stats()['faces_sent'] == 7 and ws_client.batches == 3
+
+
+def test_send_from_another_thread_wakes_sender():
+    ws_client = WebSocketClient("test")
+    ws_client._is_running = True
+    websocket = SentMessages()
+    sender = threading.Thread(target=ws_client._loop.run_until_complete, args=(ws_client._send_messages(websocket),))
+    sender.start()
+    sleep(0.1)
+    ws_client.send("hello")
+    # nothing else happens on the loop, the send alone must wake it
+    deadline = time.perf_counter() + 1
+    while not websocket.sent and time.perf_counter() < deadline:
+        sleep(0.001)
+    ws_client.send("STOP")
+    sender.join()
+    assert websocket.sent == ["hello"]
+    assert ws_client.stats()['send_wait_max_ms'] < 100
+
+
+def test_receive_all_drains_without_waiting():
+    ws_client = WebSocketClient("test")
+    assert ws_client.receive() is None and ws_client.receive_all() == []
+    for i in range(5):
+        ws_client.receiver_queue.put((time.perf_counter(), {"uid": f"{i}.0"}))
+    assert ws_client.receive() == {"uid": "0.0"}
+    assert [result["uid"] for result in ws_client.receive_all(3)] == ["1.0", "2.0", "3.0"]
+    assert len(ws_client.receive_all()) == 1
+    assert ws_client.stats()['received'] == 5 and ws_client.stats()['receive_depth'] == 0
+
+
+def test_faces_encoded_off_loop_keep_their_order():
+    rng = np.random.default_rng(0)
+    # big crops take longer to encode than the small ones queued after them
+    faces = [Face2Search(rng.integers(0, 256, (600 if i % 2 else 20, 600 if i % 2 else 20, 3), np.uint8),
+                         np.zeros((5, 2)), 0.5, f"{i}.0") for i in range(12)]
+    ws_client = WebSocketClient("test", binary=True, encode_workers=4, max_side=224)
+    ws_client.protocol, ws_client._is_running = BINARY_SUBPROTOCOL, True
+    websocket = SentMessages()
+    for face in faces:
+        ws_client.send(face)
+    ws_client.send("STOP")
+    ws_client._loop.run_until_complete(ws_client._send_messages(websocket))
+    sent = [Face2Search.from_bytes(message) for message in websocket.sent]
+    assert [face.uid for face in sent] == [face.uid for face in faces]
+    assert max(face.face_img.shape[0] for face in sent) == 224
+
+
+def test_downscaled_scales_kps():
+    face = Face2Search(np.zeros((200, 100, 3), np.uint8), np.array([[50., 100.]] * 5), 0.5, "0.0")
+    small = face.downscaled(100)
+    assert small.face_img.shape[:2] == (100, 50)
+    assert np.allclose(small.kps, [[25., 50.]] * 5)
+    assert face.downscaled(300) is face
+
+
+def test_sender_queue_joins_after_batches():
+    faces = [Face2Search(np.zeros((16, 16, 3), np.uint8), np.zeros((5, 2)), 0.5, f"{i}.0") for i in range(7)]
+    ws_client = WebSocketClient("test", binary=True, batch_size=4, batch_linger=0.01)
+    ws_client.protocol, ws_client._is_running = BINARY_BATCH_SUBPROTOCOL, True
+    for face in faces:
+        ws_client.send(face)
+    ws_client.send("STOP")
+    ws_client._loop.run_until_complete(ws_client._send_messages(SentMessages()))
+    # every item taken off the queue is done, batched or not
+    ws_client._loop.run_until_complete(asyncio.wait_for(ws_client.sender_queue.join(), 1))
+
+
+def test_send_after_websocket_stopped_is_dropped(caplog):
+    ws_client = WebSocketClient("test")
+    ws_client.start_ws()
+    # the websocket thread stops once connecting fails or the connection ends
+    ws_client.join(10)
+    assert ws_client._loop.is_closed()
+    ws_client.send("dropped")
+    assert "drop data to send" in caplog.text
+
+
+@pytest.mark.parametrize("started", [False, True])
+def test_stop_shuts_encoder_down(started):
+    ws_client = WebSocketClient("test", encode_workers=1)
+    if started:
+        # connecting fails, the websocket thread is done before stop_ws
+        ws_client.start_ws()
+        ws_client.join(10)
+    ws_client.stop_ws()
+    with pytest.raises(RuntimeError):
+        ws_client._encoder.submit(int)